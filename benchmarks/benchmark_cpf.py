@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from main import validar_cpf
+from validacao_lote import validar_cpfs_em_lote
+
+
+def gerar_cpfs(quantidade, semente=42):
+    """Mistura CPFs válidos, dígitos trocados, dígitos repetidos e textos inválidos."""
+    rng = random.Random(semente)
+    cpfs = []
+    for _ in range(quantidade):
+        base = [rng.randint(0, 9) for _ in range(9)]
+        for pesos_inicio in (10, 11):
+            total = sum(d * p for d, p in zip(base, range(pesos_inicio, 1, -1)))
+            resto = 11 - (total % 11)
+            base.append(0 if resto > 9 else resto)
+        cpf = ''.join(map(str, base))
+
+        sorteio = rng.random()
+        if sorteio < 0.1:
+            cpf = cpf[:10] + str((int(cpf[10]) + 1) % 10)
+        elif sorteio < 0.12:
+            cpf = str(rng.randint(0, 9)) * 11
+        elif sorteio < 0.14:
+            cpf = cpf[:rng.randint(0, 10)] + 'x'
+        cpfs.append(cpf)
+    return cpfs
+
+
+def medir(funcao, repeticoes):
+    melhor = float('inf')
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara validar_cpf (um a um) com validar_cpfs_em_lote.")
+    parser.add_argument('--quantidade', type=int, default=1_000_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    cpfs = gerar_cpfs(args.quantidade)
+    array = np.array(cpfs)
+
+    tempo_escalar, esperado = medir(
+        lambda: [validar_cpf(cpf) for cpf in cpfs], args.repeticoes)
+    tempo_lista, mascara_lista = medir(
+        lambda: validar_cpfs_em_lote(cpfs), args.repeticoes)
+    tempo_array, mascara_array = medir(
+        lambda: validar_cpfs_em_lote(array), args.repeticoes)
+
+    esperado = np.array(esperado)
+    if not (np.array_equal(esperado, mascara_lista) and np.array_equal(esperado, mascara_array)):
+        print("ERRO: o resultado em lote difere de validar_cpf.")
+        exit(1)
+
+    print(f"CPFs: {args.quantidade} ({int(esperado.sum())} válidos)")
+    print(f"validar_cpf (laço Python): {tempo_escalar:8.3f}s")
+    print(f"validar_cpfs_em_lote (lista): {tempo_lista:8.3f}s  ({tempo_escalar / tempo_lista:5.1f}x)")
+    print(f"validar_cpfs_em_lote (array): {tempo_array:8.3f}s  ({tempo_escalar / tempo_array:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
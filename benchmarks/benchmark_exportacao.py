@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from dados_sinteticos import gerar_pacientes
+from exportacao_colunar import escrever_relatorio_colunar
+from main import escrever_relatorio
+from migracoes import CAMINHO_SETUP, dividir_instrucoes
+from repositorio import SQL_INSERIR_CADASTRO
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def popular_banco(conn, quantidade, semente=42):
+    with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), CAMINHO_SETUP)) as script:
+        for instrucao in dividir_instrucoes(script.read()):
+            conn.execute(instrucao)
+    conn.executemany(SQL_INSERIR_CADASTRO, gerar_pacientes(quantidade, semente))
+    conn.commit()
+
+
+def medir(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compara tamanho e tempo de carga dos relatórios em JSON, Parquet e Arrow.")
+    parser.add_argument('--quantidade', type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        conn = sqlite3.connect(os.path.join(diretorio, 'benchmark.db'))
+        popular_banco(conn, args.quantidade)
+
+        leitores = {
+            'json': lambda caminho: json.load(open(caminho, encoding='utf-8')),
+            'ndjson': lambda caminho: [json.loads(linha) for linha in open(caminho, encoding='utf-8')],
+            'parquet': lambda caminho: pq.read_table(caminho),
+            'arrow': lambda caminho: ipc.open_file(caminho).read_all(),
+        }
+        if pd is not None:
+            leitores['json (pandas)'] = lambda caminho: pd.read_json(caminho)
+            leitores['parquet (pandas)'] = lambda caminho: pd.read_parquet(caminho)
+
+        print(f"Registros: {args.quantidade}")
+        print(f"{'formato':<18}{'tamanho (MB)':>14}{'escrita (s)':>14}{'carga (s)':>12}")
+        for nome, leitor in leitores.items():
+            formato = nome.split(' ')[0]
+            caminho = os.path.join(diretorio, f"relatorio.{formato}")
+            cursor = conn.execute("SELECT * FROM cadastro")
+            if formato in ('parquet', 'arrow'):
+                tempo_escrita, _ = medir(lambda: escrever_relatorio_colunar(cursor, caminho, formato))
+            else:
+                tempo_escrita, _ = medir(lambda: escrever_relatorio(cursor, caminho, formato))
+            tempo_carga, _ = medir(lambda: leitor(caminho))
+            tamanho = os.path.getsize(caminho) / (1024 * 1024)
+            print(f"{nome:<18}{tamanho:>14.2f}{tempo_escrita:>14.3f}{tempo_carga:>12.3f}")
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
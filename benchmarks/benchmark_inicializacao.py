@@ -0,0 +1,71 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tempo máximo, em milissegundos, para importar o módulo medido (mediana das execuções)
+ORCAMENTO_PADRAO_MS = 75.0
+
+# Módulos que só devem ser carregados quando a funcionalidade correspondente é usada
+MODULOS_ADIADOS = ['requests', 'tabulate', 'unidecode', 'json', 'cache_ia', 'senha', 'argparse']
+
+
+def medir_importacao(modulo):
+    """Importa o módulo em um processo novo com -X importtime e retorna {módulo: (próprio, acumulado)} em µs."""
+    resultado = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ_PROJETO, capture_output=True, text=True, check=True)
+
+    tempos = {}
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        tempos[nome.strip()] = (int(proprio), int(acumulado))
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede o tempo de importação de main.py com -X importtime e acusa regressões.")
+    parser.add_argument('--modulo', default='main')
+    parser.add_argument('--repeticoes', type=int, default=7)
+    parser.add_argument('--orcamento', type=float, default=ORCAMENTO_PADRAO_MS,
+                        help=f"mediana máxima em ms (padrão: {ORCAMENTO_PADRAO_MS})")
+    parser.add_argument('--maiores', type=int, default=10, help="quantos módulos mais lentos listar")
+    args = parser.parse_args()
+
+    # A primeira execução compila os .pyc e não entra na medida
+    medir_importacao(args.modulo)
+    execucoes = [medir_importacao(args.modulo) for _ in range(args.repeticoes)]
+
+    totais = [tempos[args.modulo][1] / 1000 for tempos in execucoes]
+    mediana = statistics.median(totais)
+    print(f"import {args.modulo}: mediana {mediana:.1f} ms, mínimo {min(totais):.1f} ms, "
+          f"máximo {max(totais):.1f} ms ({args.repeticoes} execuções)")
+
+    ultima = execucoes[-1]
+    print(f"\n{'módulo':<32}{'próprio (ms)':>14}{'acumulado (ms)':>16}")
+    for nome, (proprio, acumulado) in sorted(ultima.items(), key=lambda item: -item[1][1])[:args.maiores]:
+        print(f"{nome:<32}{proprio / 1000:>14.1f}{acumulado / 1000:>16.1f}")
+
+    problemas = []
+    carregados = [modulo for modulo in MODULOS_ADIADOS if modulo in ultima]
+    if carregados:
+        problemas.append(f"módulos que deveriam ser carregados sob demanda: {', '.join(carregados)}")
+    if mediana > args.orcamento:
+        problemas.append(f"mediana de {mediana:.1f} ms acima do orçamento de {args.orcamento:.1f} ms")
+
+    if problemas:
+        for problema in problemas:
+            print(f"REGRESSÃO: {problema}")
+        exit(1)
+    print(f"\nDentro do orçamento de {args.orcamento:.1f} ms e sem importações antecipadas.")
+
+
+if __name__ == "__main__":
+    main()
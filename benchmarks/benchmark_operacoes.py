@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from itertools import islice
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_PROJETO)
+
+from cache_pacientes import limpar_cache
+from conexao import abrir_conexao
+from dados_sinteticos import CIDADES, como_dicionario, gerar_pacientes
+from locais import normalizar_local
+from main import (buscar_pagina, enfileirar_sugestao_ia, escrever_relatorio, validar_cpf, validar_data,
+                  validar_telefone)
+from migracoes import aplicar_migracoes
+from repositorio import (SQL_RELATORIO_DATA, SQL_RELATORIO_GENERO, SQL_RELATORIO_LOCAL, buscar_por_cpf,
+                         buscar_por_id, inserir, inserir_em_lote)
+
+
+TAMANHOS_PADRAO = [10_000, 100_000]
+TAMANHO_LOTE_CARGA = 10_000
+AMOSTRAS_PADRAO = 1000
+REPETICOES_RELATORIO = 5
+
+
+def percentil(ordenados, fracao):
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+def resumir(operacao, tamanho, duracoes, linhas=None):
+    """Vazão e percentis de latência (em ms) de uma lista de durações em segundos."""
+    ordenados = sorted(duracoes)
+    total = sum(ordenados)
+    resultado = {
+        'operacao': operacao,
+        'tamanho': tamanho,
+        'amostras': len(ordenados),
+        'total_s': round(total, 4),
+        'por_segundo': round(len(ordenados) / total, 1) if total else None,
+        'p50_ms': round(percentil(ordenados, 0.50) * 1000, 4),
+        'p95_ms': round(percentil(ordenados, 0.95) * 1000, 4),
+        'p99_ms': round(percentil(ordenados, 0.99) * 1000, 4),
+        'max_ms': round(ordenados[-1] * 1000, 4),
+    }
+    if linhas is not None:
+        resultado['linhas'] = linhas
+        resultado['linhas_por_segundo'] = round(linhas * len(ordenados) / total, 1) if total else None
+    return resultado
+
+
+def cronometrar(funcao, argumentos):
+    duracoes = []
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        funcao(argumento)
+        duracoes.append(time.perf_counter() - inicio)
+    return duracoes
+
+
+def carregar(conn, tamanho, semente):
+    """Carga em massa com executemany; cada amostra é um lote de TAMANHO_LOTE_CARGA linhas."""
+    pacientes = gerar_pacientes(tamanho, semente)
+    duracoes = []
+    while True:
+        lote = list(islice(pacientes, TAMANHO_LOTE_CARGA))
+        if not lote:
+            break
+        inicio = time.perf_counter()
+        with conn:
+            inserir_em_lote(conn.cursor(), map(como_dicionario, lote))
+        duracoes.append(time.perf_counter() - inicio)
+    resultado = resumir('carga_em_lote', tamanho, duracoes)
+    resultado['linhas'] = tamanho
+    resultado['linhas_por_segundo'] = round(tamanho / resultado['total_s'], 1)
+    return resultado
+
+
+def medir_banco(caminho, tamanho, amostras, semente, diretorio):
+    conn = abrir_conexao(caminho)
+    aplicar_migracoes(conn.cursor())
+    cursor = conn.cursor()
+    rng = random.Random(semente)
+    resultados = [carregar(conn, tamanho, semente)]
+
+    # Inserção como em criar_registro: INSERT, job da IA, commit e releitura pelo id
+    def inserir_paciente(linha):
+        id_cadastro = inserir(cursor, como_dicionario(linha))
+        enfileirar_sugestao_ia(cursor, id_cadastro)
+        conn.commit()
+        buscar_por_id(cursor, id_cadastro)
+
+    novos = list(gerar_pacientes(amostras, semente, inicio=tamanho))
+    resultados.append(resumir('insercao', tamanho, cronometrar(inserir_paciente, novos)))
+
+    # Primeira busca de cada paciente vai ao banco; a repetição é atendida pelo cache
+    limpar_cache()
+    ids = [rng.randint(1, tamanho) for _ in range(amostras)]
+    resultados.append(resumir('busca_por_id', tamanho, cronometrar(
+        lambda id_cadastro: buscar_por_id(cursor, id_cadastro), ids)))
+    resultados.append(resumir('busca_repetida_por_id', tamanho, cronometrar(
+        lambda id_cadastro: buscar_por_id(cursor, id_cadastro), ids)))
+
+    limpar_cache()
+    cpfs = [linha[1] for linha in islice(gerar_pacientes(tamanho, semente), 0, tamanho, max(1, tamanho // amostras))]
+    resultados.append(resumir('busca_por_cpf', tamanho, cronometrar(
+        lambda cpf: buscar_por_cpf(cursor, cpf), cpfs)))
+
+    resultados.append(resumir('listagem_pagina', tamanho, cronometrar(
+        lambda id_cadastro: buscar_pagina(cursor, id_cadastro), ids), 20))
+
+    relatorios = {
+        'relatorio_por_genero': (SQL_RELATORIO_GENERO, ('F',)),
+        'relatorio_por_data': (SQL_RELATORIO_DATA, ('2021-03-01 00:00:00', '2021-03-31 23:59:59')),
+        'relatorio_por_local': (SQL_RELATORIO_LOCAL, (normalizar_local(next(iter(CIDADES))),)),
+    }
+    for operacao, (sql, parametros) in relatorios.items():
+        linhas = len(cursor.execute(sql, parametros).fetchall())
+        resultados.append(resumir(operacao, tamanho, cronometrar(
+            lambda _: cursor.execute(sql, parametros).fetchall(), range(REPETICOES_RELATORIO)), linhas))
+
+    caminho_json = os.path.join(diretorio, 'exportacao.json')
+
+    def exportar(_):
+        cursor.execute("SELECT * FROM cadastro")
+        escrever_relatorio(cursor, caminho_json, 'json')
+
+    resultado = resumir('exportacao_json', tamanho, cronometrar(exportar, range(3)),
+                        cursor.execute("SELECT COUNT(*) FROM cadastro").fetchone()[0])
+    resultado['tamanho_mb'] = round(os.path.getsize(caminho_json) / (1024 * 1024), 2)
+    resultados.append(resultado)
+
+    conn.close()
+    return resultados
+
+
+def medir_validadores(amostras, semente):
+    linhas = list(gerar_pacientes(amostras, semente))
+    validadores = {
+        'validar_cpf': (validar_cpf, [linha[1] for linha in linhas]),
+        'validar_telefone': (validar_telefone, [linha[5] for linha in linhas]),
+        'validar_data': (validar_data, [linha[2] for linha in linhas]),
+    }
+    return [resumir(nome, None, cronometrar(funcao, valores)) for nome, (funcao, valores) in validadores.items()]
+
+
+def comparar(resultados, caminho_anterior):
+    with open(caminho_anterior, 'r', encoding='utf-8') as arquivo:
+        anteriores = {(r['operacao'], r['tamanho']): r for r in json.load(arquivo)['resultados']}
+
+    print(f"\nComparação com {caminho_anterior} (p50; negativo é mais rápido):")
+    for resultado in resultados:
+        anterior = anteriores.get((resultado['operacao'], resultado['tamanho']))
+        if anterior and anterior['p50_ms']:
+            variacao = 100 * (resultado['p50_ms'] - anterior['p50_ms']) / anterior['p50_ms']
+            print(f"{resultado['operacao']:<24}{str(resultado['tamanho']):>10}{variacao:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mede vazão e latência de inserções, buscas, listagens, relatórios, exportação e validadores.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO,
+                        help="quantidades de pacientes na base (ex.: 10000 100000 1000000)")
+    parser.add_argument('--amostras', type=int, default=AMOSTRAS_PADRAO,
+                        help=f"operações medidas por tipo (padrão: {AMOSTRAS_PADRAO})")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', default='resultados_benchmark.json', help="arquivo JSON com os resultados")
+    parser.add_argument('--comparar', metavar='ARQUIVO', help="resultados anteriores para comparação")
+    args = parser.parse_args()
+
+    # setup.sql é lido com caminho relativo à raiz do projeto
+    args.saida = os.path.abspath(args.saida)
+    if args.comparar:
+        args.comparar = os.path.abspath(args.comparar)
+    os.chdir(RAIZ_PROJETO)
+
+    resultados = medir_validadores(args.amostras * 10, args.semente)
+    for tamanho in args.tamanhos:
+        with tempfile.TemporaryDirectory() as diretorio:
+            resultados += medir_banco(os.path.join(diretorio, 'benchmark.db'), tamanho,
+                                      args.amostras, args.semente, diretorio)
+
+    print(f"{'operação':<24}{'tamanho':>10}{'ops/s':>12}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}")
+    for resultado in resultados:
+        print(f"{resultado['operacao']:<24}{str(resultado['tamanho'] or '-'):>10}"
+              f"{resultado['por_segundo'] or 0:>12.1f}{resultado['p50_ms']:>11.3f}"
+              f"{resultado['p95_ms']:>11.3f}{resultado['p99_ms']:>11.3f}")
+
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'data': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'semente': args.semente,
+            'resultados': resultados,
+        }, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados salvos em: {args.saida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
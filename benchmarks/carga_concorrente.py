@@ -0,0 +1,124 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conexao import abrir_conexao
+from migracoes import aplicar_migracoes
+
+
+INTERVALO_LINHA_DO_TEMPO = 0.5
+
+# Gravação direta em cadastro, como outro programa faria: os locais desses cadastros
+# não são indexados (ver locais.py), o que não importa em um banco temporário
+SQL_INSERIR = '''
+    INSERT INTO cadastro (nome, cpf, data_nascimento, genero, endereco, telefone, data_registro)
+    VALUES (?, ?, '1980-01-01', 'F', 'Rua 1, Centro, São Paulo', '11912345678', datetime('now'))
+'''
+
+# Leituras típicas de um terminal: página do navegador e relatório por data
+LEITURAS = [
+    ("SELECT * FROM cadastro WHERE id >= ? ORDER BY id LIMIT 20", lambda operacao: (operacao % 1000,)),
+    ("SELECT COUNT(*) FROM cadastro WHERE data_registro BETWEEN ? AND datetime('now')", lambda _: ('2000-01-01',)),
+]
+
+
+def trabalhar(papel, numero, caminho, journal_mode, duracao, barreira, resultados):
+    """Executa operações até o fim da duração e devolve quantas concluiu em cada intervalo."""
+    conn = abrir_conexao(caminho, journal_mode=journal_mode)
+    por_intervalo = [0] * (int(duracao / INTERVALO_LINHA_DO_TEMPO) + 1)
+    travamentos = 0
+    operacao = 0
+
+    barreira.wait()
+    inicio = time.perf_counter()
+    while (decorrido := time.perf_counter() - inicio) < duracao:
+        try:
+            if papel == 'escritor':
+                with conn:
+                    conn.execute(SQL_INSERIR, (f"Carga {numero}-{operacao}", f"{numero:02d}{operacao:09d}"))
+            else:
+                sql, parametros = LEITURAS[operacao % len(LEITURAS)]
+                conn.execute(sql, parametros(operacao)).fetchall()
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            travamentos += 1
+        else:
+            por_intervalo[int(decorrido / INTERVALO_LINHA_DO_TEMPO)] += 1
+        operacao += 1
+
+    conn.close()
+    resultados.put((papel, numero, por_intervalo, travamentos))
+
+
+def executar_carga(caminho, escritores, leitores, duracao, journal_mode):
+    barreira = multiprocessing.Barrier(escritores + leitores)
+    resultados = multiprocessing.Queue()
+    processos = [
+        multiprocessing.Process(target=trabalhar, args=(
+            papel, numero, caminho, journal_mode, duracao, barreira, resultados))
+        for papel, quantidade in (('escritor', escritores), ('leitor', leitores))
+        for numero in range(quantidade)
+    ]
+    for processo in processos:
+        processo.start()
+    # A fila é esvaziada antes do join para não bloquear processos com resultados pendentes
+    coletados = [resultados.get() for _ in processos]
+    for processo in processos:
+        processo.join()
+    return sorted(coletados)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Vários processos gravam e leem o mesmo banco ao mesmo tempo, como terminais de atendimento.")
+    parser.add_argument('--escritores', type=int, default=4)
+    parser.add_argument('--leitores', type=int, default=4)
+    parser.add_argument('--duracao', type=float, default=5.0, help="segundos de carga (padrão: 5)")
+    parser.add_argument('--journal-mode', default='WAL',
+                        help="WAL (padrão) ou DELETE, o modo antigo, para comparação")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, 'carga.db')
+        conn = abrir_conexao(caminho, journal_mode=args.journal_mode)
+        diretorio_original = os.getcwd()
+        # setup.sql é lido com caminho relativo à raiz do projeto
+        os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        try:
+            aplicar_migracoes(conn.cursor())
+        finally:
+            os.chdir(diretorio_original)
+        conn.close()
+
+        coletados = executar_carga(caminho, args.escritores, args.leitores, args.duracao, args.journal_mode)
+
+    print(f"journal_mode={args.journal_mode}, {args.escritores} escritor(es), {args.leitores} leitor(es), "
+          f"{args.duracao}s")
+    intervalos = len(coletados[0][2])
+    print(f"{'processo':<14}{'operações':>11}{'ops/s':>10}{'travamentos':>13}  "
+          f"linha do tempo (operações a cada {INTERVALO_LINHA_DO_TEMPO}s)")
+    for papel, numero, por_intervalo, travamentos in coletados:
+        total = sum(por_intervalo)
+        print(f"{papel + ' ' + str(numero):<14}{total:>11}{total / args.duracao:>10.0f}{travamentos:>13}  "
+              f"{' '.join(f'{quantidade:>5}' for quantidade in por_intervalo)}")
+
+    # Em cada intervalo completo, cada leitor precisa ter avançado e ao menos um escritor
+    # também (os escritores se revezam no único lock de escrita do SQLite)
+    parados = [indice for indice in range(intervalos - 1)
+               if any(por_intervalo[indice] == 0 for papel, _, por_intervalo, _ in coletados if papel == 'leitor')
+               or not any(por_intervalo[indice] for papel, _, por_intervalo, _ in coletados if papel == 'escritor')]
+    if parados:
+        print(f"Intervalos sem progresso simultâneo de leitores e escritores: {len(parados)} de {intervalos - 1}.")
+        exit(1)
+    print("Leitores e escritores avançaram juntos em todos os intervalos.")
+
+
+if __name__ == "__main__":
+    main()
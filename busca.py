@@ -0,0 +1,98 @@
+import re
+
+
+# Índice de texto completo (FTS5) sobre nome, endereço e histórico de doenças.
+# É uma tabela de conteúdo externo: o texto fica apenas em cadastro e os
+# triggers mantêm o índice a cada INSERT/UPDATE/DELETE. remove_diacritics 2
+# ignora acentos como remover_acentos/unidecode, e os índices de prefixo
+# aceleram buscas como "diab*".
+COLUNAS_BUSCA = ('nome', 'endereco', 'historico_doencas')
+
+# Peso de cada coluna no bm25: um termo no nome vale mais que no histórico
+PESOS_BUSCA = (10.0, 3.0, 1.0)
+
+SCRIPT_BUSCA = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS cadastro_fts USING fts5(
+        {', '.join(COLUNAS_BUSCA)},
+        content='cadastro', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_cadastro_fts_insert AFTER INSERT ON cadastro
+    BEGIN
+        INSERT INTO cadastro_fts (rowid, {', '.join(COLUNAS_BUSCA)})
+        VALUES (NEW.id, {', '.join(f'NEW.{coluna}' for coluna in COLUNAS_BUSCA)});
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_cadastro_fts_delete AFTER DELETE ON cadastro
+    BEGIN
+        INSERT INTO cadastro_fts (cadastro_fts, rowid, {', '.join(COLUNAS_BUSCA)})
+        VALUES ('delete', OLD.id, {', '.join(f'OLD.{coluna}' for coluna in COLUNAS_BUSCA)});
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_cadastro_fts_update
+    AFTER UPDATE OF {', '.join(COLUNAS_BUSCA)} ON cadastro
+    BEGIN
+        INSERT INTO cadastro_fts (cadastro_fts, rowid, {', '.join(COLUNAS_BUSCA)})
+        VALUES ('delete', OLD.id, {', '.join(f'OLD.{coluna}' for coluna in COLUNAS_BUSCA)});
+        INSERT INTO cadastro_fts (rowid, {', '.join(COLUNAS_BUSCA)})
+        VALUES (NEW.id, {', '.join(f'NEW.{coluna}' for coluna in COLUNAS_BUSCA)});
+    END;
+'''
+
+SQL_RECONSTRUIR_BUSCA = "INSERT INTO cadastro_fts (cadastro_fts) VALUES ('rebuild')"
+
+SQL_BUSCA = f'''
+    SELECT c.id, c.nome, c.cpf, c.endereco,
+           snippet(cadastro_fts, 2, '[', ']', '...', 8) AS historico_doencas,
+           round(bm25(cadastro_fts, {', '.join(str(peso) for peso in PESOS_BUSCA)}), 2) AS relevancia
+    FROM cadastro_fts
+    JOIN cadastro c ON c.id = cadastro_fts.rowid
+    WHERE cadastro_fts MATCH ?
+    ORDER BY relevancia, c.id
+    LIMIT ? OFFSET ?
+'''
+
+TAMANHO_PAGINA_BUSCA = 20
+
+TERMOS_BUSCA = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def montar_consulta_fts(texto, campos=None):
+    """Converte o texto digitado em uma expressão MATCH do FTS5.
+
+    Palavras soltas precisam aparecer todas, "entre aspas" busca a frase exata
+    e um * no fim da palavra busca pelo prefixo (diab* encontra diabetes).
+    Cada termo vai entre aspas, de modo que pontuação e palavras como OR/NOT
+    não são interpretadas como sintaxe do FTS5.
+    """
+    termos = []
+    for frase, palavra in TERMOS_BUSCA.findall(texto):
+        if frase.strip():
+            termos.append(f'"{frase.strip()}"')
+        elif palavra:
+            prefixo = palavra.endswith('*')
+            palavra = palavra.rstrip('*').replace('"', '')
+            if palavra:
+                termos.append(f'"{palavra}"*' if prefixo else f'"{palavra}"')
+
+    if not termos:
+        raise ValueError("Informe ao menos um termo de busca.")
+
+    consulta = ' '.join(termos)
+    if campos:
+        invalidos = set(campos) - set(COLUNAS_BUSCA)
+        if invalidos:
+            raise ValueError(f"Campo de busca inválido: {', '.join(sorted(invalidos))}.")
+        consulta = f"{{{' '.join(campos)}}} : ({consulta})"
+    return consulta
+
+
+def buscar_pacientes(cursor, texto, pagina=0, tamanho_pagina=TAMANHO_PAGINA_BUSCA, campos=None):
+    """Busca pacientes por relevância e retorna (colunas, linhas da página, há próxima página)."""
+    consulta = montar_consulta_fts(texto, campos)
+    # Uma linha a mais indica se existe próxima página sem precisar de COUNT(*)
+    cursor.execute(SQL_BUSCA, (consulta, tamanho_pagina + 1, pagina * tamanho_pagina))
+    linhas = cursor.fetchall()
+    headers = [description[0] for description in cursor.description]
+    return headers, linhas[:tamanho_pagina], len(linhas) > tamanho_pagina
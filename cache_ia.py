@@ -0,0 +1,144 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from unidecode import unidecode
+
+
+CAMINHO_CACHE = 'database//cache_ia.db'
+TTL_PADRAO = 30 * 24 * 60 * 60  # 30 dias, em segundos
+MAXIMO_ENTRADAS = 10000
+
+# Definir ASSIST_IA_SEM_CACHE=1 ignora o cache em todas as consultas
+VARIAVEL_SEM_CACHE = 'ASSIST_IA_SEM_CACHE'
+
+estatisticas = {'acertos': 0, 'falhas': 0}
+
+_conexao = None
+_trava = threading.Lock()
+
+
+def cache_desativado():
+    return os.environ.get(VARIAVEL_SEM_CACHE, '').lower() in ('1', 'sim', 'true')
+
+
+def _normalizar_texto(valor):
+    texto = unidecode(str(valor or '')).lower()
+    return re.sub(r'\s+', ' ', texto).strip(' .;,')
+
+
+def _normalizar_numero(valor, casas):
+    try:
+        return round(float(valor), casas)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalizar_perfil(registro):
+    """Campos clínicos do registro que definem a resposta da IA, em forma canônica."""
+    historico = _normalizar_texto(registro[13])
+    if historico in ('nenhum', 'nenhuma', 'nao', 'n/a', '-'):
+        historico = ''
+
+    return {
+        'pressao_arterial': _normalizar_texto(registro[7]).replace(',', '.'),
+        'altura': _normalizar_numero(registro[8], 2),
+        'peso': _normalizar_numero(registro[9], 0),
+        'frequencia_atividades_sem': _normalizar_texto(registro[10]),
+        'sono_regular': _normalizar_texto(registro[11]),
+        'dieta_planejada': _normalizar_texto(registro[12]),
+        'historico_doencas': historico,
+    }
+
+
+def chave_perfil(registro):
+    perfil = json.dumps(normalizar_perfil(registro), sort_keys=True)
+    return hashlib.sha256(perfil.encode('utf-8')).hexdigest()
+
+
+def abrir_cache(caminho=CAMINHO_CACHE):
+    conn = sqlite3.connect(os.path.abspath(caminho), check_same_thread=False)
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS cache_ia (
+            chave TEXT PRIMARY KEY,
+            resposta TEXT NOT NULL,
+            criado_em REAL NOT NULL,
+            ultimo_acesso REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_cache_ia_ultimo_acesso ON cache_ia (ultimo_acesso);
+    ''')
+    return conn
+
+
+def _obter_conexao():
+    global _conexao
+    if _conexao is None:
+        _conexao = abrir_cache()
+    return _conexao
+
+
+def buscar_no_cache(chave, ttl=TTL_PADRAO, conn=None):
+    with _trava:
+        conn = conn or _obter_conexao()
+        agora = time.time()
+        linha = conn.execute(
+            "SELECT resposta, criado_em FROM cache_ia WHERE chave = ?", (chave,)).fetchone()
+
+        if linha is None or agora - linha[1] > ttl:
+            if linha is not None:
+                with conn:
+                    conn.execute("DELETE FROM cache_ia WHERE chave = ?", (chave,))
+            estatisticas['falhas'] += 1
+            return None
+
+        with conn:
+            conn.execute("UPDATE cache_ia SET ultimo_acesso = ? WHERE chave = ?", (agora, chave))
+        estatisticas['acertos'] += 1
+        return linha[0]
+
+
+def gravar_no_cache(chave, resposta, maximo_entradas=MAXIMO_ENTRADAS, conn=None):
+    with _trava:
+        conn = conn or _obter_conexao()
+        agora = time.time()
+        with conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO cache_ia (chave, resposta, criado_em, ultimo_acesso)
+                VALUES (?, ?, ?, ?)
+            ''', (chave, resposta, agora, agora))
+
+            # Remove as entradas usadas há mais tempo quando o limite é ultrapassado
+            excedente = conn.execute("SELECT COUNT(*) FROM cache_ia").fetchone()[0] - maximo_entradas
+            if excedente > 0:
+                conn.execute('''
+                    DELETE FROM cache_ia WHERE chave IN (
+                        SELECT chave FROM cache_ia ORDER BY ultimo_acesso LIMIT ?
+                    )
+                ''', (excedente,))
+                logging.info(f"Cache da IA: {excedente} entrada(s) removida(s) por LRU.")
+
+
+def remover_expirados(ttl=TTL_PADRAO, conn=None):
+    with _trava:
+        conn = conn or _obter_conexao()
+        with conn:
+            return conn.execute(
+                "DELETE FROM cache_ia WHERE criado_em < ?", (time.time() - ttl,)).rowcount
+
+
+def estatisticas_cache(conn=None):
+    with _trava:
+        conn = conn or _obter_conexao()
+        entradas = conn.execute("SELECT COUNT(*) FROM cache_ia").fetchone()[0]
+    consultas = estatisticas['acertos'] + estatisticas['falhas']
+    return {
+        'acertos': estatisticas['acertos'],
+        'falhas': estatisticas['falhas'],
+        'taxa_acerto': estatisticas['acertos'] / consultas if consultas else 0.0,
+        'entradas': entradas,
+    }
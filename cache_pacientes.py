@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from conexao import Conexao, registrar_fim_transacao
+from metricas import definir, fixar_contador, registrar_coletor
+
+
+# Cache em memória dos pacientes lidos por repositorio.buscar_por_id e buscar_por_cpf:
+# uma busca repetida é atendida sem consultar o SQLite. As escritas de repositorio.py
+# invalidam as entradas na hora; alterações feitas por outro processo (outro terminal,
+# a CLI) aparecem em no máximo TTL_PADRAO segundos. Variáveis de ambiente:
+# - ASSIST_CACHE_PACIENTES=0 desliga o cache;
+# - ASSIST_CACHE_PACIENTES_TTL e ASSIST_CACHE_PACIENTES_MAXIMO trocam a validade
+#   (segundos) e o número de pacientes mantidos.
+CACHE_ATIVO = os.environ.get('ASSIST_CACHE_PACIENTES', '1') != '0'
+TTL_PADRAO = float(os.environ.get('ASSIST_CACHE_PACIENTES_TTL', 30))
+MAXIMO_ENTRADAS = int(os.environ.get('ASSIST_CACHE_PACIENTES_MAXIMO', 5000))
+
+estatisticas = {'acertos': 0, 'falhas': 0, 'invalidacoes': 0, 'descartes': 0}
+
+_trava = threading.Lock()
+_por_id = OrderedDict()  # id -> (paciente, validade), do uso mais antigo para o mais recente
+_por_cpf = {}  # cpf -> id
+# Conexão -> ids alterados em uma transação ainda aberta. Outra conexão ainda lê a
+# versão anterior desses pacientes, então eles não entram no cache até o commit (ou
+# rollback), avisado por Conexao (conexao.py) em fim_transacao
+_pendentes = {}
+# Muda a cada invalidação: uma leitura iniciada antes dela não é guardada
+_geracao = 0
+
+
+def chave_id(valor):
+    """id como inteiro, ou None para valores que não são um id (a busca vai direto ao banco)."""
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str) and valor.isdigit():
+        return int(valor)
+    return None
+
+
+def _em_transacao(conn):
+    try:
+        return conn.in_transaction
+    except sqlite3.ProgrammingError:
+        # Conexão já fechada: a transação terminou junto com ela
+        return False
+
+
+def _liberar_pendentes():
+    # Só para conexões que não são Conexao (ex.: sqlite3.connect direto), que não avisam o
+    # fim da transação: consulta in_transaction, o que pode liberar um pouco antes do commit
+    global _geracao
+    if not _pendentes:
+        return
+    for conn in [conn for conn in _pendentes if not isinstance(conn, Conexao) and not _em_transacao(conn)]:
+        del _pendentes[conn]
+        _geracao += 1
+
+
+def fim_transacao(conn):
+    global _geracao
+    # Só a thread da própria conexão inclui conn em _pendentes, então a verificação sem a trava basta
+    if conn not in _pendentes:
+        return
+    with _trava:
+        if _pendentes.pop(conn, None) is not None:
+            _geracao += 1
+
+
+def _descartar(id_cadastro):
+    entrada = _por_id.pop(id_cadastro, None)
+    if entrada is not None and _por_cpf.get(entrada[0].cpf) == id_cadastro:
+        del _por_cpf[entrada[0].cpf]
+    return entrada is not None
+
+
+def _consultar(id_cadastro):
+    # Chamada com a trava: devolve (paciente, None) no acerto e (None, geração) na falha
+    entrada = _por_id.get(id_cadastro)
+    if entrada is not None:
+        if entrada[1] > time.monotonic():
+            _por_id.move_to_end(id_cadastro)
+            estatisticas['acertos'] += 1
+            return entrada[0], None
+        _descartar(id_cadastro)
+    estatisticas['falhas'] += 1
+    _liberar_pendentes()
+    return None, _geracao
+
+
+def obter(id_cadastro):
+    """(paciente, None) se o id está no cache; senão (None, geração), a ser repassada para guardar."""
+    if not CACHE_ATIVO:
+        return None, None
+    with _trava:
+        return _consultar(id_cadastro)
+
+
+def obter_por_cpf(cpf):
+    if not CACHE_ATIVO:
+        return None, None
+    with _trava:
+        id_cadastro = _por_cpf.get(cpf)
+        if id_cadastro is None:
+            estatisticas['falhas'] += 1
+            _liberar_pendentes()
+            return None, _geracao
+        return _consultar(id_cadastro)
+
+
+def guardar(paciente, geracao):
+    """Guarda o paciente lido do banco, se nada foi invalidado desde obter (que deu a geração)."""
+    if paciente is None or geracao is None:
+        return
+    with _trava:
+        _liberar_pendentes()
+        if geracao != _geracao or _pendentes and any(paciente.id in ids for ids in _pendentes.values()):
+            return
+        _descartar(paciente.id)
+        _por_id[paciente.id] = (paciente, time.monotonic() + TTL_PADRAO)
+        _por_cpf[paciente.cpf] = paciente.id
+        while len(_por_id) > MAXIMO_ENTRADAS:
+            _descartar(next(iter(_por_id)))
+            estatisticas['descartes'] += 1
+
+
+def invalidar(conn, ids, cpfs=()):
+    """Chamada depois de cada escrita em cadastro, na conexão que escreveu."""
+    global _geracao
+    if not CACHE_ATIVO:
+        return
+    with _trava:
+        _geracao += 1
+        ids = {chave for chave in map(chave_id, ids) if chave is not None}
+        if _em_transacao(conn):
+            _pendentes.setdefault(conn, set()).update(ids)
+        for id_cadastro in ids:
+            estatisticas['invalidacoes'] += _descartar(id_cadastro)
+        for cpf in cpfs:
+            id_cadastro = _por_cpf.pop(cpf, None)
+            if id_cadastro is not None:
+                estatisticas['invalidacoes'] += _descartar(id_cadastro)
+
+
+def limpar_cache():
+    global _geracao
+    with _trava:
+        _geracao += 1
+        _por_id.clear()
+        _por_cpf.clear()
+
+
+def estatisticas_cache():
+    with _trava:
+        entradas = len(_por_id)
+        copia = dict(estatisticas)
+    consultas = copia['acertos'] + copia['falhas']
+    return dict(copia, taxa_acerto=copia['acertos'] / consultas if consultas else 0.0, entradas=entradas)
+
+
+def _exportar_metricas():
+    atuais = estatisticas_cache()
+    fixar_contador('cache_pacientes_consultas_total', atuais['acertos'], resultado='acerto')
+    fixar_contador('cache_pacientes_consultas_total', atuais['falhas'], resultado='falha')
+    fixar_contador('cache_pacientes_invalidacoes_total', atuais['invalidacoes'])
+    fixar_contador('cache_pacientes_descartes_total', atuais['descartes'])
+    definir('cache_pacientes_entradas', atuais['entradas'])
+
+
+registrar_coletor(_exportar_metricas)
+registrar_fim_transacao(fim_transacao)
@@ -0,0 +1,330 @@
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+
+from conexao import CAMINHO_BANCO_DADOS, abrir_conexao
+from importacao import TAMANHO_LOTE_PADRAO, importar_pacientes
+from locais import normalizar_local
+from log_estruturado import medir_operacao
+from main import (FORMATOS_RELATORIO, atualizar_pacientes, configurar_logging, enfileirar_sugestao_ia,
+                  escrever_registros, executar_setup, gravar_relatorio, remover_pacientes, validar_alteracoes,
+                  validar_data, validar_genero, validar_local, validar_paciente)
+from repositorio import (COLUNAS_ATUALIZAVEIS, COLUNAS_CADASTRO, SQL_PAGINA, SQL_RELATORIO_DATA, SQL_RELATORIO_GENERO,
+                         SQL_RELATORIO_LOCAL, SQL_TODOS, buscar_ids, buscar_por_id, ids_existentes, inserir)
+
+
+# Códigos de saída (2 é usado pelo argparse para erros de uso)
+SAIDA_OK = 0
+SAIDA_ERRO = 1
+SAIDA_INVALIDO = 3
+SAIDA_NAO_ENCONTRADO = 4
+SAIDA_CONFLITO = 5
+
+FORMATOS_LISTAGEM = ['ndjson', 'json', 'tabela']
+FORMATOS_TEXTO = ('json', 'ndjson')
+
+
+class ErroCli(Exception):
+    def __init__(self, codigo, mensagem, detalhes=()):
+        super().__init__(mensagem)
+        self.codigo = codigo
+        self.mensagem = mensagem
+        self.detalhes = detalhes
+
+
+def imprimir_json(conteudo):
+    print(json.dumps(conteudo, ensure_ascii=False, default=str))
+
+
+def ler_dados(args):
+    """Junta os campos de --dados (arquivo JSON ou '-' para stdin) com os informados por opção."""
+    dados = {}
+    if args.dados:
+        try:
+            if args.dados == '-':
+                dados = json.load(sys.stdin)
+            else:
+                with open(args.dados, 'r', encoding='utf-8') as arquivo:
+                    dados = json.load(arquivo)
+        except json.JSONDecodeError as e:
+            raise ErroCli(SAIDA_INVALIDO, f"JSON inválido em --dados: {e}")
+        if not isinstance(dados, dict):
+            raise ErroCli(SAIDA_INVALIDO, "--dados deve conter um objeto JSON.")
+
+    for coluna in COLUNAS_CADASTRO:
+        valor = getattr(args, coluna, None)
+        if valor is not None:
+            dados[coluna] = valor
+    return dados
+
+
+def validar(dados):
+    paciente, erros = validar_paciente(dados)
+    if erros:
+        raise ErroCli(SAIDA_INVALIDO, "Dados do paciente inválidos.", erros)
+    return paciente
+
+
+def buscar_registro(cursor, id_cadastro):
+    registro = buscar_por_id(cursor, id_cadastro)
+    if registro is None:
+        raise ErroCli(SAIDA_NAO_ENCONTRADO, f"Registro com ID {id_cadastro} não encontrado.")
+    return registro._asdict()
+
+
+def selecionar_ids(cursor, args):
+    """IDs informados (todos precisam existir) ou os que atendem aos --filtro."""
+    if bool(args.ids) == bool(args.filtro):
+        raise ErroCli(SAIDA_INVALIDO, "Informe os IDs ou --filtro (um dos dois).")
+    if args.filtro:
+        try:
+            return buscar_ids(cursor, '; '.join(args.filtro))
+        except ValueError as e:
+            raise ErroCli(SAIDA_INVALIDO, str(e))
+
+    existentes = set(ids_existentes(cursor, args.ids))
+    faltando = [id_cadastro for id_cadastro in args.ids if id_cadastro not in existentes]
+    if faltando:
+        raise ErroCli(SAIDA_NAO_ENCONTRADO,
+                      f"Registro(s) com ID {', '.join(map(str, faltando))} não encontrado(s). Nada foi alterado.")
+    return list(dict.fromkeys(args.ids))
+
+
+def saida_para(args, cursor, primeiros=()):
+    """Grava o cursor em --saida, ou em stdout para json/ndjson, e retorna o total de registros."""
+    if args.saida in (None, '-'):
+        if args.formato not in FORMATOS_TEXTO:
+            raise ErroCli(SAIDA_INVALIDO, f"O formato {args.formato} exige --saida com o caminho do arquivo.")
+        return escrever_registros(cursor, sys.stdout, args.formato, primeiros)
+
+    total = gravar_relatorio(cursor, args.saida, args.formato, primeiros)
+    if total is None:
+        raise ErroCli(SAIDA_ERRO, f"A exportação em {args.formato} não está disponível.")
+    return total
+
+
+###         SUBCOMANDOS         ###
+
+
+def comando_criar(conn, args):
+    paciente = validar(ler_dados(args))
+    cursor = conn.cursor()
+    try:
+        with conn:
+            id_cadastro = inserir(cursor, paciente)
+            enfileirar_sugestao_ia(cursor, id_cadastro)
+    except sqlite3.IntegrityError:
+        raise ErroCli(SAIDA_CONFLITO, f"O CPF {paciente['cpf']} já está em uso.")
+    logging.info(f"Registro criado pela CLI. ID: {id_cadastro}")
+    imprimir_json(buscar_registro(cursor, id_cadastro))
+
+
+def comando_listar(conn, args):
+    cursor = conn.cursor()
+    # LIMIT -1 no SQLite é sem limite: a mesma instrução serve com ou sem --limite
+    cursor.execute(SQL_PAGINA, (args.a_partir_do_id, args.limite or -1))
+
+    if args.formato == 'tabela':
+        from main import formatar_tabela
+        registros = cursor.fetchall()
+        print(formatar_tabela(registros, headers=[description[0] for description in cursor.description],
+                              tablefmt="pretty"))
+    else:
+        escrever_registros(cursor, sys.stdout, args.formato)
+
+
+def comando_atualizar(conn, args):
+    cursor = conn.cursor()
+    ids = selecionar_ids(cursor, args)
+    # Só os campos informados são validados e gravados; id e data_registro vindos de --dados são ignorados
+    alteracoes, erros = validar_alteracoes(
+        {campo: valor for campo, valor in ler_dados(args).items() if campo in COLUNAS_ATUALIZAVEIS})
+    if erros:
+        raise ErroCli(SAIDA_INVALIDO, "Dados do paciente inválidos.", erros)
+    if 'cpf' in alteracoes and len(ids) > 1:
+        raise ErroCli(SAIDA_INVALIDO, "O CPF só pode ser alterado em um registro por vez.")
+
+    if args.simular:
+        imprimir_json({'encontrados': len(ids), 'ids': ids})
+        return
+    if not alteracoes:
+        raise ErroCli(SAIDA_INVALIDO, "Informe ao menos um campo para alterar.")
+    try:
+        # Todos os registros em uma única transação
+        with conn:
+            alterados = atualizar_pacientes(cursor, ids, alteracoes)
+    except sqlite3.IntegrityError:
+        # Sem troca de CPF, a violação não é de CPF repetido: segue como erro do banco
+        if 'cpf' not in alteracoes:
+            raise
+        raise ErroCli(SAIDA_CONFLITO, f"O CPF {alteracoes['cpf']} já está em uso.")
+    logging.info(f"Registros atualizados pela CLI: {alterados}, campos {sorted(alteracoes)}.")
+
+    if len(ids) == 1 and not args.filtro:
+        imprimir_json(buscar_registro(cursor, ids[0]))
+    else:
+        imprimir_json({'atualizados': alterados, 'ids': ids})
+
+
+def comando_excluir(conn, args):
+    cursor = conn.cursor()
+    # IDs inexistentes interrompem antes de qualquer exclusão
+    ids = selecionar_ids(cursor, args)
+    if args.simular:
+        imprimir_json({'encontrados': len(ids), 'ids': ids})
+        return
+    with conn:
+        remover_pacientes(cursor, ids)
+    logging.info(f"Registros excluídos pela CLI. IDs: {ids}")
+    imprimir_json({'excluidos': ids})
+
+
+def comando_relatorio(conn, args):
+    if args.tipo == 'genero':
+        if not validar_genero(args.genero):
+            raise ErroCli(SAIDA_INVALIDO, "Gênero inválido. Use M, F ou N.")
+        sql, parametros = SQL_RELATORIO_GENERO, (args.genero.upper(),)
+    elif args.tipo == 'data':
+        if not validar_data(args.data_inicial) or not validar_data(args.data_final):
+            raise ErroCli(SAIDA_INVALIDO, "Datas inválidas. Use YYYY-MM-DD.")
+        sql, parametros = SQL_RELATORIO_DATA, (f"{args.data_inicial} 00:00:00", f"{args.data_final} 23:59:59")
+    else:
+        if not args.local.strip() or not validar_local(args.local):
+            raise ErroCli(SAIDA_INVALIDO, "Local inválido.")
+        sql, parametros = SQL_RELATORIO_LOCAL, (normalizar_local(args.local),)
+
+    cursor = conn.cursor()
+    cursor.execute(sql, parametros)
+    total = saida_para(args, cursor)
+    logging.info(f"Relatório por {args.tipo} gerado pela CLI: {total} registro(s).")
+
+
+def comando_importar(conn, args):
+    try:
+        resumo = importar_pacientes(conn, args.arquivo, args.rejeitados, args.lote)
+    except ValueError as e:
+        raise ErroCli(SAIDA_INVALIDO, str(e))
+    imprimir_json(resumo)
+    if resumo['rejeitados']:
+        return SAIDA_INVALIDO
+
+
+def comando_exportar(conn, args):
+    cursor = conn.cursor()
+    cursor.execute(SQL_TODOS)
+    total = saida_para(args, cursor)
+    logging.info(f"Exportação do cadastro pela CLI: {total} registro(s).")
+
+
+def adicionar_campos(parser):
+    parser.add_argument('--dados', metavar='ARQUIVO',
+                        help="objeto JSON com os campos do paciente ('-' lê da entrada padrão)")
+    for coluna in COLUNAS_CADASTRO:
+        parser.add_argument(f"--{coluna.replace('_', '-')}", dest=coluna)
+
+
+def adicionar_selecao(parser):
+    parser.add_argument('ids', type=int, nargs='*', metavar='id')
+    parser.add_argument('--filtro', action='append', metavar='CONDICAO',
+                        help="ex.: 'genero=F', 'data_registro<2020-01-01', 'local=Recife', 'nome~Silva' "
+                             "(repetido ou separado por ';', todas precisam valer)")
+    parser.add_argument('--simular', action='store_true',
+                        help="só mostra quantos e quais registros seriam afetados")
+
+
+def adicionar_saida(parser, formatos):
+    parser.add_argument('--formato', choices=formatos, default=formatos[0])
+    parser.add_argument('--saida', metavar='ARQUIVO',
+                        help="arquivo de destino (padrão: saída padrão, só para json/ndjson)")
+
+
+def montar_parser():
+    parser = argparse.ArgumentParser(
+        description="Operações do cadastro sem interação, para scripts e tarefas agendadas.",
+        epilog=f"Códigos de saída: {SAIDA_OK} sucesso, {SAIDA_ERRO} erro, 2 uso incorreto, "
+               f"{SAIDA_INVALIDO} dados inválidos, {SAIDA_NAO_ENCONTRADO} não encontrado, "
+               f"{SAIDA_CONFLITO} CPF já cadastrado.")
+    parser.add_argument('--banco', default=CAMINHO_BANCO_DADOS,
+                        help=f"arquivo do banco de dados (padrão: {CAMINHO_BANCO_DADOS})")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    criar = subcomandos.add_parser('create', help="cria um paciente")
+    adicionar_campos(criar)
+    criar.set_defaults(funcao=comando_criar)
+
+    listar = subcomandos.add_parser('list', help="lista pacientes em ordem de ID")
+    listar.add_argument('--a-partir-do-id', type=int, default=0)
+    listar.add_argument('--limite', type=int, default=0, help="quantidade máxima (padrão: todos)")
+    listar.add_argument('--formato', choices=FORMATOS_LISTAGEM, default=FORMATOS_LISTAGEM[0])
+    listar.set_defaults(funcao=comando_listar)
+
+    atualizar = subcomandos.add_parser('update', help="altera só os campos informados, em um ou mais pacientes")
+    adicionar_selecao(atualizar)
+    adicionar_campos(atualizar)
+    atualizar.set_defaults(funcao=comando_atualizar)
+
+    excluir = subcomandos.add_parser('delete', help="exclui um ou mais pacientes")
+    adicionar_selecao(excluir)
+    excluir.set_defaults(funcao=comando_excluir)
+
+    relatorio = subcomandos.add_parser('report', help="relatório por gênero, data ou local")
+    tipos = relatorio.add_subparsers(dest='tipo', required=True)
+    por_genero = tipos.add_parser('genero')
+    por_genero.add_argument('genero', help="M, F ou N")
+    por_data = tipos.add_parser('data')
+    por_data.add_argument('data_inicial', help="YYYY-MM-DD")
+    por_data.add_argument('data_final', help="YYYY-MM-DD")
+    por_local = tipos.add_parser('local')
+    por_local.add_argument('local')
+    for tipo in (por_genero, por_data, por_local):
+        adicionar_saida(tipo, FORMATOS_RELATORIO)
+        tipo.set_defaults(funcao=comando_relatorio)
+
+    importar = subcomandos.add_parser('import', help="importa um CSV ou JSONL (sai com 3 se houver rejeições)")
+    importar.add_argument('arquivo')
+    importar.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO)
+    importar.add_argument('--rejeitados', help="arquivo JSONL com as linhas rejeitadas")
+    importar.set_defaults(funcao=comando_importar)
+
+    exportar = subcomandos.add_parser('export', help="exporta todo o cadastro")
+    adicionar_saida(exportar, FORMATOS_RELATORIO)
+    exportar.set_defaults(funcao=comando_exportar)
+
+    return parser
+
+
+def main(argumentos=None):
+    args = montar_parser().parse_args(argumentos)
+    configurar_logging()
+
+    try:
+        conn = abrir_conexao(args.banco)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Erro ao conectar ao banco de dados: {e}", file=sys.stderr)
+        return SAIDA_ERRO
+
+    try:
+        executar_setup(conn.cursor())
+        with medir_operacao(f"cli_{args.comando}") as medicao:
+            try:
+                return args.funcao(conn, args) or SAIDA_OK
+            except ErroCli as e:
+                medicao.resultado = f"saida_{e.codigo}"
+                raise
+    except ErroCli as e:
+        print(e.mensagem, file=sys.stderr)
+        for detalhe in e.detalhes:
+            print(f"- {detalhe}", file=sys.stderr)
+        return e.codigo
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Erro na CLI ({args.comando}): {e}")
+        print(f"Erro: {e}", file=sys.stderr)
+        return SAIDA_ERRO
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
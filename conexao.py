@@ -0,0 +1,120 @@
+import logging
+import os
+import sqlite3
+import threading
+
+from locais import registrar_funcoes
+
+
+CAMINHO_BANCO_DADOS = 'database//atendimento_medico.db'
+
+# Pragmas aplicados a cada conexão. Cada um pode ser trocado por uma variável de
+# ambiente ASSIST_BD_<NOME> (ex.: ASSIST_BD_BUSY_TIMEOUT=10000).
+# - WAL permite que leitores continuem lendo enquanto outro terminal grava;
+# - synchronous NORMAL só sincroniza o disco nos checkpoints, o que é seguro em WAL;
+# - busy_timeout faz o escritor esperar a vez em vez de falhar com "database is locked";
+# - cache_size negativo é em KiB por conexão; mmap_size em bytes.
+PRAGMAS_PADRAO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+PREFIXO_VARIAVEIS = 'ASSIST_BD_'
+
+# Instruções compiladas mantidas por conexão; as consultas de repositorio.py e dos
+# relatórios são constantes e cabem folgadas, sem recompilação entre chamadas
+INSTRUCOES_EM_CACHE = 256
+
+_locais = threading.local()
+_ao_fim_transacao = []
+
+
+def configuracao_pragmas(**alteracoes):
+    """Pragmas padrão, sobrescritos pelas variáveis de ambiente e depois pelos argumentos."""
+    pragmas = dict(PRAGMAS_PADRAO)
+    for nome in pragmas:
+        valor = os.environ.get(PREFIXO_VARIAVEIS + nome.upper())
+        if valor:
+            pragmas[nome] = valor
+    pragmas.update(alteracoes)
+    return pragmas
+
+
+def aplicar_pragmas(conn, pragmas):
+    for nome, valor in pragmas.items():
+        # Nomes vêm de PRAGMAS_PADRAO; valores são números ou palavras-chave do SQLite
+        if nome not in PRAGMAS_PADRAO or not str(valor).lstrip('-').isalnum():
+            raise ValueError(f"Pragma inválido: {nome} = {valor}")
+        conn.execute(f"PRAGMA {nome} = {valor}")
+
+    modo = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if modo.lower() != str(pragmas['journal_mode']).lower():
+        # Bancos em sistemas de arquivos de rede ou somente leitura não aceitam WAL
+        logging.warning(f"journal_mode {pragmas['journal_mode']} indisponível; usando {modo}.")
+
+
+def registrar_fim_transacao(funcao):
+    """funcao(conn) é chamada quando uma transação de Conexao termina, já visível às outras conexões."""
+    _ao_fim_transacao.append(funcao)
+
+
+class Conexao(sqlite3.Connection):
+    # in_transaction, lido de outra thread, já é falso enquanto o COMMIT ainda está sendo
+    # gravado; só a própria conexão sabe quando ele terminou. "with conn" não passa por
+    # commit/rollback daqui, por isso __exit__ também avisa.
+    def _avisar_fim_transacao(self):
+        for funcao in _ao_fim_transacao:
+            funcao(self)
+
+    def commit(self):
+        super().commit()
+        self._avisar_fim_transacao()
+
+    def rollback(self):
+        super().rollback()
+        self._avisar_fim_transacao()
+
+    def __exit__(self, *excecao):
+        try:
+            return super().__exit__(*excecao)
+        finally:
+            self._avisar_fim_transacao()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._avisar_fim_transacao()
+
+
+def abrir_conexao(caminho=CAMINHO_BANCO_DADOS, **pragmas):
+    """Abre uma conexão nova, com os pragmas configurados e as funções usadas pelos triggers."""
+    conn = sqlite3.connect(os.path.abspath(caminho), cached_statements=INSTRUCOES_EM_CACHE, factory=Conexao)
+    try:
+        aplicar_pragmas(conn, configuracao_pragmas(**pragmas))
+        registrar_funcoes(conn)
+    except (sqlite3.Error, ValueError):
+        conn.close()
+        raise
+    return conn
+
+
+def conexao_da_thread(caminho=CAMINHO_BANCO_DADOS):
+    """Uma conexão por thread e por banco, reaproveitada nas chamadas seguintes da mesma thread."""
+    conexoes = getattr(_locais, 'conexoes', None)
+    if conexoes is None:
+        conexoes = _locais.conexoes = {}
+
+    caminho = os.path.abspath(caminho)
+    if caminho not in conexoes:
+        conexoes[caminho] = abrir_conexao(caminho)
+    return conexoes[caminho]
+
+
+def fechar_conexoes_da_thread():
+    for conn in getattr(_locais, 'conexoes', {}).values():
+        conn.close()
+    _locais.conexoes = {}
@@ -0,0 +1,316 @@
+import argparse
+import csv
+import json
+import logging
+import sqlite3
+import time
+
+import numpy as np
+
+from main import FREQUENCIA_ATIVIDADES_SEM_OPCOES, PRESSAO_ARTERIAL_OPCOES
+from repositorio import COLUNAS_CADASTRO, SQL_INSERIR_CADASTRO, indexar_locais
+from validacao_lote import PESOS_DIGITO1, PESOS_DIGITO2
+
+
+# Cidades com peso aproximado pela população, para que poucos locais concentrem a maioria dos cadastros
+CIDADES = {
+    'São Paulo': 12.3, 'Rio de Janeiro': 6.7, 'Brasília': 3.0, 'Salvador': 2.9, 'Fortaleza': 2.7,
+    'Belo Horizonte': 2.5, 'Manaus': 2.2, 'Curitiba': 1.9, 'Recife': 1.7, 'Goiânia': 1.5,
+    'Belém': 1.5, 'Porto Alegre': 1.5, 'São Luís': 1.1, 'Maceió': 1.0, 'Natal': 0.9,
+    'João Pessoa': 0.8, 'Florianópolis': 0.5, 'Cuiabá': 0.6, 'Vitória': 0.4, 'Niterói': 0.5,
+}
+DDDS = [11, 21, 61, 71, 85, 31, 92, 41, 81, 62, 91, 51, 98, 82, 84, 83, 48, 65, 27, 21]
+BAIRROS = ['Centro', 'Jardim América', 'Vila Nova', 'Boa Vista', 'Santa Cecília', 'Liberdade',
+           'São José', 'Bela Vista', 'Consolação', 'Glória', 'Santa Teresa', 'Jardim Paulista']
+LOGRADOUROS = ['Rua das Flores', 'Avenida Brasil', 'Rua São João', 'Rua XV de Novembro', 'Avenida Paulista',
+               'Rua Sete de Setembro', 'Rua da Conceição', 'Travessa do Comércio', 'Rua Getúlio Vargas']
+NOMES_FEMININOS = ['Ana', 'Maria', 'Francisca', 'Paula', 'Luíza', 'Juliana', 'Fernanda', 'Camila', 'Letícia']
+NOMES_MASCULINOS = ['João', 'José', 'Antônio', 'Carlos', 'Lucas', 'Pedro', 'Marcos', 'Rafael', 'Gabriel']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+              'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Araújo', 'Conceição']
+
+# (valor, peso): a maior parte dos pacientes tem pressão normal e pouca atividade física
+GENEROS = {'F': 0.51, 'M': 0.47, 'N': 0.02}
+PESOS_PRESSAO = {
+    '12/8': 30, '11/7.5': 14, '13/8.5': 14, '12.5/8.8': 8, '14.5/9.5': 8, '15/8.8': 5,
+    '16.5/10': 3, '16/11': 3, '19/13': 1, '18/12': 1, '8.5/5.5': 2, '9/6': 3, 'Não listado': 8,
+}
+PESOS_ATIVIDADE = [30, 25, 18, 12, 8, 7]
+HISTORICOS = {
+    '': 45, 'hipertensão': 12, 'diabetes tipo 2': 8, 'asma': 6, 'hipotireoidismo': 4,
+    'hipertensão e diabetes tipo 2': 5, 'enxaqueca crônica': 4, 'colesterol alto': 7,
+    'depressão': 4, 'gastrite': 5,
+}
+
+INICIO_REGISTROS = np.datetime64('2016-01-01T00:00:00', 's')
+ANOS_DE_REGISTROS = 8
+DATA_REFERENCIA_IDADE = np.datetime64('2024-01-01', 'D')
+
+# Atendimentos concentrados no horário comercial
+PESOS_HORA = np.array([0, 0, 0, 0, 0, 0, 1, 4, 8, 9, 9, 8, 5, 6, 8, 8, 7, 6, 4, 2, 1, 0, 0, 0], dtype=float)
+
+# Multiplicador coprimo com 10^9: i -> (i * MULTIPLICADOR) % 10^9 é uma permutação,
+# então as bases de CPF nunca se repetem dentro de um mesmo deslocamento
+MULTIPLICADOR_CPF = 387420489
+MODULO_CPF = 10 ** 9
+POTENCIAS_BASE_CPF = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+TAMANHO_BLOCO = 100_000
+
+
+def _normalizar(pesos):
+    pesos = np.asarray(list(pesos), dtype=float)
+    return pesos / pesos.sum()
+
+
+def _sortear(rng, opcoes, pesos, quantidade):
+    valores = np.empty(len(opcoes), dtype=object)
+    valores[:] = list(opcoes)
+    return valores[rng.choice(len(opcoes), size=quantidade, p=_normalizar(pesos))]
+
+
+def gerar_cpfs(indices, deslocamento=0):
+    """CPFs válidos para cada índice, com os mesmos pesos de validar_cpf/validar_cpfs_em_lote."""
+    bases = (np.asarray(indices, dtype=np.int64) * MULTIPLICADOR_CPF + deslocamento) % MODULO_CPF
+    digitos = (bases[:, None] // POTENCIAS_BASE_CPF) % 10
+
+    # Dígitos todos iguais geram um CPF inválido; troca o último dígito (10 das 10^9
+    # bases, de modo que uma colisão com outro índice é improvável, mas possível)
+    iguais = np.all(digitos == digitos[:, :1], axis=1)
+    digitos[iguais, 8] = (digitos[iguais, 8] + 1) % 10
+    bases = digitos @ POTENCIAS_BASE_CPF
+
+    resto = 11 - (digitos @ PESOS_DIGITO1) % 11
+    digito1 = np.where(resto > 9, 0, resto)
+    resto = 11 - (np.column_stack([digitos, digito1]) @ PESOS_DIGITO2) % 11
+    digito2 = np.where(resto > 9, 0, resto)
+    return [f"{numero:011d}" for numero in (bases * 100 + digito1 * 10 + digito2).tolist()]
+
+
+def _datas_texto(segundos):
+    textos = np.datetime_as_string(segundos.astype('datetime64[s]'), unit='s')
+    return [texto.replace('T', ' ') for texto in textos.tolist()]
+
+
+def gerar_bloco(quantidade, semente=42, inicio=0):
+    """Gera as linhas de cadastro dos índices inicio..inicio+quantidade-1, na ordem de COLUNAS_CADASTRO.
+
+    Cada bloco usa seu próprio gerador, derivado da semente e do índice inicial: o mesmo
+    intervalo produz sempre as mesmas linhas, independentemente dos blocos anteriores.
+    """
+    rng = np.random.default_rng([semente, inicio])
+    indices = np.arange(inicio, inicio + quantidade, dtype=np.int64)
+
+    generos = _sortear(rng, GENEROS, GENEROS.values(), quantidade)
+    masculino = generos == 'M'
+
+    idades = np.clip(rng.normal(42, 19, quantidade), 0, 100)
+    nascimentos = (DATA_REFERENCIA_IDADE - (idades * 365.25).astype('timedelta64[D]')).astype(str).tolist()
+
+    # Altura por gênero e peso a partir de um IMC sorteado; crianças ficam menores e mais leves
+    alturas = np.where(masculino, rng.normal(1.73, 0.075, quantidade), rng.normal(1.61, 0.068, quantidade))
+    alturas = np.round(np.clip(alturas * np.clip(0.45 + idades / 18, 0.45, 1), 0.5, 2.2), 2)
+    imcs = np.clip(rng.normal(26.5, 4.8, quantidade), 14, 55)
+    pesos = np.round(imcs * alturas * alturas, 1)
+
+    # Registros crescem ao longo dos anos (densidade linear) e se concentram no horário comercial
+    dias = (np.sqrt(rng.random(quantidade)) * ANOS_DE_REGISTROS * 365).astype(np.int64)
+    horas = rng.choice(24, size=quantidade, p=_normalizar(PESOS_HORA))
+    segundos = dias * 86400 + horas * 3600 + rng.integers(0, 3600, quantidade)
+    registros = _datas_texto(INICIO_REGISTROS + segundos)
+
+    nomes = np.where(masculino,
+                     _sortear(rng, NOMES_MASCULINOS, np.ones(len(NOMES_MASCULINOS)), quantidade),
+                     _sortear(rng, NOMES_FEMININOS, np.ones(len(NOMES_FEMININOS)), quantidade))
+    sobrenomes1 = _sortear(rng, SOBRENOMES, np.ones(len(SOBRENOMES)), quantidade)
+    sobrenomes2 = _sortear(rng, SOBRENOMES, np.ones(len(SOBRENOMES)), quantidade)
+    logradouros = _sortear(rng, LOGRADOUROS, np.ones(len(LOGRADOUROS)), quantidade)
+    numeros = rng.integers(1, 3000, quantidade).tolist()
+    bairros = _sortear(rng, BAIRROS, np.ones(len(BAIRROS)), quantidade)
+    cidades = _sortear(rng, CIDADES, CIDADES.values(), quantidade)
+    ddds = _sortear(rng, DDDS, np.ones(len(DDDS)), quantidade)
+    telefones = rng.integers(0, 10 ** 8, quantidade).tolist()
+
+    return list(zip(
+        [f"{n} {s1} {s2}" for n, s1, s2 in zip(nomes, sobrenomes1, sobrenomes2)],
+        gerar_cpfs(indices, semente),
+        nascimentos,
+        generos.tolist(),
+        [f"{l}, {n} - {b}, {c}" for l, n, b, c in zip(logradouros, numeros, bairros, cidades)],
+        [f"{ddd}9{numero:08d}" for ddd, numero in zip(ddds, telefones)],
+        _sortear(rng, PRESSAO_ARTERIAL_OPCOES, [PESOS_PRESSAO[opcao] for opcao in PRESSAO_ARTERIAL_OPCOES],
+                 quantidade).tolist(),
+        alturas.tolist(),
+        pesos.tolist(),
+        _sortear(rng, FREQUENCIA_ATIVIDADES_SEM_OPCOES, PESOS_ATIVIDADE, quantidade).tolist(),
+        np.where(rng.random(quantidade) < 0.55, 'sim', 'não').tolist(),
+        np.where(rng.random(quantidade) < 0.3, 'sim', 'não').tolist(),
+        _sortear(rng, HISTORICOS, HISTORICOS.values(), quantidade).tolist(),
+        registros,
+    ))
+
+
+def gerar_blocos(quantidade, semente=42, inicio=0, tamanho_bloco=TAMANHO_BLOCO):
+    for deslocamento in range(0, quantidade, tamanho_bloco):
+        yield gerar_bloco(min(tamanho_bloco, quantidade - deslocamento), semente, inicio + deslocamento)
+
+
+def gerar_pacientes(quantidade, semente=42, inicio=0):
+    """Gera linhas de cadastro válidas (na ordem de COLUNAS_CADASTRO), de forma determinística."""
+    for bloco in gerar_blocos(quantidade, semente, inicio):
+        yield from bloco
+
+
+def como_dicionario(linha):
+    return dict(zip(COLUNAS_CADASTRO, linha))
+
+
+###         GRAVAÇÃO          ###
+
+
+def _triggers_cadastro(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'cadastro'")
+    return [nome for (nome,) in cursor.fetchall()]
+
+
+def restaurar_derivados(conn):
+    """Recria os triggers de cadastro e reconstrói resumo, busca e locais a partir do cadastro."""
+    from busca import SCRIPT_BUSCA, SQL_RECONSTRUIR_BUSCA
+    from locais import SCRIPT_LOCAIS, SQL_PREENCHER_LOCAIS
+    from migracoes import dividir_instrucoes, executar_em_transacao
+    from resumos import SCRIPT_RESUMO, SQL_RECONSTRUIR_RESUMO
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cadastro")
+    maximo = cursor.fetchone()[0]
+    executar_em_transacao(cursor, dividir_instrucoes(SCRIPT_RESUMO + SCRIPT_BUSCA + SCRIPT_LOCAIS))
+
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("DELETE FROM resumo_diario")
+        cursor.execute(SQL_RECONSTRUIR_RESUMO)
+        cursor.execute(SQL_RECONSTRUIR_BUSCA)
+        cursor.execute("DELETE FROM locais_cadastro")
+        cursor.execute(SQL_PREENCHER_LOCAIS, {'inicio': 0, 'fim': maximo})
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def gravar_no_banco(conn, blocos, rapido=True):
+    """Grava os blocos com executemany, um commit por bloco; retorna o total de linhas.
+
+    No modo rápido os triggers de cadastro são removidos durante a carga e as tabelas
+    derivadas (resumo, busca, locais) são reconstruídas de uma vez no final, o que é
+    muito mais rápido do que mantê-las linha a linha. Use-o apenas em um banco dedicado
+    ao teste de carga: gravações de outros terminais durante a carga não entram nos
+    derivados até a reconstrução. Se a carga for interrompida, restaurar_derivados
+    (--restaurar) recria os triggers.
+    """
+    cursor = conn.cursor()
+    triggers = _triggers_cadastro(cursor) if rapido else []
+    sincronizacao = cursor.execute("PRAGMA synchronous").fetchone()[0]
+    total = 0
+    try:
+        if rapido:
+            # Dados gerados podem ser refeitos: sem fsync a cada commit durante a carga
+            cursor.execute("PRAGMA synchronous = OFF")
+            with conn:
+                for nome in triggers:
+                    cursor.execute(f'DROP TRIGGER IF EXISTS "{nome}"')
+
+        indice_cpf, indice_endereco = COLUNAS_CADASTRO.index('cpf'), COLUNAS_CADASTRO.index('endereco')
+        for bloco in blocos:
+            with conn:
+                cursor.executemany(SQL_INSERIR_CADASTRO, bloco)
+                if not rapido:
+                    # Os locais não têm trigger de inclusão (locais.py); no modo rápido são refeitos no final
+                    indexar_locais(cursor, [(linha[indice_cpf], linha[indice_endereco]) for linha in bloco],
+                                   por_cpf=True)
+            total += len(bloco)
+            logging.info(f"Dados sintéticos: {total} linha(s) gravada(s).")
+    finally:
+        if rapido:
+            cursor.execute(f"PRAGMA synchronous = {int(sincronizacao)}")
+            if triggers:
+                restaurar_derivados(conn)
+    return total
+
+
+def gravar_csv(caminho, blocos):
+    total = 0
+    with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+        escritor = csv.writer(arquivo)
+        escritor.writerow(COLUNAS_CADASTRO)
+        for bloco in blocos:
+            escritor.writerows(bloco)
+            total += len(bloco)
+    return total
+
+
+def gravar_jsonl(caminho, blocos):
+    total = 0
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        for bloco in blocos:
+            arquivo.writelines(json.dumps(como_dicionario(linha), ensure_ascii=False) + '\n' for linha in bloco)
+            total += len(bloco)
+    return total
+
+
+def main():
+    from conexao import abrir_conexao
+    from main import configurar_logging, executar_setup
+
+    parser = argparse.ArgumentParser(
+        description="Gera pacientes sintéticos, válidos e determinísticos, para testes de carga.")
+    parser.add_argument('--quantidade', type=int, default=100_000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--inicio', type=int, default=0,
+                        help="índice do primeiro paciente; use o total anterior para acrescentar sem repetir CPFs")
+    parser.add_argument('--banco', help="banco SQLite de destino (ex.: database/carga.db)")
+    parser.add_argument('--csv', help="também grava os pacientes em um CSV aceito por importacao.py")
+    parser.add_argument('--jsonl', help="também grava os pacientes em um JSONL aceito por importacao.py")
+    parser.add_argument('--manter-triggers', action='store_true',
+                        help="grava com os triggers ativos, como o atendimento (mais lento)")
+    parser.add_argument('--restaurar', action='store_true',
+                        help="só recria triggers e tabelas derivadas de --banco após uma carga interrompida")
+    args = parser.parse_args()
+    configurar_logging()
+
+    if not (args.banco or args.csv or args.jsonl):
+        parser.error("informe ao menos um destino: --banco, --csv ou --jsonl")
+
+    destinos = []
+    if args.csv:
+        destinos.append(('CSV', lambda blocos: gravar_csv(args.csv, blocos)))
+    if args.jsonl:
+        destinos.append(('JSONL', lambda blocos: gravar_jsonl(args.jsonl, blocos)))
+
+    conn = None
+    try:
+        if args.banco:
+            conn = abrir_conexao(args.banco)
+            executar_setup(conn.cursor())
+            if args.restaurar:
+                restaurar_derivados(conn)
+                print("Triggers e tabelas derivadas restaurados.")
+                return
+            destinos.append(('banco', lambda blocos: gravar_no_banco(conn, blocos, not args.manter_triggers)))
+
+        for nome, gravar in destinos:
+            inicio = time.perf_counter()
+            total = gravar(gerar_blocos(args.quantidade, args.semente, args.inicio))
+            duracao = time.perf_counter() - inicio
+            print(f"{nome}: {total} paciente(s) em {duracao:.1f}s ({total / duracao:,.0f}/s)")
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Erro ao gerar dados sintéticos: {e}")
+        print(f"Erro ao gerar dados sintéticos: {e}")
+        exit(1)
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
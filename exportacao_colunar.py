@@ -0,0 +1,94 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+
+TAMANHO_LOTE_COLUNAR = 50000
+COMPRESSAO_PADRAO = 'zstd'
+
+# Colunas com poucos valores distintos são gravadas com codificação de dicionário
+TIPO_CATEGORIA = pa.dictionary(pa.int32(), pa.string())
+
+ESQUEMA_CADASTRO = pa.schema([
+    ('id', pa.int64()),
+    ('nome', pa.string()),
+    ('cpf', pa.string()),
+    ('data_nascimento', pa.date32()),
+    ('genero', TIPO_CATEGORIA),
+    ('endereco', pa.string()),
+    ('telefone', pa.string()),
+    ('pressao_arterial', TIPO_CATEGORIA),
+    ('altura', pa.float64()),
+    ('peso', pa.float64()),
+    ('frequencia_atividades_sem', TIPO_CATEGORIA),
+    ('sono_regular', TIPO_CATEGORIA),
+    ('dieta_planejada', TIPO_CATEGORIA),
+    ('historico_doencas', pa.string()),
+    ('data_registro', pa.timestamp('s')),
+])
+
+
+def _para_float(valor):
+    try:
+        return None if valor is None or valor == '' else float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _coluna(campo, valores):
+    tipo = campo.type
+    if tipo == pa.float64():
+        return pa.array([_para_float(valor) for valor in valores], type=tipo)
+    if tipo == pa.int64():
+        return pa.array(valores, type=tipo)
+
+    textos = pa.array([None if valor is None else str(valor) for valor in valores], type=pa.string())
+    if tipo == pa.date32():
+        return pc.strptime(textos, format='%Y-%m-%d', unit='s', error_is_null=True).cast(pa.date32())
+    if pa.types.is_timestamp(tipo):
+        return pc.strptime(textos, format='%Y-%m-%d %H:%M:%S', unit='s', error_is_null=True)
+    if pa.types.is_dictionary(tipo):
+        return pc.dictionary_encode(textos).cast(tipo)
+    return textos
+
+
+def montar_lote(registros, esquema=ESQUEMA_CADASTRO):
+    colunas = list(zip(*registros))
+    return pa.record_batch(
+        [_coluna(campo, colunas[indice]) for indice, campo in enumerate(esquema)], schema=esquema)
+
+
+def escrever_relatorio_colunar(cursor, caminho, formato='parquet', primeiros=(), compressao=COMPRESSAO_PADRAO):
+    """Grava o resultado do cursor em Parquet ou Arrow IPC, lote a lote, e retorna o total de registros."""
+    headers = [description[0] for description in cursor.description]
+    if headers != ESQUEMA_CADASTRO.names:
+        raise ValueError("A exportação colunar espera todas as colunas de cadastro (SELECT *).")
+
+    if formato == 'parquet':
+        escritor = pq.ParquetWriter(caminho, ESQUEMA_CADASTRO, compression=compressao)
+        escrever = escritor.write_batch
+    elif formato == 'arrow':
+        escritor = ipc.new_file(caminho, ESQUEMA_CADASTRO,
+                                options=ipc.IpcWriteOptions(compression=compressao))
+        escrever = escritor.write_batch
+    else:
+        raise ValueError(f"Formato colunar não suportado: '{formato}'. Use parquet ou arrow.")
+
+    total = 0
+    try:
+        pendentes = list(primeiros)
+        while True:
+            registros = cursor.fetchmany(TAMANHO_LOTE_COLUNAR - len(pendentes))
+            pendentes.extend(registros)
+            if not pendentes:
+                break
+            escrever(montar_lote(pendentes))
+            total += len(pendentes)
+            if not registros:
+                break
+            pendentes = []
+    finally:
+        escritor.close()
+
+    return total
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import logging
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import cache_ia
+from log_estruturado import medir_operacao
+from main import (LINK_IA, buscar_sugestao_em_cache, configurar_logging, conectar_bd,
+                  guardar_sugestao_em_cache, montar_pergunta_ia, montar_requisicao_ia, validar_data)
+from metricas import contar, medir
+
+
+LIMITE_CONCORRENCIA_PADRAO = 8
+TENTATIVAS_PADRAO = 5
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 30.0
+TIMEOUT_REQUISICAO = 60
+
+# Respostas que indicam sobrecarga ou falha temporária do servidor
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+# Falhas de rede que costumam passar em uma nova tentativa (ChunkedEncodingError: resposta cortada)
+ERROS_REPETIVEIS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def criar_sessao_ia(limite_concorrencia):
+    """Sessão HTTP com um pool de conexões do tamanho do limite de concorrência."""
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=limite_concorrencia, pool_block=True)
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    return sessao
+
+
+def calcular_espera(tentativa, retry_after=None, espera_base=ESPERA_BASE, espera_maxima=ESPERA_MAXIMA):
+    # Respeita o Retry-After do servidor; caso contrário, backoff exponencial com jitter total
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), espera_maxima)
+        except ValueError:
+            pass
+    return random.uniform(0, min(espera_maxima, espera_base * 2 ** tentativa))
+
+
+async def solicitar_sugestao(sessao, executor, semaforo, registro, link=LINK_IA,
+                             tentativas=TENTATIVAS_PADRAO, espera_base=ESPERA_BASE, usar_cache=True):
+    with medir_operacao('solicitar_sugestao_ia', id_cadastro=registro[0]) as medicao:
+        chave = None
+        if usar_cache:
+            chave, mensagem = buscar_sugestao_em_cache(registro)
+            if mensagem is not None:
+                medicao.resultado = 'cache'
+                return mensagem
+
+        headers, body_mensagem = montar_requisicao_ia(
+            montar_pergunta_ia(registro, identificar=not usar_cache))
+        loop = asyncio.get_running_loop()
+
+        for tentativa in range(tentativas):
+            medicao.detalhes['tentativas'] = tentativa + 1
+            retry_after = None
+            async with semaforo:
+                try:
+                    with medir('ia_requisicao_segundos', origem='lote'):
+                        requisicao = await loop.run_in_executor(
+                            executor, lambda: sessao.post(link, headers=headers, data=body_mensagem,
+                                                          timeout=TIMEOUT_REQUISICAO))
+                except ERROS_REPETIVEIS as e:
+                    logging.warning(
+                        f"Falha de conexão com a IA (registro {registro[0]}, tentativa {tentativa + 1}): {e}")
+                except requests.RequestException as e:
+                    # URL inválida, redirecionamentos demais...: repetir não resolve. Só este
+                    # registro fica sem sugestão; o restante do lote segue normalmente
+                    logging.error(f"Falha na requisição à IA (registro {registro[0]}): {e}")
+                    medicao.resultado = 'falha_http'
+                    return None
+                else:
+                    medicao.detalhes['status_http'] = requisicao.status_code
+                    contar('ia_respostas_total', origem='lote', status=requisicao.status_code)
+                    if requisicao.status_code == 200:
+                        try:
+                            mensagem = requisicao.json()["choices"][0]["message"]["content"]
+                        except (ValueError, LookupError, TypeError):
+                            logging.error(f"Estrutura inesperada na resposta da API (registro {registro[0]}).")
+                            medicao.resultado = 'resposta_inesperada'
+                            return None
+                        guardar_sugestao_em_cache(chave, mensagem)
+                        return mensagem
+                    if requisicao.status_code not in STATUS_REPETIVEIS:
+                        logging.error(
+                            f"Falha na requisição à IA (registro {registro[0]}). Código de status: {requisicao.status_code}")
+                        medicao.resultado = 'falha_http'
+                        return None
+                    logging.warning(
+                        f"IA respondeu {requisicao.status_code} (registro {registro[0]}, tentativa {tentativa + 1}).")
+                    retry_after = requisicao.headers.get('Retry-After')
+
+            # A espera acontece fora do semáforo para liberar a vaga a outros registros
+            if tentativa + 1 < tentativas:
+                await asyncio.sleep(calcular_espera(tentativa, retry_after, espera_base))
+
+        logging.error(f"Tentativas esgotadas ao consultar a IA (registro {registro[0]}).")
+        medicao.resultado = 'tentativas_esgotadas'
+        return None
+
+
+async def gerar_sugestoes_async(registros, limite_concorrencia=LIMITE_CONCORRENCIA_PADRAO,
+                                link=LINK_IA, tentativas=TENTATIVAS_PADRAO, espera_base=ESPERA_BASE,
+                                usar_cache=True):
+    usar_cache = usar_cache and not cache_ia.cache_desativado()
+    semaforo = asyncio.Semaphore(limite_concorrencia)
+    with criar_sessao_ia(limite_concorrencia) as sessao, \
+            ThreadPoolExecutor(max_workers=limite_concorrencia) as executor:
+        # Registros com o mesmo perfil clínico compartilham uma única requisição
+        por_perfil = {}
+        pendentes = []
+        for registro in registros:
+            chave = cache_ia.chave_perfil(registro) if usar_cache else None
+            if chave is None or chave not in por_perfil:
+                tarefa = asyncio.ensure_future(solicitar_sugestao(
+                    sessao, executor, semaforo, registro, link, tentativas, espera_base, usar_cache))
+                if chave is not None:
+                    por_perfil[chave] = tarefa
+            else:
+                tarefa = por_perfil[chave]
+            pendentes.append(tarefa)
+
+        # gather preserva a ordem de entrada, independentemente da ordem de conclusão
+        return await asyncio.gather(*pendentes)
+
+
+def gerar_sugestoes_em_lote(registros, limite_concorrencia=LIMITE_CONCORRENCIA_PADRAO, **opcoes):
+    """Consulta a IA para vários registros de cadastro; devolve as respostas na ordem de entrada."""
+    return asyncio.run(gerar_sugestoes_async(list(registros), limite_concorrencia, **opcoes))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gera as sugestões da IA para todos os pacientes registrados em um dia.")
+    parser.add_argument('data', help="data do registro (YYYY-MM-DD)")
+    parser.add_argument('--concorrencia', type=int, default=LIMITE_CONCORRENCIA_PADRAO,
+                        help=f"requisições simultâneas (padrão: {LIMITE_CONCORRENCIA_PADRAO})")
+    parser.add_argument('--sem-cache', action='store_true',
+                        help="ignora o cache de respostas e consulta a IA para todos os registros")
+    args = parser.parse_args()
+    configurar_logging()
+
+    if not validar_data(args.data) or args.concorrencia < 1:
+        print("Parâmetros inválidos.")
+        exit(1)
+
+    try:
+        with conectar_bd() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM cadastro WHERE data_registro BETWEEN ? AND ?",
+                           (f"{args.data} 00:00:00", f"{args.data} 23:59:59"))
+            registros = cursor.fetchall()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao ler registros: {e}")
+        print(f"Erro ao ler registros: {e}")
+        exit(1)
+
+    sugestoes = gerar_sugestoes_em_lote(registros, args.concorrencia, usar_cache=not args.sem_cache)
+    for registro, sugestao in zip(registros, sugestoes):
+        print(f"\nID {registro[0]} - {registro[1]}:")
+        print(sugestao if sugestao is not None else "Não foi possível obter a sugestão da IA.")
+
+    estatisticas = cache_ia.estatisticas_cache()
+    logging.info(
+        f"Cache da IA: {estatisticas['acertos']} acerto(s), {estatisticas['falhas']} falha(s), "
+        f"{estatisticas['entradas']} entrada(s).")
+
+
+if __name__ == "__main__":
+    main()
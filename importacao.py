@@ -0,0 +1,146 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+
+from main import configurar_logging, conectar_bd, executar_setup, validar_paciente
+from repositorio import cpfs_existentes, inserir, inserir_em_lote
+
+
+TAMANHO_LOTE_PADRAO = 1000
+
+
+def ler_arquivo_pacientes(caminho):
+    """Lê um CSV ou JSONL linha a linha, devolvendo (número da linha, dados, erro)."""
+    extensao = os.path.splitext(caminho)[1].lower()
+
+    if extensao == '.csv':
+        with open(caminho, 'r', encoding='utf-8-sig', newline='') as arquivo:
+            # A linha 1 é o cabeçalho
+            for numero_linha, dados in enumerate(csv.DictReader(arquivo), start=2):
+                yield numero_linha, dados, None
+    elif extensao in ('.jsonl', '.ndjson'):
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            for numero_linha, linha in enumerate(arquivo, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    dados = json.loads(linha)
+                except json.JSONDecodeError as e:
+                    yield numero_linha, {'linha_original': linha.rstrip('\n')}, f"JSON inválido: {e}"
+                    continue
+                if not isinstance(dados, dict):
+                    yield numero_linha, {'linha_original': linha.rstrip('\n')}, "a linha não é um objeto JSON"
+                    continue
+                yield numero_linha, dados, None
+    else:
+        raise ValueError(
+            f"Formato de arquivo não suportado: '{extensao}'. Use .csv ou .jsonl.")
+
+
+def inserir_lote(conn, lote, rejeitar):
+    """Grava um lote de (linha, dados, paciente) em uma única transação."""
+    cursor = conn.cursor()
+    existentes = cpfs_existentes(cursor, (paciente['cpf'] for _, _, paciente in lote))
+
+    validos = []
+    cpfs_no_lote = set()
+    for numero_linha, dados, paciente in lote:
+        if paciente['cpf'] in existentes or paciente['cpf'] in cpfs_no_lote:
+            rejeitar(numero_linha, dados, ["cpf já cadastrado"])
+            continue
+        cpfs_no_lote.add(paciente['cpf'])
+        validos.append((numero_linha, dados, paciente))
+
+    if not validos:
+        return 0
+
+    try:
+        with conn:
+            inserir_em_lote(cursor, [paciente for _, _, paciente in validos])
+        return len(validos)
+    except sqlite3.IntegrityError:
+        # Outro terminal gravou um dos CPFs entre a verificação e o INSERT:
+        # refaz o lote linha a linha, ainda em uma única transação.
+        inseridos = 0
+        with conn:
+            for numero_linha, dados, paciente in validos:
+                try:
+                    inserir(cursor, paciente)
+                    inseridos += 1
+                except sqlite3.IntegrityError:
+                    rejeitar(numero_linha, dados, ["cpf já cadastrado"])
+        return inseridos
+
+
+def importar_pacientes(conn, caminho, caminho_rejeitados=None, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    if tamanho_lote < 1:
+        raise ValueError("O tamanho do lote deve ser maior que zero.")
+
+    if caminho_rejeitados is None:
+        caminho_rejeitados = f"{os.path.splitext(caminho)[0]}_rejeitados.jsonl"
+
+    resumo = {'lidos': 0, 'inseridos': 0, 'rejeitados': 0}
+
+    with open(caminho_rejeitados, 'w', encoding='utf-8') as arquivo_rejeitados:
+        def rejeitar(numero_linha, dados, motivos):
+            resumo['rejeitados'] += 1
+            arquivo_rejeitados.write(json.dumps(
+                {'linha': numero_linha, 'motivos': motivos, 'dados': dados}, ensure_ascii=False) + '\n')
+
+        lote = []
+        for numero_linha, dados, erro in ler_arquivo_pacientes(caminho):
+            resumo['lidos'] += 1
+            if erro:
+                rejeitar(numero_linha, dados, [erro])
+                continue
+
+            paciente, erros = validar_paciente(dados)
+            if erros:
+                rejeitar(numero_linha, dados, erros)
+                continue
+
+            lote.append((numero_linha, dados, paciente))
+            if len(lote) >= tamanho_lote:
+                resumo['inseridos'] += inserir_lote(conn, lote, rejeitar)
+                lote = []
+
+        if lote:
+            resumo['inseridos'] += inserir_lote(conn, lote, rejeitar)
+
+    resumo['arquivo_rejeitados'] = caminho_rejeitados
+    logging.info(
+        f"Importação de '{caminho}' concluída. Lidos: {resumo['lidos']}, "
+        f"inseridos: {resumo['inseridos']}, rejeitados: {resumo['rejeitados']}.")
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Importa pacientes em lote a partir de um arquivo CSV ou JSONL.")
+    parser.add_argument('arquivo', help="arquivo .csv ou .jsonl com os pacientes")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help=f"registros por transação (padrão: {TAMANHO_LOTE_PADRAO})")
+    parser.add_argument('--rejeitados',
+                        help="arquivo JSONL com as linhas rejeitadas (padrão: <arquivo>_rejeitados.jsonl)")
+    args = parser.parse_args()
+    configurar_logging()
+
+    try:
+        with conectar_bd() as conn:
+            executar_setup(conn.cursor())
+            resumo = importar_pacientes(conn, args.arquivo, args.rejeitados, args.lote)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logging.error(f"Erro na importação: {e}")
+        print(f"Erro na importação: {e}")
+        exit(1)
+
+    print(f"Registros lidos: {resumo['lidos']}")
+    print(f"Registros inseridos: {resumo['inseridos']}")
+    print(f"Registros rejeitados: {resumo['rejeitados']} (detalhes em {resumo['arquivo_rejeitados']})")
+
+
+if __name__ == "__main__":
+    main()
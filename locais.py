@@ -0,0 +1,166 @@
+import re
+import sqlite3
+from functools import lru_cache
+
+
+# locais_cadastro guarda, para cada cadastro, os trechos do endereço que podem ser
+# um local (cidade, bairro, estado), já normalizados como em validar_local:
+# "Rua A, 10 - Jardim São José, São Paulo" gera 'jardim sao jose' e 'sao paulo'. O relatório por local vira uma busca no índice em vez de
+# comparar lower(endereco), que só converte ASCII, linha a linha.
+#
+# A normalização usa unidecode, que não existe em SQL: as inclusões e alterações
+# são gravadas por repositorio.py (indexar_locais), e não por triggers, para que
+# o sqlite3 da linha de comando e outros programas continuem gravando em cadastro.
+# Só a exclusão fica em um trigger. Gravações feitas por fora do repositório
+# (carga_concorrente, sessões do sqlite3) deixam os locais desatualizados:
+# 'python resumos.py verificar' aponta esses cadastros e 'reconstruir' os corrige.
+# Os preenchimentos em lote (migrações, dados_sinteticos, reconstrução) usam
+# locais_endereco, uma função registrada em cada conexão por registrar_funcoes
+# (conectar_bd faz isso).
+FUNCAO_LOCAIS = 'locais_endereco'
+
+# Hífen só separa com espaços em volta ("Centro - Recife"): em "Embu-Guaçu" é parte do nome
+SEPARADORES_ENDERECO = re.compile(r'[,;/]|\s[-–]\s')
+CARACTERES_IGNORADOS = re.compile(r'[^a-z0-9 ]+')
+# Primeira palavra (já normalizada) de um logradouro: "Rua C" e "Av. Brasil" não são locais.
+# Sozinha ela não conta ("AL" é o estado de Alagoas)
+TIPOS_LOGRADOURO = frozenset({'rua', 'r', 'avenida', 'av', 'travessa', 'tv', 'alameda', 'al',
+                              'estrada', 'rodovia'})
+
+
+# Cidades e bairros se repetem entre cadastros: o cache evita refazer o unidecode
+# a cada linha do trigger e do preenchimento
+@lru_cache(maxsize=4096)
+def normalizar_local(texto):
+    """Forma usada na busca: sem acentos, minúsculas, sem pontuação e com espaços simples."""
+    from unidecode import unidecode
+    texto = CARACTERES_IGNORADOS.sub(' ', unidecode(texto or '').lower())
+    return ' '.join(texto.split())
+
+
+def _logradouro(local):
+    palavras = local.split(' ', 1)
+    return len(palavras) > 1 and palavras[0] in TIPOS_LOGRADOURO
+
+
+def extrair_locais(endereco):
+    """Trechos do endereço que podem ser um local; logradouros e trechos com números (CEP) ficam de fora."""
+    locais = []
+    for trecho in SEPARADORES_ENDERECO.split(endereco or ''):
+        local = normalizar_local(trecho)
+        if local and not any(c.isdigit() for c in local) and not _logradouro(local) and local not in locais:
+            locais.append(local)
+    return locais
+
+
+def _locais_json(endereco):
+    # Os locais só têm [a-z0-9 ], então o array JSON dispensa escape (e o módulo json)
+    return '[' + ','.join(f'"{local}"' for local in extrair_locais(endereco)) + ']'
+
+
+def registrar_funcoes(conn):
+    conn.create_function(FUNCAO_LOCAIS, 1, _locais_json, deterministic=True)
+
+
+SCRIPT_LOCAIS = '''
+    CREATE TABLE IF NOT EXISTS locais_cadastro (
+        local TEXT NOT NULL,
+        id_cadastro INTEGER NOT NULL,
+        PRIMARY KEY (local, id_cadastro)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_locais_cadastro_id ON locais_cadastro (id_cadastro);
+
+    CREATE TRIGGER IF NOT EXISTS trg_locais_cadastro_delete AFTER DELETE ON cadastro
+    BEGIN
+        DELETE FROM locais_cadastro WHERE id_cadastro = OLD.id;
+    END;
+'''
+
+# Script da migração 5 como foi publicado (bancos já migrados o executaram; não alterar).
+# Os triggers de inclusão e alteração chamavam locais_endereco e são removidos na versão 6
+SCRIPT_LOCAIS_V5 = f'''
+    CREATE TABLE IF NOT EXISTS locais_cadastro (
+        local TEXT NOT NULL,
+        id_cadastro INTEGER NOT NULL,
+        PRIMARY KEY (local, id_cadastro)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_locais_cadastro_id ON locais_cadastro (id_cadastro);
+
+    CREATE TRIGGER IF NOT EXISTS trg_locais_cadastro_insert AFTER INSERT ON cadastro
+    BEGIN
+        INSERT OR IGNORE INTO locais_cadastro (local, id_cadastro)
+        SELECT value, NEW.id FROM json_each({FUNCAO_LOCAIS}(NEW.endereco));
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_locais_cadastro_delete AFTER DELETE ON cadastro
+    BEGIN
+        DELETE FROM locais_cadastro WHERE id_cadastro = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_locais_cadastro_update AFTER UPDATE OF endereco ON cadastro
+    BEGIN
+        DELETE FROM locais_cadastro WHERE id_cadastro = OLD.id;
+        INSERT OR IGNORE INTO locais_cadastro (local, id_cadastro)
+        SELECT value, NEW.id FROM json_each({FUNCAO_LOCAIS}(NEW.endereco));
+    END;
+'''
+
+# Triggers da versão 5, que chamavam locais_endereco a cada gravação
+SCRIPT_REMOVER_TRIGGERS_LOCAIS = '''
+    DROP TRIGGER IF EXISTS trg_locais_cadastro_insert;
+    DROP TRIGGER IF EXISTS trg_locais_cadastro_update;
+'''
+
+# Preenchimento em lotes de id (migracoes.preencher_em_lotes). INSERT OR IGNORE
+# torna a etapa idempotente: cadastros gravados pelo repositório durante o
+# preenchimento já estão no índice.
+SQL_PREENCHER_LOCAIS = f'''
+    INSERT OR IGNORE INTO locais_cadastro (local, id_cadastro)
+    SELECT locais.value, c.id
+    FROM cadastro c, json_each({FUNCAO_LOCAIS}(c.endereco)) AS locais
+    WHERE c.id BETWEEN :inicio AND :fim
+'''
+
+
+def refazer_locais(cursor, inicio, fim):
+    """Recalcula os locais dos cadastros com id entre inicio e fim (preenchimento em lotes)."""
+    cursor.execute("DELETE FROM locais_cadastro WHERE id_cadastro BETWEEN ? AND ?", (inicio, fim))
+    cursor.execute(SQL_PREENCHER_LOCAIS, {'inicio': inicio, 'fim': fim})
+
+
+# Pares (local, id) que aparecem em só um dos lados: locais que faltam, que sobram ou de
+# cadastros já excluídos. Os dois lados não têm repetições (chave primária e extrair_locais)
+SQL_DIVERGENCIAS_LOCAIS = f'''
+    SELECT DISTINCT id_cadastro
+    FROM (
+        SELECT locais.value AS local, c.id AS id_cadastro
+        FROM cadastro c, json_each({FUNCAO_LOCAIS}(c.endereco)) AS locais
+        UNION ALL
+        SELECT local, id_cadastro FROM locais_cadastro
+    )
+    GROUP BY local, id_cadastro
+    HAVING COUNT(*) = 1
+    ORDER BY id_cadastro
+'''
+
+
+def verificar_locais(cursor):
+    """ids dos cadastros cujos locais gravados diferem dos calculados a partir do endereço."""
+    cursor.execute(SQL_DIVERGENCIAS_LOCAIS)
+    return [id_cadastro for (id_cadastro,) in cursor.fetchall()]
+
+
+def reconstruir_locais(cursor):
+    """Recalcula locais_cadastro a partir de cadastro, em uma única transação."""
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM cadastro")
+    maximo = cursor.fetchone()[0]
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("DELETE FROM locais_cadastro")
+        cursor.execute(SQL_PREENCHER_LOCAIS, {'inicio': 0, 'fim': maximo})
+        cursor.connection.commit()
+    except sqlite3.Error:
+        cursor.connection.rollback()
+        raise
+    cursor.execute("SELECT COUNT(*) FROM locais_cadastro")
+    return cursor.fetchone()[0]
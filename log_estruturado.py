@@ -0,0 +1,175 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from metricas import METRICAS_ATIVAS, configurar_metricas, observar
+
+
+# Registros em JSON, um por linha, gravados em UTF-8 por uma thread própria: quem
+# chama logging.info só coloca o registro em uma fila. Cada opção pode ser trocada
+# por uma variável de ambiente ASSIST_LOG_<NOME> (ex.: ASSIST_LOG_ROTACAO=tempo).
+# - rotacao 'tamanho' troca o arquivo ao atingir tamanho_mb; 'tempo' troca a cada
+#   intervalo ('midnight', 'H', ...) de TimedRotatingFileHandler;
+# - backups é quantos arquivos antigos são mantidos;
+# - lento_ms é a duração a partir da qual uma operação é registrada como WARNING.
+CONFIGURACAO_PADRAO = {
+    'arquivo': 'app_log.txt',
+    'nivel': 'INFO',
+    'rotacao': 'tamanho',
+    'tamanho_mb': 10,
+    'intervalo': 'midnight',
+    'backups': 5,
+    'lento_ms': 500,
+}
+
+PREFIXO_VARIAVEIS = 'ASSIST_LOG_'
+
+# Campos de medir_operacao que vão para o JSON como chaves próprias
+CAMPOS_OPERACAO = ('operacao', 'duracao_ms', 'linhas', 'resultado', 'detalhes')
+
+_ouvinte = None
+_lento_ms = CONFIGURACAO_PADRAO['lento_ms']
+
+
+def configuracao_log(**alteracoes):
+    """Configuração padrão, sobrescrita pelas variáveis de ambiente e depois pelos argumentos."""
+    configuracao = dict(CONFIGURACAO_PADRAO)
+    for nome, padrao in configuracao.items():
+        valor = os.environ.get(PREFIXO_VARIAVEIS + nome.upper())
+        if valor:
+            configuracao[nome] = type(padrao)(valor)
+    configuracao.update(alteracoes)
+    return configuracao
+
+
+class FormatadorJson(logging.Formatter):
+    def format(self, record):
+        # json só é carregado na thread que grava o arquivo
+        import json
+        evento = {
+            'data': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'nivel': record.levelname,
+            'mensagem': record.getMessage(),
+            'logger': record.name,
+            'processo': record.process,
+            'thread': record.threadName,
+        }
+        for campo in CAMPOS_OPERACAO:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                evento[campo] = valor
+        if record.exc_text:
+            evento['excecao'] = record.exc_text
+        return json.dumps(evento, ensure_ascii=False, default=str)
+
+
+def _criar_handler_fila(fila):
+    from logging.handlers import QueueHandler
+
+    class HandlerFila(QueueHandler):
+        def prepare(self, record):
+            # Mantém os campos extras; só a mensagem e o traceback são resolvidos aqui,
+            # já que os argumentos podem mudar antes de a thread gravar o registro
+            record = logging.makeLogRecord(record.__dict__)
+            record.msg = record.getMessage()
+            record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            return record
+
+    return HandlerFila(fila)
+
+
+def configurar_logging(**alteracoes):
+    """Instala o log em fila no logger raiz; chamado pelos pontos de entrada, e não na importação."""
+    global _ouvinte, _lento_ms
+    if _ouvinte is not None:
+        return
+
+    import atexit
+    import queue
+    from logging.handlers import QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+    configuracao = configuracao_log(**alteracoes)
+    if configuracao['rotacao'] == 'tempo':
+        destino = TimedRotatingFileHandler(configuracao['arquivo'], when=configuracao['intervalo'],
+                                           backupCount=configuracao['backups'], encoding='utf-8')
+    elif configuracao['rotacao'] == 'tamanho':
+        destino = RotatingFileHandler(configuracao['arquivo'], maxBytes=configuracao['tamanho_mb'] * 1024 * 1024,
+                                      backupCount=configuracao['backups'], encoding='utf-8')
+    else:
+        raise ValueError(f"Rotação de log inválida: {configuracao['rotacao']}")
+    destino.setFormatter(FormatadorJson())
+    _lento_ms = configuracao['lento_ms']
+
+    fila = queue.SimpleQueue()
+    raiz = logging.getLogger()
+    raiz.setLevel(configuracao['nivel'].upper())
+    raiz.addHandler(_criar_handler_fila(fila))
+
+    _ouvinte = QueueListener(fila, destino, respect_handler_level=True)
+    _ouvinte.start()
+    # Grava o que ainda estiver na fila antes de o processo terminar
+    atexit.register(encerrar_logging)
+
+    # Registrado depois do log: na saída, perfis e métricas são gravados antes de a fila fechar
+    configurar_metricas()
+
+
+def encerrar_logging():
+    global _ouvinte
+    if _ouvinte is None:
+        return
+    _ouvinte.stop()
+    for handler in _ouvinte.handlers:
+        handler.close()
+    _ouvinte = None
+
+
+class Medicao:
+    """Preenchida dentro do bloco de medir_operacao: linhas afetadas e resultado ('ok' por padrão)."""
+    __slots__ = ('linhas', 'resultado', 'detalhes')
+
+    def __init__(self, detalhes):
+        self.linhas = None
+        self.resultado = 'ok'
+        self.detalhes = detalhes
+
+
+@contextmanager
+def medir_operacao(operacao, **detalhes):
+    """Registra a duração, as linhas e o resultado do bloco; exceções são registradas e repassadas.
+
+    Uma exceção vira resultado 'erro', a menos que o bloco já tenha definido outro
+    resultado antes de repassá-la (ex.: 'nao_encontrado', 'cancelado').
+    """
+    medicao = Medicao(detalhes)
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    except BaseException as e:
+        if medicao.resultado == 'ok':
+            medicao.resultado = 'erro'
+        medicao.detalhes['erro'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duracao = time.perf_counter() - inicio
+        # ASSIST_METRICAS=0 desliga o histograma, como em metricas.medir; o log continua
+        if METRICAS_ATIVAS:
+            observar('operacao_segundos', duracao, operacao=operacao, resultado=medicao.resultado)
+        duracao_ms = round(duracao * 1000, 3)
+        if medicao.resultado == 'erro':
+            nivel = logging.ERROR
+        elif duracao_ms >= _lento_ms:
+            nivel = logging.WARNING
+        else:
+            nivel = logging.INFO
+        logging.log(nivel, f"{operacao}: {medicao.resultado} em {duracao_ms:.1f} ms", extra={
+            'operacao': operacao,
+            'duracao_ms': duracao_ms,
+            'linhas': medicao.linhas,
+            'resultado': medicao.resultado,
+            'detalhes': medicao.detalhes or None,
+        })
@@ -1,49 +1,42 @@
 import os
 import sqlite3
-from tabulate import tabulate
 import logging
 from datetime import datetime, timedelta
 import unicodedata
-from unidecode import unidecode
 import re
-from senha import API_KEY
-import requests
-import json
+from busca import COLUNAS_BUSCA, buscar_pacientes
+from conexao import CAMINHO_BANCO_DADOS, abrir_conexao
+from locais import normalizar_local
+from log_estruturado import configurar_logging, medir_operacao
+from metricas import contar, cronometrado, medir
+from migracoes import aplicar_migracoes
+import repositorio
+from repositorio import COLUNAS_ATUALIZAVEIS, SQL_RELATORIO_DATA, SQL_RELATORIO_GENERO, SQL_RELATORIO_LOCAL, Paciente
+from relatorios_agregados import INDICADORES, PERIODOS, gerar_relatorio_agregado
 
 
-# Configurar o sistema de logging
-logging.basicConfig(filename='app_log.txt', level=logging.INFO,
-                    format='%(asctime)s [%(levelname)s]: %(message)s')
+# requests, tabulate, unidecode, json, cache_ia e senha são importados dentro das funções
+# que os usam: listar ou cadastrar pacientes não paga o custo de carregá-los (ver
+# benchmarks/benchmark_inicializacao.py)
 
 
 def conectar_bd():
     try:
-        caminho_banco_dados = os.path.abspath(
-            'database//atendimento_medico.db')
-        conn = sqlite3.connect(caminho_banco_dados)
-        cursor = conn.cursor()
+        # WAL, busy_timeout e demais pragmas, além das funções usadas pelos triggers (ver conexao.py)
+        conn = abrir_conexao(CAMINHO_BANCO_DADOS)
         logging.info("Conexão com o banco de dados estabelecida.")
         return conn
-    except sqlite3.Error as e:
+    except (sqlite3.Error, ValueError) as e:
         logging.error(f"Erro ao conectar ao banco de dados: {e}")
         print(f"Erro ao conectar ao banco de dados: {e}")
         exit(1)
 
 
 def executar_setup(cursor):
+    # Cria o esquema base, se necessário, e aplica as migrações pendentes (ver migracoes.py)
     try:
-        cursor.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='cadastro'")
-        tabela_existe = cursor.fetchone()
-
-        if not tabela_existe:
-            with open('setup.sql', 'r') as script:
-                cursor.executescript(script.read())
-            logging.info("Setup do banco de dados executado com sucesso.")
-        else:
-            logging.info(
-                "A tabela cadastro já existe. Setup do banco de dados ignorado.")
-    except sqlite3.Error as e:
+        aplicar_migracoes(cursor)
+    except (OSError, sqlite3.Error) as e:
         logging.error(f"Erro durante o setup do banco de dados: {e}")
         print(f"Erro durante o setup do banco de dados: {e}")
         exit(1)
@@ -120,6 +113,7 @@ def remover_acentos(texto):
 
 def validar_local(local):
     # Remover caracteres especiais e acentos usando unidecode
+    from unidecode import unidecode
     local = unidecode(local)
 
     # Verifica se a string contém apenas letras e espaços
@@ -156,6 +150,110 @@ def validar_altura(altura):
         return False
 
 
+# Cronometrado uma vez por registro, e não a cada validar_* de campo: a trava das
+# métricas em cada chamada pesaria nas importações e nos lotes
+@cronometrado('validacao_segundos')
+def validar_paciente(dados):
+    """Valida um paciente vindo de arquivo e retorna (campos normalizados, erros)."""
+    erros = []
+    paciente = {}
+
+    def texto(campo):
+        valor = dados.get(campo)
+        return '' if valor is None else str(valor).strip()
+
+    paciente['nome'] = texto('nome')
+    if not paciente['nome']:
+        erros.append("nome em branco")
+
+    paciente['cpf'] = texto('cpf')
+    if not validar_cpf(paciente['cpf']):
+        erros.append("cpf inválido")
+
+    paciente['data_nascimento'] = texto('data_nascimento')
+    if not validar_data(paciente['data_nascimento']):
+        erros.append("data_nascimento inválida")
+
+    paciente['genero'] = texto('genero').upper()
+    if not validar_genero(paciente['genero']):
+        erros.append("genero inválido")
+
+    paciente['endereco'] = texto('endereco')
+    if not paciente['endereco']:
+        erros.append("endereco em branco")
+
+    paciente['telefone'] = texto('telefone')
+    if not validar_telefone(paciente['telefone']):
+        erros.append("telefone inválido")
+
+    # Como a frequência: índice da opção (0 a 12) ou o texto gravado pelo menu
+    pressao = texto('pressao_arterial')
+    if pressao.isdigit() and 0 <= int(pressao) < len(PRESSAO_ARTERIAL_OPCOES):
+        paciente['pressao_arterial'] = PRESSAO_ARTERIAL_OPCOES[int(pressao)]
+    elif pressao in PRESSAO_ARTERIAL_OPCOES:
+        paciente['pressao_arterial'] = pressao
+    elif not pressao:
+        paciente['pressao_arterial'] = None
+    else:
+        erros.append("pressao_arterial inválida")
+
+    altura = texto('altura')
+    if validar_altura(altura):
+        paciente['altura'] = float(altura)
+    else:
+        erros.append("altura inválida")
+
+    peso = texto('peso')
+    if validar_peso(peso):
+        paciente['peso'] = float(peso)
+    else:
+        erros.append("peso inválido")
+
+    # Aceita tanto o índice da opção (0 a 5) quanto o texto gravado pelo menu
+    frequencia = texto('frequencia_atividades_sem')
+    if frequencia.isdigit() and 0 <= int(frequencia) < len(FREQUENCIA_ATIVIDADES_SEM_OPCOES):
+        paciente['frequencia_atividades_sem'] = FREQUENCIA_ATIVIDADES_SEM_OPCOES[int(frequencia)]
+    elif frequencia in FREQUENCIA_ATIVIDADES_SEM_OPCOES:
+        paciente['frequencia_atividades_sem'] = frequencia
+    elif not frequencia:
+        paciente['frequencia_atividades_sem'] = None
+    else:
+        erros.append("frequencia_atividades_sem inválida")
+
+    for campo in ('sono_regular', 'dieta_planejada'):
+        valor = texto(campo).lower()
+        if valor in ['1', 'sim']:
+            paciente[campo] = 'sim'
+        elif valor in ['2', 'não', 'nao']:
+            paciente[campo] = 'não'
+        elif not valor:
+            paciente[campo] = None
+        else:
+            erros.append(f"{campo} inválido")
+
+    paciente['historico_doencas'] = texto('historico_doencas')
+    if len(paciente['historico_doencas']) > 300:
+        erros.append("historico_doencas excede 300 caracteres")
+
+    paciente['data_registro'] = texto('data_registro') or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if not validar_data_formato(paciente['data_registro'], "%Y-%m-%d %H:%M:%S"):
+        erros.append("data_registro inválida")
+
+    return paciente, erros
+
+
+@cronometrado('validacao_segundos')
+def validar_alteracoes(alteracoes):
+    """Valida só os campos informados (atualização parcial) e retorna (campos normalizados, erros)."""
+    erros = [f"{campo} não pode ser alterado" for campo in alteracoes if campo not in COLUNAS_ATUALIZAVEIS]
+    paciente, erros_paciente = validar_paciente(alteracoes)
+    # As mensagens de validar_paciente começam pelo nome do campo
+    erros += [erro for erro in erros_paciente if erro.split()[0] in alteracoes]
+    normalizados = {campo: paciente[campo] for campo in alteracoes
+                    if campo in COLUNAS_ATUALIZAVEIS and campo in paciente}
+    return normalizados, erros
+
+
 def obter_opcao(question, opcoes):  # utilizar quando a parte do questionario apresenta opções
     while True:
         print(f"\nOpções de {question}:")
@@ -210,18 +308,39 @@ def obter_opcao_sim_nao(pergunta):
 
 ###         MAPEAMENTOS        ###
 
+PRESSAO_ARTERIAL_OPCOES = [
+    '12/8', '11/7.5', '13/8.5', '12.5/8.8', '14.5/9.5', '15/8.8',
+    '16.5/10', '16/11', '19/13', '18/12', '8.5/5.5', '9/6', 'Não listado'
+]
+
+FREQUENCIA_ATIVIDADES_SEM_OPCOES = [
+    'ocasionalmente',
+    'até 1 vez por semana',
+    'até 2 vezes por semana',
+    'até 3 vezes por semana',
+    'até 4 vezes por semana',
+    '5 ou mais vezes por semana'
+]
+
 
 ###         FUNÇÕES DE MENU          ###
 
 
+@cronometrado('tabela_renderizacao_segundos')
+def formatar_tabela(linhas, **opcoes):
+    # tabulate só é carregado quando alguma tabela é exibida (a CLI e a API não precisam dele)
+    from tabulate import tabulate
+    return tabulate(linhas, **opcoes)
+
+
 def truncar_string(s, comprimento_maximo=20):
     """Trunca a string se exceder o comprimento máximo."""
     return (s[:comprimento_maximo - 3] + '...') if len(s) > comprimento_maximo else s
 
 
-def exibir_resumo_registro(cursor, registro, comprimento_maximo_coluna=20):
+def exibir_resumo_registro(registro, comprimento_maximo_coluna=20):
     if registro:
-        headers = [description[0] for description in cursor.description]
+        headers = registro._fields
         values = list(registro)
 
         # Truncar valores das colunas que excedem o comprimento máximo
@@ -229,7 +348,7 @@ def exibir_resumo_registro(cursor, registro, comprimento_maximo_coluna=20):
             str(value), comprimento_maximo_coluna) for value in values]
 
         print("\nResumo do Registro:")
-        print(tabulate([values_truncados], headers=headers, tablefmt="pretty"))
+        print(formatar_tabela([values_truncados], headers=headers, tablefmt="pretty"))
 
         return registro
 
@@ -237,52 +356,99 @@ def exibir_resumo_registro(cursor, registro, comprimento_maximo_coluna=20):
         print("Registro não encontrado.")
         return None
 
-def interagir_com_ia(registro):
-    if registro:
-        id_registro, nome_paciente, cpf, data_nascimento, genero, endereco, telefone, pressao_arterial, altura, peso, frequencia_atividades_sem, sono_regular, dieta_planejada, historico_doencas, data_registro = registro
-
-        # Criar a string formatada para enviar para IA
-        pergunta_formatada = f"""
-        O paciente {nome_paciente}, nascido em {data_nascimento}, possui a pressão arterial de {pressao_arterial}.
-        Sua altura é de {altura}m e seu peso de {peso}kg.
-        O paciente pratica atividades físicas em uma frequência de {frequencia_atividades_sem}.
-        Paciente possui um sono em torno de 7h/dia? {sono_regular}.
-        Paciente possui dieta planejada? {dieta_planejada}.
-        Segue um breve histórico de doenças do paciente: {historico_doencas}.
+LINK_IA = "https://api.openai.com/v1/chat/completions"
+ID_MODELO_IA = "gpt-3.5-turbo"
+
+
+def montar_pergunta_ia(registro, identificar=True):
+    paciente = Paciente._make(registro)
+
+    # Sem identificação, a pergunta contém apenas os campos clínicos usados na chave do cache,
+    # para que a resposta possa ser reaproveitada por outros pacientes com o mesmo perfil
+    if identificar:
+        apresentacao = f"O paciente {paciente.nome}, nascido em {paciente.data_nascimento}, possui"
+    else:
+        apresentacao = "O paciente possui"
+
+    # Criar a string formatada para enviar para IA
+    return f"""
+        {apresentacao} a pressão arterial de {paciente.pressao_arterial}.
+        Sua altura é de {paciente.altura}m e seu peso de {paciente.peso}kg.
+        O paciente pratica atividades físicas em uma frequência de {paciente.frequencia_atividades_sem}.
+        Paciente possui um sono em torno de 7h/dia? {paciente.sono_regular}.
+        Paciente possui dieta planejada? {paciente.dieta_planejada}.
+        Segue um breve histórico de doenças do paciente: {paciente.historico_doencas}.
         Considerando suas informações, faça breves sugestões de cuidados médicos que são necessários previamente, antes do contato com um profissional da área.
         """
 
-        print(pergunta_formatada)
 
-        # Enviando pergunta para a IA
-        headers = {"Authorization": f"Bearer {API_KEY}",
-                   "Content-Type": "application/json"}
-        link = "https://api.openai.com/v1/chat/completions"
-        id_modelo = "gpt-3.5-turbo"
+def montar_requisicao_ia(pergunta_formatada):
+    import json
+    from senha import API_KEY
 
-        body_mensagem = {
-            "model": id_modelo,
-            "messages": [{"role": "user", "content": pergunta_formatada}]
-        }
+    headers = {"Authorization": f"Bearer {API_KEY}",
+               "Content-Type": "application/json"}
 
-        body_mensagem = json.dumps(body_mensagem)
+    body_mensagem = {
+        "model": ID_MODELO_IA,
+        "messages": [{"role": "user", "content": pergunta_formatada}]
+    }
 
-        requisicao = requests.post(link, headers=headers, data=body_mensagem)
+    return headers, json.dumps(body_mensagem)
 
-        # Verificando o status da resposta
-        if requisicao.status_code == 200:
-            resposta = requisicao.json()
 
-            # Verificando a estrutura real do JSON retornado
-            if "choices" in resposta:
-                mensagem = resposta["choices"][0]["message"]["content"]
-                print("Resposta da IA:", mensagem)
-            else:
-                print("Estrutura inesperada na resposta da API.")
-        else:
-            print(
-                f"Falha na requisição. Código de status: {requisicao.status_code}")
+def buscar_sugestao_em_cache(registro):
+    import cache_ia
+    try:
+        chave = cache_ia.chave_perfil(registro)
+        mensagem = cache_ia.buscar_no_cache(chave)
+        contar('ia_cache_consultas_total', resultado='falha' if mensagem is None else 'acerto')
+        return chave, mensagem
+    except sqlite3.Error as e:
+        logging.warning(f"Cache da IA indisponível: {e}")
+        return None, None
+
 
+def guardar_sugestao_em_cache(chave, mensagem):
+    if chave is None:
+        return
+    import cache_ia
+    try:
+        cache_ia.gravar_no_cache(chave, mensagem)
+    except sqlite3.Error as e:
+        logging.warning(f"Não foi possível gravar no cache da IA: {e}")
+
+
+# Campos usados em montar_pergunta_ia: alterar os demais (endereço, telefone) não muda a sugestão
+CAMPOS_PERGUNTA_IA = {'nome', 'data_nascimento', 'pressao_arterial', 'altura', 'peso', 'frequencia_atividades_sem',
+                      'sono_regular', 'dieta_planejada', 'historico_doencas'}
+
+
+def enfileirar_sugestao_ia(cursor, id_cadastro):
+    enfileirar_sugestoes_ia(cursor, [id_cadastro])
+
+
+def enfileirar_sugestoes_ia(cursor, ids):
+    # Não duplica o trabalho se o paciente já tem uma sugestão aguardando o worker
+    agora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.executemany('''
+        INSERT INTO fila_ia (id_cadastro, criado_em, atualizado_em)
+        SELECT ?, ?, ?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM fila_ia WHERE id_cadastro = ? AND status = 'pendente'
+        )
+    ''', [(id_cadastro, agora, agora, id_cadastro) for id_cadastro in ids])
+
+
+def exibir_sugestao_ia(cursor, id_cadastro):
+    cursor.execute(
+        "SELECT resposta, gerado_em FROM sugestoes_ia WHERE id_cadastro = ?", (id_cadastro,))
+    sugestao = cursor.fetchone()
+
+    if sugestao:
+        print(f"\nSugestão da IA (gerada em {sugestao[1]}):\n{sugestao[0]}")
+    else:
+        print("\nA sugestão da IA para este paciente ainda não está pronta.")
 
 
 def criar_registro(conn, cursor):
@@ -357,12 +523,8 @@ def criar_registro(conn, cursor):
                 return
 
         # obtendo presao arterial
-        pressao_arterial_opcoes = [
-            '12/8', '11/7.5', '13/8.5', '12.5/8.8', '14.5/9.5', '15/8.8',
-            '16.5/10', '16/11', '19/13', '18/12', '8.5/5.5', '9/6', 'Não listado'
-        ]
         pressao_arterial = obter_opcao(
-            "Pressão Arterial mais próxima: ", pressao_arterial_opcoes)
+            "Pressão Arterial mais próxima: ", PRESSAO_ARTERIAL_OPCOES)
 
         # altura e peso com validações
         altura_valida = False
@@ -388,18 +550,9 @@ def criar_registro(conn, cursor):
                     "Peso inválido. O formato é quilos.gramas. Tente novamente ou 'x' para cancelar.")
 
         # frequência de atividades físicas semanal
-        frequencia_atividades_sem_opcoes = [
-            'ocasionalmente',
-            'até 1 vez por semana',
-            'até 2 vezes por semana',
-            'até 3 vezes por semana',
-            'até 4 vezes por semana',
-            '5 ou mais vezes por semana'
-        ]
-
         while True:
             print("\nEscolha a frequência de atividades físicas:")
-            for i, opcao in enumerate(frequencia_atividades_sem_opcoes, start=0):
+            for i, opcao in enumerate(FREQUENCIA_ATIVIDADES_SEM_OPCOES, start=0):
                 print(f"{i}. {opcao}")
 
             opcao_escolhida = input("Opção: ")
@@ -441,22 +594,27 @@ def criar_registro(conn, cursor):
         # Inserir no banco de dados
         data_registro = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         data_nascimento_formatada = data_nascimento.strftime("%Y-%m-%d")
-        cursor.execute('''
-            INSERT INTO cadastro 
-            (nome, cpf, data_nascimento, genero, endereco, telefone, pressao_arterial, altura, peso, frequencia_atividades_sem, sono_regular, dieta_planejada, historico_doencas, data_registro) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (nome_paciente, cpf_input, data_nascimento_formatada, genero, endereco, telefone, pressao_arterial, altura, peso, frequencia_atividades_sem_opcoes[frequencia_atividades_sem], sono_regular, dieta_planejada, historico_doencas, data_registro))
-
-        conn.commit()
-
-        # Exibir resumo
-        cursor.execute('SELECT * FROM cadastro WHERE cpf = ?', (cpf_input,))
-        novo_registro = cursor.fetchone()
-        registro_interacao = exibir_resumo_registro(cursor, novo_registro)
-
-        # Interagir com a IA
-        if registro_interacao:
-            interagir_com_ia(registro_interacao)
+        with medir_operacao('criar_registro') as medicao:
+            id_cadastro = repositorio.inserir(cursor, {
+                'nome': nome_paciente, 'cpf': cpf_input, 'data_nascimento': data_nascimento_formatada,
+                'genero': genero, 'endereco': endereco, 'telefone': telefone,
+                'pressao_arterial': pressao_arterial, 'altura': altura, 'peso': peso,
+                'frequencia_atividades_sem': FREQUENCIA_ATIVIDADES_SEM_OPCOES[frequencia_atividades_sem],
+                'sono_regular': sono_regular, 'dieta_planejada': dieta_planejada,
+                'historico_doencas': historico_doencas, 'data_registro': data_registro,
+            })
+            medicao.linhas = 1
+            medicao.detalhes['id_cadastro'] = id_cadastro
+
+            # A sugestão da IA é gerada pelo worker, sem bloquear o atendimento
+            enfileirar_sugestao_ia(cursor, id_cadastro)
+
+            conn.commit()
+
+            # Exibir resumo
+            novo_registro = repositorio.buscar_por_id(cursor, id_cadastro)
+        exibir_resumo_registro(novo_registro)
+        print("A sugestão da IA será gerada em segundo plano.")
 
         logging.info(f"Registro criado com sucesso. CPF: {cpf_input}")
         print("Registro criado com sucesso.")
@@ -470,234 +628,256 @@ def criar_registro(conn, cursor):
 
 
 
-def ler_registros(cursor):
-    try:
-        cursor.execute("SELECT * FROM cadastro")
-        registros = cursor.fetchall()
+TAMANHO_PAGINA = 20
 
-        for registro in registros:
-            print(registro)
+
+def ler_registros(cursor, tamanho_bloco=500):
+    try:
+        with medir_operacao('ler_registros') as medicao:
+            medicao.linhas = 0
+            # Lê em blocos para não carregar a tabela inteira na memória
+            for registro in repositorio.percorrer(cursor, tamanho_bloco):
+                print(registro)
+                medicao.linhas += 1
     except sqlite3.Error as e:
         print(f"Erro ao ler registros: {e}")
 
 
-def visualizar_todos_os_registros(cursor, comprimento_maximo_coluna=20):
+def buscar_pagina(cursor, a_partir_do_id=0, antes_do_id=None, tamanho_pagina=TAMANHO_PAGINA):
+    with medir_operacao('buscar_pagina') as medicao:
+        pagina = repositorio.buscar_pagina(cursor, a_partir_do_id, antes_do_id, tamanho_pagina)
+        medicao.linhas = len(pagina)
+    return pagina
+
+
+def visualizar_todos_os_registros(cursor, comprimento_maximo_coluna=20, tamanho_pagina=TAMANHO_PAGINA):
     try:
-        cursor.execute("SELECT * FROM cadastro")
-        registros = cursor.fetchall()
+        registros = buscar_pagina(cursor, tamanho_pagina=tamanho_pagina)
 
         if not registros:
             print("Nenhum registro encontrado.")
             return
 
-        headers = [description[0] for description in cursor.description]
-        registros_formatados = []
+        headers = Paciente._fields
 
-        for registro in registros:
-            registro_formatado = [truncar_string(
-                str(campo), comprimento_maximo_coluna) for campo in registro]
-            registros_formatados.append(registro_formatado)
+        while True:
+            # Somente a página visível é formatada
+            registros_formatados = [[truncar_string(str(campo), comprimento_maximo_coluna) for campo in registro]
+                                    for registro in registros]
+            print(formatar_tabela(registros_formatados, headers=headers, tablefmt="pretty"))
+            print(f"IDs {registros[0][0]} a {registros[-1][0]}")
+
+            comando = input(
+                "(P) próxima página, (A) página anterior, (I) ir para ID, (X) voltar: ").strip().lower()
 
-        print(tabulate(registros_formatados, headers=headers, tablefmt="pretty"))
+            if comando == 'x':
+                return
+            elif comando == 'p':
+                pagina = buscar_pagina(cursor, a_partir_do_id=registros[-1][0] + 1, tamanho_pagina=tamanho_pagina)
+                if pagina:
+                    registros = pagina
+                else:
+                    print("Esta é a última página.")
+            elif comando == 'a':
+                pagina = buscar_pagina(cursor, antes_do_id=registros[0][0], tamanho_pagina=tamanho_pagina)
+                if pagina:
+                    registros = pagina
+                else:
+                    print("Esta é a primeira página.")
+            elif comando == 'i':
+                id_inicial = input("Digite o ID: ")
+                if not id_inicial.isdigit():
+                    print("ID inválido.")
+                    continue
+                pagina = buscar_pagina(cursor, a_partir_do_id=int(id_inicial), tamanho_pagina=tamanho_pagina)
+                if pagina:
+                    registros = pagina
+                else:
+                    print(f"Nenhum registro a partir do ID {id_inicial}.")
+            else:
+                print("Opção inválida. Tente novamente.")
     except sqlite3.Error as e:
         print(f"Erro ao visualizar registros: {e}")
 
 
-def editar_registro(conn, cursor):
-    try:
-        id_para_atualizar = input(
-            "Digite o ID do registro a ser atualizado ('x' para voltar): ")
-
-        if id_para_atualizar.lower() == 'x':
-            return
-
-        cursor.execute('SELECT * FROM cadastro WHERE id = ?',
-                       (id_para_atualizar,))
-        registro = cursor.fetchone()
+def pesquisar_pacientes(cursor, comprimento_maximo_coluna=30):
+    texto = input("Digite os termos da busca (\"frase exata\", diab* para prefixo, 'x' para voltar): ").strip()
+    if not texto or texto.lower() == 'x':
+        return
 
-        if not registro:
-            print(f"Registro com ID {id_para_atualizar} não encontrado.")
-            return
+    campos = None
+    if obter_opcao_sim_nao("Restringir a busca a um campo?") == 'sim':
+        campos = [obter_opcao("campo", list(COLUNAS_BUSCA))]
 
-        print("\nRegistro Atual:")
-        headers = [description[0] for description in cursor.description]
-        registro_interacao = exibir_resumo_registro(cursor, registro)
-
-        novo_nome_paciente = input("Novo Nome do paciente: ")
+    pagina = 0
+    try:
+        while True:
+            with medir_operacao('pesquisar_pacientes', pagina=pagina) as medicao:
+                headers, registros, ha_mais = buscar_pacientes(cursor, texto, pagina, TAMANHO_PAGINA, campos)
+                medicao.linhas = len(registros)
 
-        # Verifica se o campo novo_nome_paciente não está em branco
-        while not novo_nome_paciente.strip():
-            print("Novo Nome do paciente não pode ser deixado em branco.")
-            novo_nome_paciente = input("Novo Nome do paciente: ")
-            if novo_nome_paciente.lower() == 'x':
-                print("Operação cancelada. Voltando ao menu principal.")
+            if not registros:
+                print("Nenhum paciente encontrado.")
                 return
 
-        novo_cpf_input = input("Novo CPF do paciente: ")
-
-        while not validar_cpf(novo_cpf_input):
-            print(
-                "Novo CPF inválido. Por favor, entre com um CPF válido (11 dígitos numéricos) ou 'x' para cancelar.")
-            novo_cpf_input = input("Novo CPF do paciente: ")
-            if novo_cpf_input.lower() == 'x':
-                print("Operação cancelada. Voltando ao menu principal.")
-                return
+            registros_formatados = [[truncar_string(str(campo), comprimento_maximo_coluna) for campo in registro]
+                                    for registro in registros]
+            print(formatar_tabela(registros_formatados, headers=headers, tablefmt="pretty"))
+            print(f"Página {pagina + 1}")
 
-        nova_data_nascimento_str = input(
-            "Nova Data de Nascimento (YYYY-MM-DD): ")
-        while not validar_data(nova_data_nascimento_str):
-            print(
-                "Nova Data de Nascimento inválida. Tente novamente ou 'x' para cancelar.")
-            nova_data_nascimento_str = input(
-                "Nova Data de Nascimento (YYYY-MM-DD): ")
-            if nova_data_nascimento_str.lower() == 'x':
-                print("Operação cancelada. Voltando ao menu principal.")
-                return
-        # Convertendo a string para um objeto datetime
-        nova_data_nascimento = datetime.strptime(
-            nova_data_nascimento_str, "%Y-%m-%d").replace(hour=0, minute=0, second=0)
+            while True:
+                comando = input("(P) próxima página, (A) página anterior, (X) voltar: ").strip().lower()
 
-        novo_genero = input(
-            "Novo Gênero (M para Masculino, F para Feminino, N para Não informar): ").upper()
+                if comando == 'x':
+                    return
+                elif comando == 'p' and ha_mais:
+                    pagina += 1
+                    break
+                elif comando == 'p':
+                    print("Esta é a última página.")
+                elif comando == 'a' and pagina > 0:
+                    pagina -= 1
+                    break
+                elif comando == 'a':
+                    print("Esta é a primeira página.")
+                else:
+                    print("Opção inválida. Tente novamente.")
+    except ValueError as e:
+        print(e)
+    except sqlite3.Error as e:
+        print(f"Erro ao buscar pacientes: {e}")
+
+
+# Pergunta de cada campo na edição; Enter mantém o valor atual
+ROTULOS_EDICAO = {
+    'nome': "Nome do paciente",
+    'cpf': "CPF do paciente",
+    'data_nascimento': "Data de Nascimento (YYYY-MM-DD)",
+    'genero': "Gênero (M para Masculino, F para Feminino, N para Não informar)",
+    'endereco': "Endereço paciente",
+    'telefone': "Telefone (no formato DDD9numero)",
+    'pressao_arterial': "Pressão Arterial (número da opção)",
+    'altura': "Altura do paciente (em metros)",
+    'peso': "Peso do paciente (em kg)",
+    'frequencia_atividades_sem': "Frequência de atividades físicas (número da opção)",
+    'sono_regular': "Sono regular, em torno de 7h/dia? (1 para sim, 2 para não)",
+    'dieta_planejada': "Dieta planejada? (1 para sim, 2 para não)",
+    'historico_doencas': "Histórico de doenças (limite: 300 caracteres)",
+}
+
+# Campos escolhidos em uma lista, numerada a partir de 1 como em obter_opcao
+OPCOES_EDICAO = {
+    'pressao_arterial': PRESSAO_ARTERIAL_OPCOES,
+    'frequencia_atividades_sem': FREQUENCIA_ATIVIDADES_SEM_OPCOES,
+}
+
+
+def ler_campo_editado(campo, atual):
+    """Pede o novo valor do campo; retorna {campo: valor normalizado}, {} para manter o atual ou None se cancelado."""
+    opcoes = OPCOES_EDICAO.get(campo)
+    if opcoes:
+        print("\nOpções:")
+        for i, opcao in enumerate(opcoes, start=1):
+            print(f"{i}. {opcao}")
 
-        while novo_genero not in ['M', 'F', 'N']:
-            print(
-                "Opção inválida. Escolha M para Masculino, F para Feminino, ou N para Não informar.")
-            novo_genero = input(
-                "Novo Gênero (M para Masculino, F para Feminino, N para Não informar): ").upper()
+    while True:
+        valor = input(f"{ROTULOS_EDICAO[campo]} [{'' if atual is None else atual}]: ").strip()
+        if valor.lower() == 'x':
+            return None
+        if not valor:
+            return {}
+        if opcoes and valor.isdigit():
+            # validar_paciente leria o número como índice a partir de 0 (formato dos arquivos)
+            if not 1 <= int(valor) <= len(opcoes):
+                print("Opção inválida. Tente novamente, Enter para manter ou 'x' para cancelar.")
+                continue
+            valor = opcoes[int(valor) - 1]
+        normalizados, erros = validar_alteracoes({campo: valor})
+        if not erros:
+            return normalizados
+        print(f"Valor inválido: {'; '.join(erros)}. Tente novamente, Enter para manter ou 'x' para cancelar.")
 
-        novo_endereco = input("Novo Endereço paciente: ")
-        # Verifica se o campo novo_endereco não está em branco
-        while not novo_endereco.strip():
-            print("Novo Endereço paciente não pode ser deixado em branco.")
-            novo_endereco = input("Novo Endereço paciente: ")
 
-        novo_telefone = input("Novo Telefone (no formato DDD9numero): ")
-        while not validar_telefone(novo_telefone):
-            print(
-                "Novo Telefone inválido. Tente novamente ou 'x' para cancelar.")
-            novo_telefone = input("Novo Telefone (no formato DDD9numero): ")
-            if novo_telefone.lower() == 'x':
-                print("Operação cancelada. Voltando ao menu principal.")
-                return
+def editar_registro(conn, cursor):
+    alteracoes = {}
+    try:
+        id_para_atualizar = input(
+            "Digite o ID do registro a ser atualizado ('x' para voltar): ")
 
-        # Lógica para pressão arterial
-        # Definição das opções de pressão arterial
-        pressao_arterial_opcoes = [
-            '12/8', '11/7.5', '13/8.5', '12,5/8.8', '14.5/9.5', '15/8.8',
-            '16.5/10', '16/11', '19/13', '18/12', '8.5/5.5', '9/6', 'Não listado'
-        ]
+        if id_para_atualizar.lower() == 'x':
+            return
 
-        opcao_pressao_arterial = obter_opcao(
-            "Pressão Arterial", pressao_arterial_opcoes)
+        # Direto do banco: o cache pode não ter as alterações feitas em outro terminal
+        with medir_operacao('buscar_registro', id_cadastro=id_para_atualizar) as medicao:
+            registro = repositorio.buscar_por_id(cursor, id_para_atualizar, usar_cache=False)
+            medicao.linhas = int(registro is not None)
+            if not registro:
+                medicao.resultado = 'nao_encontrado'
 
-        if opcao_pressao_arterial is None:
-            nova_pressao_arterial = registro['pressao_arterial']
-        else:
-            nova_pressao_arterial = opcao_pressao_arterial
+        if not registro:
+            print(f"Registro com ID {id_para_atualizar} não encontrado.")
+            return
 
-        # Altura e Peso
-        altura_valida = False
-        while not altura_valida:
-            nova_altura = input("Nova Altura do paciente (em metros): ")
-            if nova_altura.lower() == 'x':
-                print("Operação cancelada. Voltando ao menu principal.")
-                return
-            altura_valida = validar_altura(nova_altura)
-            if not altura_valida:
-                print(
-                    "Altura inválida. O formato é metros.centímetros. Tente novamente ou 'x' para cancelar.")
+        print("\nRegistro Atual:")
+        exibir_resumo_registro(registro)
+        exibir_sugestao_ia(cursor, registro.id)
 
-        peso_valido = False
-        while not peso_valido:
-            novo_peso = input("Novo Peso do paciente (em kg): ")
-            if novo_peso.lower() == 'x':
+        print("\nPressione Enter para manter o valor atual (entre colchetes) ou 'x' para cancelar.")
+        for campo in COLUNAS_ATUALIZAVEIS:
+            novo = ler_campo_editado(campo, getattr(registro, campo))
+            if novo is None:
                 print("Operação cancelada. Voltando ao menu principal.")
                 return
-            peso_valido = validar_peso(novo_peso)
-            if not peso_valido:
-                print(
-                    "Peso inválido. O formato é quilos.gramas. Tente novamente ou 'x' para cancelar.")
-
-        # frequência de atividades físicas semanal
-        frequencia_atividades_sem_opcoes = [
-            'ocasionalmente',
-            'até 1 vez por semana',
-            'até 2 vezes por semana',
-            'até 3 vezes por semana',
-            'até 4 vezes por semana',
-            '5 ou mais vezes por semana'
-        ]
-
-        while True:
-            print("\nEscolha a frequência de atividades físicas:")
-            for i, opcao in enumerate(frequencia_atividades_sem_opcoes, start=0):
-                print(f"{i}. {opcao}")
-
-            opcao_escolhida = input("Opção: ")
-
-            if opcao_escolhida.isdigit() and 0 <= int(opcao_escolhida) <= 5:
-                frequencia_atividades_sem = frequencia_atividades_sem_opcoes[int(
-                    opcao_escolhida)]
-                break
-            else:
-                print(
-                    "Opção inválida. Por favor, escolha uma opção de 0 a 5 ou 'x' para voltar ao menu principal.")
+            alteracoes.update({campo: valor for campo, valor in novo.items() if valor != getattr(registro, campo)})
 
-        sono_regular = obter_opcao_sim_nao(
-            "O paciente possui sono regular? Em torno de 7h/dia?")
-        if sono_regular is None:
+        if not alteracoes:
+            print("Nenhuma alteração informada. Voltando ao menu principal.")
             return
 
-        # Questão sobre a dieta planejada
-        dieta_planejada = obter_opcao_sim_nao(
-            "O paciente possui dieta planejada?")
-        if dieta_planejada is None:
-            return
-
-        historico_doencas = input(
-            "O paciente possui algum histórico de doenças ou condições específicas? (Limite: 300 caracteres)\n")
-
-        # Validar o comprimento da resposta
-        while len(historico_doencas) > 300:
-            print("A resposta excede o limite de 300 caracteres.")
-            historico_doencas = input(
-                "O paciente possui algum histórico de doenças ou condições específicas? (Limite: 300 caracteres)\n")
+        # Só os campos alterados são gravados
+        with medir_operacao('editar_registro', id_cadastro=registro.id, colunas=sorted(alteracoes)) as medicao:
+            existia = repositorio.atualizar_campos(cursor, registro.id, alteracoes)
+            medicao.linhas = int(existia)
+            if not existia:
+                medicao.resultado = 'nao_encontrado'
+            elif CAMPOS_PERGUNTA_IA.intersection(alteracoes):
+                # A sugestão da IA é refeita pelo worker com os dados atualizados
+                enfileirar_sugestao_ia(cursor, registro.id)
 
-        # Atualizar no banco de dados, incluindo a nova coluna frequencia_atividades_sem
-        cursor.execute('''
-            UPDATE cadastro
-            SET nome = ?, cpf = ?, data_nascimento = ?, genero = ?, endereco = ?, telefone = ?, 
-                pressao_arterial = ?, altura = ?, peso = ?, frequencia_atividades_sem = ?, sono_regular = ?,
-                       dieta_planejada = ?, historico_doencas = ? 
-            WHERE id = ?
-        ''', (novo_nome_paciente, novo_cpf_input, nova_data_nascimento,
-              novo_genero, novo_endereco, novo_telefone, nova_pressao_arterial, nova_altura, novo_peso, frequencia_atividades_sem, sono_regular, dieta_planejada, historico_doencas, id_para_atualizar))
+            conn.commit()
 
-        conn.commit()
+        if not existia:
+            print(f"Registro com ID {registro.id} não encontrado: foi excluído em outro terminal. Nada foi alterado.")
+            return
 
         # Exibir resumo
-        cursor.execute('SELECT * FROM cadastro WHERE id = ?',
-                       (id_para_atualizar,))
-        registro_atualizado = cursor.fetchone()
-        exibir_resumo_registro(cursor, registro_atualizado)
-
-        # Interagir com a IA
-        if registro_interacao:
-            interagir_com_ia(registro_interacao)
+        registro_atualizado = repositorio.buscar_por_id(cursor, registro.id)
+        exibir_resumo_registro(registro_atualizado)
+        if CAMPOS_PERGUNTA_IA.intersection(alteracoes):
+            print("A nova sugestão da IA será gerada em segundo plano.")
 
         logging.info(
-            f"Registro atualizado com sucesso. ID: {id_para_atualizar}")
+            f"Registro atualizado com sucesso. ID: {id_para_atualizar}, campos {sorted(alteracoes)}")
         print("Registro atualizado com sucesso.")
     except sqlite3.IntegrityError:
         logging.warning(
-            f"Tentativa de atualizar registro com CPF duplicado: {novo_cpf_input}")
+            f"Tentativa de atualizar registro com CPF duplicado: {alteracoes.get('cpf')}")
         print("Erro ao atualizar registro: O novo CPF já está em uso.")
     except sqlite3.Error as e:
         logging.error(f"Erro ao atualizar registro: {e}")
         print(f"Erro ao atualizar registro: {e}")
 
 
+def remover_paciente(cursor, id_cadastro):
+    """Exclui o cadastro, a sugestão da IA e os jobs ainda não processados; retorna se o cadastro existia."""
+    with medir_operacao('remover_paciente', id_cadastro=id_cadastro) as medicao:
+        existia = repositorio.remover(cursor, id_cadastro)
+        medicao.linhas = int(existia)
+        if not existia:
+            medicao.resultado = 'nao_encontrado'
+    return existia
+
+
 def excluir_registro(conn, cursor):
     try:
         id_para_excluir = input(
@@ -706,17 +886,19 @@ def excluir_registro(conn, cursor):
         if id_para_excluir.lower() == 'x':
             return
 
-        cursor.execute('SELECT * FROM cadastro WHERE id = ?',
-                       (id_para_excluir,))
-        registro = cursor.fetchone()
+        # Direto do banco: o cache pode não ter as alterações feitas em outro terminal
+        with medir_operacao('buscar_registro', id_cadastro=id_para_excluir) as medicao:
+            registro = repositorio.buscar_por_id(cursor, id_para_excluir, usar_cache=False)
+            medicao.linhas = int(registro is not None)
+            if not registro:
+                medicao.resultado = 'nao_encontrado'
 
         if not registro:
             print(f"Registro com ID {id_para_excluir} não encontrado.")
             return
 
         print("\nRegistro a ser Excluído:")
-        headers = [description[0] for description in cursor.description]
-        print(tabulate([registro], headers=headers, tablefmt="pretty"))
+        print(formatar_tabela([registro], headers=registro._fields, tablefmt="pretty"))
 
         confirmacao = input(
             f"Tem certeza de que deseja excluir o registro com ID {id_para_excluir}? (S/N): ").upper()
@@ -726,11 +908,14 @@ def excluir_registro(conn, cursor):
             return
 
         # Excluir no banco de dados
-        cursor.execute('DELETE FROM cadastro WHERE id = ?',
-                       (id_para_excluir,))
+        existia = remover_paciente(cursor, registro.id)
 
         conn.commit()
 
+        if not existia:
+            print(f"Registro com ID {registro.id} não encontrado: já foi excluído em outro terminal.")
+            return
+
         logging.info(f"Registro excluído com sucesso. ID: {id_para_excluir}")
         print("Registro excluído com sucesso.")
     except sqlite3.Error as e:
@@ -738,49 +923,259 @@ def excluir_registro(conn, cursor):
         print(f"Erro ao excluir registro: {e}")
 
 
+###          OPERAÇÕES EM LOTE        ###
+
+LIMITE_PREVIA_LOTE = 10
+
+
+def atualizar_pacientes(cursor, ids, alteracoes):
+    """Aplica as mesmas alterações (já validadas) a todos os ids com um executemany; retorna quantos mudaram."""
+    with medir_operacao('atualizar_pacientes', colunas=sorted(alteracoes)) as medicao:
+        medicao.linhas = repositorio.atualizar_campos_em_lote(
+            cursor, [(id_cadastro, alteracoes) for id_cadastro in ids])
+        if CAMPOS_PERGUNTA_IA.intersection(alteracoes):
+            enfileirar_sugestoes_ia(cursor, ids)
+    return medicao.linhas
+
+
+def remover_pacientes(cursor, ids):
+    """Exclui os cadastros, as sugestões e os jobs pendentes de todos os ids; retorna quantos existiam."""
+    with medir_operacao('remover_pacientes') as medicao:
+        medicao.linhas = repositorio.remover_em_lote(cursor, ids)
+    return medicao.linhas
+
+
+def selecionar_registros(cursor):
+    """Pede IDs ou um filtro e mostra a prévia da seleção; retorna os ids, ou None se não houver nenhum."""
+    print("\nInforme os IDs separados por vírgula (ex.: 3, 8, 15) ou um filtro com condições separadas")
+    print("por ';' (ex.: genero=F; data_registro<2020-01-01; local=Recife; historico_doencas~asma).")
+    while True:
+        selecao = input("Seleção ('x' para voltar): ").strip()
+        if selecao.lower() == 'x':
+            return None
+        try:
+            partes = selecao.replace(',', ' ').split()
+            if partes and all(parte.isdigit() for parte in partes):
+                pedidos = [int(parte) for parte in partes]
+                ids = repositorio.ids_existentes(cursor, pedidos)
+                faltando = sorted(set(pedidos).difference(ids))
+                if faltando:
+                    print(f"ID(s) não encontrado(s), fora da seleção: {', '.join(map(str, faltando))}")
+            else:
+                ids = repositorio.buscar_ids(cursor, selecao)
+            break
+        except ValueError as e:
+            print(f"{e} Tente novamente ou 'x' para voltar.")
+
+    if not ids:
+        print("Nenhum registro encontrado para a seleção.")
+        return None
+
+    print(f"\n{len(ids)} registro(s) selecionado(s).")
+    previa = repositorio.buscar_por_ids(cursor, ids[:LIMITE_PREVIA_LOTE])
+    print(formatar_tabela(list(previa.values()), headers=Paciente._fields, tablefmt="pretty"))
+    if len(ids) > LIMITE_PREVIA_LOTE:
+        print(f"... e mais {len(ids) - LIMITE_PREVIA_LOTE} registro(s).")
+    return ids
+
+
+def ler_alteracoes(permitir_cpf=True):
+    """Lê alterações 'campo=valor' até uma linha em branco, validando cada uma; None se cancelado."""
+    campos = [campo for campo in COLUNAS_ATUALIZAVEIS if permitir_cpf or campo != 'cpf']
+    print(f"\nCampos: {', '.join(campos)}")
+    print("Digite uma alteração por linha no formato campo=valor (linha em branco para concluir, 'x' para cancelar).")
+    alteracoes = {}
+    while True:
+        linha = input("Alteração: ").strip()
+        if not linha:
+            return alteracoes
+        if linha.lower() == 'x':
+            return None
+
+        campo, separador, valor = linha.partition('=')
+        campo = campo.strip()
+        if not separador or campo not in campos:
+            print(f"Use campo=valor com um destes campos: {', '.join(campos)}")
+            continue
+        normalizados, erros = validar_alteracoes({campo: valor.strip()})
+        if erros:
+            print(f"Valor inválido: {'; '.join(erros)}.")
+            continue
+        alteracoes.update(normalizados)
+
+
+def atualizar_em_lote(conn, cursor):
+    alteracoes = {}
+    try:
+        ids = selecionar_registros(cursor)
+        if not ids:
+            return
+
+        # CPF é único: só pode ser trocado com um registro selecionado
+        alteracoes = ler_alteracoes(permitir_cpf=len(ids) == 1)
+        if not alteracoes:
+            print("Nenhuma alteração informada. Voltando ao menu principal.")
+            return
+
+        print("\nAlterações:")
+        for campo, valor in alteracoes.items():
+            print(f"- {campo}: {valor}")
+        confirmacao = input(f"Confirma a alteração de {len(ids)} registro(s)? (S/N): ").upper()
+        if confirmacao != 'S':
+            print("Operação cancelada. Voltando ao menu principal.")
+            return
+
+        # Todos os registros em uma única transação: em caso de erro, nenhum é alterado
+        with conn:
+            alterados = atualizar_pacientes(cursor, ids, alteracoes)
+
+        logging.info(f"Atualização em lote: {alterados} registro(s), campos {sorted(alteracoes)}.")
+        print(f"{alterados} registro(s) atualizado(s) com sucesso.")
+    except sqlite3.IntegrityError as e:
+        if 'cpf' in alteracoes:
+            print("O novo CPF já está em uso. Nenhum registro foi alterado.")
+        else:
+            logging.error(f"Erro na atualização em lote: {e}")
+            print(f"Erro na atualização em lote: {e}. Nenhum registro foi alterado.")
+    except sqlite3.Error as e:
+        logging.error(f"Erro na atualização em lote: {e}")
+        print(f"Erro na atualização em lote: {e}")
+
+
+def excluir_em_lote(conn, cursor):
+    try:
+        ids = selecionar_registros(cursor)
+        if not ids:
+            return
+
+        confirmacao = input(f"Tem certeza de que deseja excluir {len(ids)} registro(s)? (S/N): ").upper()
+        if confirmacao != 'S':
+            print("Operação cancelada. Voltando ao menu principal.")
+            return
+
+        with conn:
+            removidos = remover_pacientes(cursor, ids)
+
+        logging.info(f"Exclusão em lote: {removidos} registro(s).")
+        print(f"{removidos} registro(s) excluído(s) com sucesso.")
+    except sqlite3.Error as e:
+        logging.error(f"Erro na exclusão em lote: {e}")
+        print(f"Erro na exclusão em lote: {e}")
+
+
 ###          FUNÇÕES DE RELATORIOS        ###
 
-def relatorio_por_genero(cursor, genero):
+LINHAS_PREVIA_RELATORIO = 50
+TAMANHO_BLOCO_RELATORIO = 500
+TAMANHO_BUFFER_RELATORIO = 1 << 16
+
+
+def escrever_relatorio(cursor, caminho, formato='json', primeiros=()):
+    """Grava o resultado do cursor registro a registro e retorna quantos registros foram gravados."""
+    with open(caminho, 'w', encoding='utf-8', buffering=TAMANHO_BUFFER_RELATORIO) as arquivo:
+        return escrever_registros(cursor, arquivo, formato, primeiros)
+
+
+def escrever_registros(cursor, arquivo, formato='json', primeiros=()):
+    import json
+
+    # 'json' gera um array escrito incrementalmente; 'ndjson' grava um objeto por linha
+    headers = [description[0] for description in cursor.description]
+    total = 0
+
+    def blocos():
+        if primeiros:
+            yield primeiros
+        while True:
+            registros = cursor.fetchmany(TAMANHO_BLOCO_RELATORIO)
+            if not registros:
+                return
+            yield registros
+
+    if formato == 'json':
+        arquivo.write('[')
+
+    for registros in blocos():
+        for registro in registros:
+            linha = json.dumps(dict(zip(headers, registro)), ensure_ascii=False, default=str)
+            if formato == 'json':
+                arquivo.write(('\n  ' if total == 0 else ',\n  ') + linha)
+            else:
+                arquivo.write(linha + '\n')
+            total += 1
+
+    if formato == 'json':
+        arquivo.write('\n]\n' if total else ']\n')
+
+    return total
+
+
+FORMATOS_RELATORIO = ['json', 'ndjson', 'parquet', 'arrow']
+
+
+def gravar_relatorio(cursor, caminho, formato='json', primeiros=()):
+    if formato in ('parquet', 'arrow'):
+        # pyarrow só é carregado quando a exportação colunar é pedida
+        try:
+            from exportacao_colunar import escrever_relatorio_colunar
+        except ImportError:
+            logging.error(f"Exportação em {formato} indisponível: pyarrow não está instalado.")
+            print(f"A exportação em {formato} requer o pacote pyarrow.")
+            return None
+        return escrever_relatorio_colunar(cursor, caminho, formato, primeiros)
+    return escrever_relatorio(cursor, caminho, formato, primeiros)
+
+
+def exibir_previa_relatorio(cursor, primeiros):
+    headers = [description[0] for description in cursor.description]
+    print(formatar_tabela(primeiros, headers=headers, tablefmt="pretty"))
+
+
+def informar_relatorio_salvo(caminho, total, exibidos):
+    if total is None:
+        return
+    if total > exibidos:
+        print(f"Exibindo {exibidos} de {total} registros.")
+    print(f"Relatório salvo em: {caminho}")
+
+
+def relatorio_por_genero(cursor, genero, formato='json'):
     try:
         # Converter o gênero para letras maiúsculas
         genero = genero.upper()
 
-        cursor.execute('''
-            SELECT * FROM cadastro
-            WHERE UPPER(genero) = ?
-        ''', (genero,))
+        with medir_operacao('relatorio_por_genero', genero=genero, formato=formato) as medicao:
+            with medir('relatorio_sql_segundos', relatorio='genero'):
+                cursor.execute(SQL_RELATORIO_GENERO, (genero,))
 
-        registros = cursor.fetchall()
+                # Somente a prévia fica em memória; o restante vai direto do cursor para o arquivo
+                primeiros = cursor.fetchmany(LINHAS_PREVIA_RELATORIO)
 
-        if not registros:
-            print(f"Nenhum registro encontrado para o gênero '{genero}'.")
-            return
+            if not primeiros:
+                medicao.resultado = 'vazio'
+                print(f"Nenhum registro encontrado para o gênero '{genero}'.")
+                return
 
-        headers = [description[0] for description in cursor.description]
-        print(tabulate(registros, headers=headers, tablefmt="pretty"))
+            exibir_previa_relatorio(cursor, primeiros)
 
-        # Criar um diretório 'relatorios' se não existir
-        diretorio_relatorios = 'relatorios'
-        if not os.path.exists(diretorio_relatorios):
-            os.makedirs(diretorio_relatorios)
+            # Criar um diretório 'relatorios' se não existir
+            diretorio_relatorios = 'relatorios'
+            if not os.path.exists(diretorio_relatorios):
+                os.makedirs(diretorio_relatorios)
 
-        # Gerar o caminho do arquivo JSON
-        caminho_arquivo_json = os.path.join(
-            diretorio_relatorios, f'relatorio_{genero}.json')
-
-        # Salvar os registros em um arquivo JSON
-        with open(caminho_arquivo_json, 'w') as arquivo_json:
-            registros_dict = [dict(zip(headers, registro))
-                              for registro in registros]
-            json.dump(registros_dict, arquivo_json, indent=2)
+            # Gerar o caminho do arquivo JSON
+            caminho_arquivo_json = os.path.join(
+                diretorio_relatorios, f'relatorio_{genero}.{formato}')
 
-        print(f"Relatório salvo em: {caminho_arquivo_json}")
+            total = gravar_relatorio(cursor, caminho_arquivo_json, formato, primeiros)
+            medicao.linhas = total
+            informar_relatorio_salvo(caminho_arquivo_json, total, len(primeiros))
 
     except sqlite3.Error as e:
         print(f"Erro ao gerar relatório por gênero: {e}")
 
 
-def relatorio_por_data(cursor, data_inicial, data_final):
+def relatorio_por_data(cursor, data_inicial, data_final, formato='json'):
     try:
         # Converter as datas para objetos datetime
         data_inicial_dt = datetime.strptime(data_inicial, "%Y-%m-%d")
@@ -789,73 +1184,118 @@ def relatorio_por_data(cursor, data_inicial, data_final):
         # Adicionar a parte de horas, minutos e segundos para incluir o dia inteiro
         data_final_dt = data_final_dt.replace(hour=23, minute=59, second=59)
 
-        cursor.execute('''
-            SELECT * FROM cadastro
-            WHERE data_registro BETWEEN ? AND ?
-        ''', (data_inicial_dt, data_final_dt))
+        with medir_operacao('relatorio_por_data', data_inicial=data_inicial, data_final=data_final,
+                            formato=formato) as medicao:
+            with medir('relatorio_sql_segundos', relatorio='data'):
+                cursor.execute(SQL_RELATORIO_DATA, (data_inicial_dt, data_final_dt))
 
-        registros = cursor.fetchall()
+                primeiros = cursor.fetchmany(LINHAS_PREVIA_RELATORIO)
 
-        if not registros:
-            print("Nenhum registro encontrado para o período especificado.")
-            return
-
-        headers = [description[0] for description in cursor.description]
-        print(tabulate(registros, headers=headers, tablefmt="pretty"))
+            if not primeiros:
+                medicao.resultado = 'vazio'
+                print("Nenhum registro encontrado para o período especificado.")
+                return
 
-        # Criar o diretório "relatórios" se não existir
-        if not os.path.exists("relatórios"):
-            os.makedirs("relatórios")
+            exibir_previa_relatorio(cursor, primeiros)
 
-        # Criar o arquivo JSON
-        nome_arquivo = f"relatórios/relatorio_por_data_{data_inicial}_{data_final}.json"
-        with open(nome_arquivo, 'w') as arquivo_json:
-            json.dump(registros, arquivo_json, default=str, indent=4)
+            # Criar o diretório "relatórios" se não existir
+            if not os.path.exists("relatórios"):
+                os.makedirs("relatórios")
 
-        print(f"Relatório salvo em {nome_arquivo}")
+            # Criar o arquivo JSON
+            nome_arquivo = f"relatórios/relatorio_por_data_{data_inicial}_{data_final}.{formato}"
+            total = gravar_relatorio(cursor, nome_arquivo, formato, primeiros)
+            medicao.linhas = total
+            informar_relatorio_salvo(nome_arquivo, total, len(primeiros))
 
     except sqlite3.Error as e:
         print(f"Erro ao gerar relatório por data: {e}")
 
 
-def relatorio_por_local(cursor, local):
+def relatorio_por_local(cursor, local, formato='json'):
     try:
-        # Converter o local para letras minúsculas
-        local = local.lower()
+        # Mesma normalização do índice: sem acentos, minúsculas e espaços simples
+        local = normalizar_local(local)
 
-        cursor.execute('''
-            SELECT * FROM cadastro
-            WHERE lower(endereco) = ?
-        ''', (local,))
+        with medir_operacao('relatorio_por_local', local=local, formato=formato) as medicao:
+            with medir('relatorio_sql_segundos', relatorio='local'):
+                cursor.execute(SQL_RELATORIO_LOCAL, (local,))
 
-        registros = cursor.fetchall()
+                primeiros = cursor.fetchmany(LINHAS_PREVIA_RELATORIO)
 
-        if not registros:
-            print(f"Nenhum registro encontrado para o local '{local}'.")
+            if not primeiros:
+                medicao.resultado = 'vazio'
+                print(f"Nenhum registro encontrado para o local '{local}'.")
+                return
+
+            exibir_previa_relatorio(cursor, primeiros)
+
+            # Criar um diretório 'relatorios' se não existir
+            diretorio_relatorios = 'relatorios'
+            if not os.path.exists(diretorio_relatorios):
+                os.makedirs(diretorio_relatorios)
+
+            # Gerar o caminho do arquivo JSON
+            caminho_arquivo_json = os.path.join(
+                diretorio_relatorios, f'relatorio_{local}.{formato}')
+
+            total = gravar_relatorio(cursor, caminho_arquivo_json, formato, primeiros)
+            medicao.linhas = total
+            informar_relatorio_salvo(caminho_arquivo_json, total, len(primeiros))
+
+    except sqlite3.Error as e:
+        print(f"Erro ao gerar relatório por local: {e}")
+
+
+def relatorio_agregado(cursor):
+    try:
+        indicador = obter_opcao("indicador", list(INDICADORES))
+
+        agrupar_por = []
+        for dimensao, pergunta in [('genero', "Agrupar por gênero?"),
+                                   ('periodo', "Agrupar por período de registro?"),
+                                   ('local', "Agrupar por local?")]:
+            if obter_opcao_sim_nao(pergunta) == 'sim':
+                agrupar_por.append(dimensao)
+
+        periodo = obter_opcao("período", list(PERIODOS)) if 'periodo' in agrupar_por else 'mes'
+
+        datas = []
+        for mensagem in ["Data inicial (YYYY-MM-DD, Enter para todas): ",
+                         "Data final (YYYY-MM-DD, Enter para todas): "]:
+            data = input(mensagem).strip()
+            while data and not validar_data(data):
+                print("Data inválida. Tente novamente.")
+                data = input(mensagem).strip()
+            datas.append(data or None)
+
+        with medir_operacao('relatorio_agregado', indicador=indicador, agrupar_por=agrupar_por) as medicao:
+            headers, linhas = gerar_relatorio_agregado(cursor, indicador, agrupar_por, periodo, *datas)
+            medicao.linhas = len(linhas)
+
+        if not linhas:
+            print("Nenhum registro encontrado para os filtros informados.")
             return
 
-        headers = [description[0] for description in cursor.description]
-        print(tabulate(registros, headers=headers, tablefmt="pretty"))
+        print(formatar_tabela(linhas, headers=headers, tablefmt="pretty"))
 
         # Criar um diretório 'relatorios' se não existir
         diretorio_relatorios = 'relatorios'
         if not os.path.exists(diretorio_relatorios):
             os.makedirs(diretorio_relatorios)
 
-        # Gerar o caminho do arquivo JSON
+        import json
+        nome_grupos = '_'.join(agrupar_por) or 'geral'
         caminho_arquivo_json = os.path.join(
-            diretorio_relatorios, f'relatorio_{local}.json')
+            diretorio_relatorios, f'relatorio_agregado_{indicador}_{nome_grupos}.json')
 
-        # Salvar os registros em um arquivo JSON
-        with open(caminho_arquivo_json, 'w') as arquivo_json:
-            registros_dict = [dict(zip(headers, registro))
-                              for registro in registros]
-            json.dump(registros_dict, arquivo_json, indent=2)
+        with open(caminho_arquivo_json, 'w', encoding='utf-8') as arquivo_json:
+            json.dump([dict(zip(headers, linha)) for linha in linhas], arquivo_json, ensure_ascii=False, indent=2)
 
         print(f"Relatório salvo em: {caminho_arquivo_json}")
 
     except sqlite3.Error as e:
-        print(f"Erro ao gerar relatório por local: {e}")
+        print(f"Erro ao gerar relatório agregado: {e}")
 
 
 ###         CONEXÃO COM IA            ###
@@ -864,27 +1304,56 @@ def relatorio_por_local(cursor, local):
 ###         VERIFICAÇÕES E MENU         ###
 
 
+def verificar_planos_relatorios(cursor):
+    """Confere com EXPLAIN QUERY PLAN se cada relatório usa índice; retorna os que fazem varredura."""
+    consultas = {
+        'relatorio_por_genero': (SQL_RELATORIO_GENERO, ('M',)),
+        'relatorio_por_data': (SQL_RELATORIO_DATA, ('2000-01-01 00:00:00', '2000-01-01 23:59:59')),
+        'relatorio_por_local': (SQL_RELATORIO_LOCAL, ('local',)),
+    }
+
+    sem_indice = []
+    for nome, (sql, parametros) in consultas.items():
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)
+        detalhes = [linha[-1] for linha in cursor.fetchall()]
+        # Tabelas WITHOUT ROWID, como locais_cadastro, aparecem como USING PRIMARY KEY
+        if not any(indice in detalhe for detalhe in detalhes
+                   for indice in ('USING INDEX', 'USING COVERING INDEX', 'USING PRIMARY KEY')):
+            sem_indice.append(nome)
+            logging.warning(f"A consulta de {nome} não usa índice: {detalhes}")
+
+    return sem_indice
+
+
 def exibir_status_bd():
-    if os.path.exists('database//atendimento_medico.db'):
+    if os.path.exists(CAMINHO_BANCO_DADOS):
         print("Banco de dados carregado.")
     else:
         print("Banco de dados está sendo gerado para a operação.")
 
 
-def exibir_menu(conn, cursor):
-    menu_opcoes = [
-        {"Opção": '1', "Descrição": "Criar Registro"},
-        {"Opção": '2', "Descrição": "Ler Registros"},
-        {"Opção": '3', "Descrição": "Visualizar Todos os Registros"},
-        {"Opção": '4', "Descrição": "Atualizar Registro"},
-        {"Opção": '5', "Descrição": "Excluir Registro"},
-        {"Opção": '6', "Descrição": "Sair"},
-        {"Opção": '7', "Descrição": "Ajuda - Mostra informações sobre como usar o programa."},
-        {"Opção": '8', "Descrição": "Gerar Relatórios"}
-    ]
+MENU_OPCOES = [
+    {"Opção": '1', "Descrição": "Criar Registro"},
+    {"Opção": '2', "Descrição": "Ler Registros"},
+    {"Opção": '3', "Descrição": "Visualizar Todos os Registros"},
+    {"Opção": '4', "Descrição": "Atualizar Registro"},
+    {"Opção": '5', "Descrição": "Excluir Registro"},
+    {"Opção": '6', "Descrição": "Sair"},
+    {"Opção": '7', "Descrição": "Ajuda - Mostra informações sobre como usar o programa."},
+    {"Opção": '8', "Descrição": "Gerar Relatórios"},
+    {"Opção": '9', "Descrição": "Buscar Pacientes"},
+    {"Opção": '10', "Descrição": "Atualizar Campos em Lote"},
+    {"Opção": '11', "Descrição": "Excluir Registros em Lote"}
+]
 
+
+def imprimir_menu():
     print("\nMenu:")
-    print(tabulate(menu_opcoes, headers="keys", tablefmt="pretty"))
+    print(formatar_tabela(MENU_OPCOES, headers="keys", tablefmt="pretty"))
+
+
+def exibir_menu(conn, cursor):
+    imprimir_menu()
 
     while True:
         escolha = input("Escolha uma opção ('x' para voltar): ")
@@ -896,13 +1365,13 @@ def exibir_menu(conn, cursor):
         if escolha.isdigit():
             escolha = int(escolha)
 
-            if 1 <= escolha <= 8:  # número de opções no menu
+            if 1 <= escolha <= len(MENU_OPCOES):
                 if escolha == 8:
                     gerar_relatorios_menu(conn, cursor)
                 else:
                     return str(escolha)
             else:
-                print("Opção inválida. Deve ser um número entre 1 e 8.")
+                print(f"Opção inválida. Deve ser um número entre 1 e {len(MENU_OPCOES)}.")
         else:
             print("Opção inválida. Deve ser um número inteiro ou 'x' para voltar.")
 
@@ -914,6 +1383,7 @@ def gerar_relatorios_menu(conn, cursor):
         print("2. Relatório por Local")
         print("3. Relatório por Gênero")
         print("4. Voltar")
+        print("5. Relatório Agregado (IMC, pressão, atividade física)")
 
         opcao_relatorio = input("Escolha uma opção de relatório: ")
 
@@ -922,39 +1392,31 @@ def gerar_relatorios_menu(conn, cursor):
             data_final = input("Digite a data final (YYYY-MM-DD): ")
 
             if validar_data(data_inicial) and validar_data(data_final):
-                relatorio_por_data(cursor, data_inicial, data_final)
+                formato = obter_opcao("formato do arquivo", FORMATOS_RELATORIO)
+                relatorio_por_data(cursor, data_inicial, data_final, formato)
             else:
                 print("Datas inválidas. Tente novamente.")
         elif opcao_relatorio == '2':
             local = input("Digite o local para o relatório: ")
 
             if validar_local(local):
-                relatorio_por_local(cursor, local)
+                formato = obter_opcao("formato do arquivo", FORMATOS_RELATORIO)
+                relatorio_por_local(cursor, local, formato)
             else:
                 print("Local inválido. Tente novamente.")
         elif opcao_relatorio == '3':
             genero = input("Digite o gênero para o relatório (M, F, N): ")
 
             if validar_genero(genero):
-                relatorio_por_genero(cursor, genero)
+                formato = obter_opcao("formato do arquivo", FORMATOS_RELATORIO)
+                relatorio_por_genero(cursor, genero, formato)
             else:
                 print("Gênero inválido. Tente novamente.")
+        elif opcao_relatorio == '5':
+            relatorio_agregado(cursor)
         elif opcao_relatorio == '4':
             print("Voltando ao menu principal.")
-
-            menu_opcoes = [
-                {"Opção": '1', "Descrição": "Criar Registro"},
-                {"Opção": '2', "Descrição": "Ler Registros"},
-                {"Opção": '3', "Descrição": "Visualizar Todos os Registros"},
-                {"Opção": '4', "Descrição": "Atualizar Registro"},
-                {"Opção": '5', "Descrição": "Excluir Registro"},
-                {"Opção": '6', "Descrição": "Sair"},
-                {"Opção": '7', "Descrição": "Ajuda - Mostra informações sobre como usar o programa."},
-                {"Opção": '8', "Descrição": "Gerar Relatórios"}
-            ]
-            print("\nMenu:")
-            print(tabulate(menu_opcoes, headers="keys", tablefmt="pretty"))
-
+            imprimir_menu()
             break
         else:
             print("Opção inválida. Tente novamente.")
@@ -966,11 +1428,14 @@ def exibir_ajuda():
     print("1. 'Criar Registro': Adiciona um novo paciente ao sistema.")
     print("2. 'Ler Registros': Exibe todos os pacientes cadastrados.")
     print("3. 'Visualizar Todos os Registros': Mostra todos os pacientes em formato tabular.")
-    print("4. 'Atualizar Registro': Permite a atualização de informações de um paciente.")
+    print("4. 'Atualizar Registro': Atualiza um paciente campo a campo; Enter mantém o valor atual.")
     print("5. 'Excluir Registro': Remove um paciente da base de dados.")
     print("6. 'Sair': Encerra o programa.")
     print("7. 'Ajuda': Mostra estas informações novamente.")
     print("8. 'Gerar Relatórios': Gera relatórios com base em diferentes critérios.")
+    print("9. 'Buscar Pacientes': Busca por nome, endereço ou histórico de doenças, sem diferenciar acentos.")
+    print("10. 'Atualizar Campos em Lote': Altera só os campos informados de um ou vários pacientes, por IDs ou filtro.")
+    print("11. 'Excluir Registros em Lote': Remove vários pacientes de uma vez, por IDs ou filtro.")
 
 
 def exibir_ajuda():
@@ -979,14 +1444,27 @@ def exibir_ajuda():
     print("1. 'Criar Registro': Adiciona um novo paciente ao sistema.")
     print("2. 'Ler Registros': Exibe todos os pacientes cadastrados.")
     print("3. 'Visualizar Todos os Registros': Mostra todos os pacientes em formato tabular.")
-    print("4. 'Atualizar Registro': Permite a atualização de informações de um paciente.")
+    print("4. 'Atualizar Registro': Atualiza um paciente campo a campo; Enter mantém o valor atual.")
     print("5. 'Excluir Registro': Remove um paciente da base de dados.")
     print("6. 'Sair': Encerra o programa.")
     print("7. 'Ajuda': Mostra estas informações novamente.")
     print("8. 'Gerar Relatórios': Gera relatórios com base em diferentes critérios.")
+    print("9. 'Buscar Pacientes': Busca por nome, endereço ou histórico de doenças, sem diferenciar acentos.")
+    print("10. 'Atualizar Campos em Lote': Altera só os campos informados de um ou vários pacientes, por IDs ou filtro.")
+    print("11. 'Excluir Registros em Lote': Remove vários pacientes de uma vez, por IDs ou filtro.")
+
+
+def registrar_estatisticas_cache():
+    from cache_pacientes import estatisticas_cache
+    estatisticas = estatisticas_cache()
+    logging.info(
+        f"Cache de pacientes: {estatisticas['acertos']} acerto(s), {estatisticas['falhas']} falha(s) "
+        f"({estatisticas['taxa_acerto']:.0%}), {estatisticas['invalidacoes']} invalidação(ões), "
+        f"{estatisticas['entradas']} entrada(s).")
 
 
 def main():
+    configurar_logging()
     print("Bem-vindo ao assistente médico Bet on Tech.")
 
     try:
@@ -995,6 +1473,7 @@ def main():
 
             exibir_status_bd()
             executar_setup(cursor)
+            verificar_planos_relatorios(cursor)
 
             while True:
                 escolha = exibir_menu(conn, cursor)
@@ -1014,6 +1493,12 @@ def main():
                     break
                 elif escolha == '7':
                     exibir_ajuda()
+                elif escolha == '9':
+                    pesquisar_pacientes(cursor)
+                elif escolha == '10':
+                    atualizar_em_lote(conn, cursor)
+                elif escolha == '11':
+                    excluir_em_lote(conn, cursor)
                 elif escolha == '8':
                     data_inicial = obter_data_valida(
                         "Digite a data inicial (YYYY-MM-DD): ")
@@ -1024,6 +1509,7 @@ def main():
                     print("Opção inválida. Tente novamente.")
 
             print("Programa encerrado.")
+            registrar_estatisticas_cache()
 
     except sqlite3.Error as e:
         logging.error(f"Erro durante a execução do programa: {e}")
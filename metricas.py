@@ -0,0 +1,250 @@
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+
+# Histogramas de duração e contadores em memória, exportados no formato de texto
+# do Prometheus. Configuração por variáveis de ambiente:
+# - ASSIST_METRICAS=0 desliga cronometrado/medir (os decoradores devolvem a função original);
+# - ASSIST_METRICAS_ARQUIVO grava as métricas nesse arquivo a cada
+#   ASSIST_METRICAS_INTERVALO segundos e na saída (coletor textfile do node_exporter);
+# - ASSIST_PERFIL=cprofile e/ou tracemalloc (separados por vírgula) liga a captura
+#   de perfil; o resultado vai para ASSIST_PERFIL_ARQUIVO (padrão perfil_<pid>) na saída.
+#   cProfile só mede a thread principal.
+PREFIXO_METRICAS = 'assist_'
+METRICAS_ATIVAS = os.environ.get('ASSIST_METRICAS', '1') != '0'
+INTERVALO_GRAVACAO_PADRAO = 15
+
+# Limites dos buckets, em segundos: de validações (µs) a chamadas à IA (segundos)
+LIMITES_PADRAO = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05,
+                  0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+DESCRICOES = {
+    'operacao_segundos': "Duração das operações registradas por medir_operacao.",
+    'relatorio_sql_segundos': "Execução da consulta de um relatório até a primeira página de resultados.",
+    'tabela_renderizacao_segundos': "Formatação de tabelas com tabulate.",
+    'validacao_segundos': "Validação de um registro (validar_paciente, validar_alteracoes).",
+    'ia_requisicao_segundos': "Ida e volta de uma requisição HTTP à IA.",
+    'cache_pacientes_entradas': "Pacientes mantidos no cache de buscas por id e CPF.",
+    'memoria_atual_bytes': "Memória alocada pelo Python (tracemalloc).",
+    'memoria_pico_bytes': "Pico de memória alocada pelo Python (tracemalloc).",
+}
+
+_trava = threading.Lock()
+_histogramas = {}
+_contadores = {}
+_medidores = {}
+_coletores = []
+_configurado = False
+
+
+class Histograma:
+    __slots__ = ('contagens', 'soma', 'total')
+
+    def __init__(self):
+        # Um bucket por limite e o último para valores acima de todos (+Inf)
+        self.contagens = [0] * (len(LIMITES_PADRAO) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+
+def _chave(nome, rotulos):
+    return nome, tuple(sorted(rotulos.items()))
+
+
+def observar(nome, segundos, **rotulos):
+    indice = bisect_left(LIMITES_PADRAO, segundos)
+    chave = _chave(nome, rotulos)
+    with _trava:
+        histograma = _histogramas.get(chave)
+        if histograma is None:
+            histograma = _histogramas[chave] = Histograma()
+        histograma.contagens[indice] += 1
+        histograma.soma += segundos
+        histograma.total += 1
+
+
+def contar(nome, quantidade=1, **rotulos):
+    chave = _chave(nome, rotulos)
+    with _trava:
+        _contadores[chave] = _contadores.get(chave, 0) + quantidade
+
+
+def definir(nome, valor, **rotulos):
+    with _trava:
+        _medidores[_chave(nome, rotulos)] = valor
+
+
+def fixar_contador(nome, valor, **rotulos):
+    """Copia um total contado por outro módulo (ver registrar_coletor), em vez de somar."""
+    with _trava:
+        _contadores[_chave(nome, rotulos)] = valor
+
+
+def registrar_coletor(funcao):
+    """funcao() é chamada antes de cada exportação: módulos com contagem própria atualizam
+    aqui seus valores, sem pagar o custo de contar() a cada evento."""
+    _coletores.append(funcao)
+
+
+@contextmanager
+def medir(nome, **rotulos):
+    """Observa a duração do bloco no histograma nome{rotulos}, inclusive quando ele falha."""
+    if not METRICAS_ATIVAS:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nome, time.perf_counter() - inicio, **rotulos)
+
+
+def cronometrado(nome, **rotulos):
+    """Decorador: cada chamada é observada em nome{funcao=<nome da função>, rotulos}."""
+    def decorador(funcao):
+        if not METRICAS_ATIVAS:
+            return funcao
+        rotulos_funcao = dict(rotulos, funcao=funcao.__name__)
+
+        @wraps(funcao)
+        def cronometrar(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                observar(nome, time.perf_counter() - inicio, **rotulos_funcao)
+        return cronometrar
+    return decorador
+
+
+###         EXPORTAÇÃO          ###
+
+
+def _formatar_rotulos(rotulos, *extras):
+    pares = [(nome, str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+             for nome, valor in rotulos + extras]
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in pares) + '}' if pares else ''
+
+
+def _cabecalho(linhas, nome, tipo):
+    if nome in DESCRICOES:
+        linhas.append(f"# HELP {PREFIXO_METRICAS}{nome} {DESCRICOES[nome]}")
+    linhas.append(f"# TYPE {PREFIXO_METRICAS}{nome} {tipo}")
+
+
+def exportar_prometheus():
+    """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+    _atualizar_memoria()
+    for coletor in _coletores:
+        coletor()
+    with _trava:
+        histogramas = sorted((chave, list(h.contagens), h.soma, h.total) for chave, h in _histogramas.items())
+        contadores = sorted(_contadores.items())
+        medidores = sorted(_medidores.items())
+
+    linhas = []
+    ultimo = None
+    for (nome, rotulos), contagens, soma, total in histogramas:
+        if nome != ultimo:
+            _cabecalho(linhas, nome, 'histogram')
+            ultimo = nome
+        acumulado = 0
+        for limite, contagem in zip(LIMITES_PADRAO, contagens):
+            acumulado += contagem
+            linhas.append(f"{PREFIXO_METRICAS}{nome}_bucket{_formatar_rotulos(rotulos, ('le', repr(limite)))} {acumulado}")
+        linhas.append(f"{PREFIXO_METRICAS}{nome}_bucket{_formatar_rotulos(rotulos, ('le', '+Inf'))} {total}")
+        linhas.append(f"{PREFIXO_METRICAS}{nome}_sum{_formatar_rotulos(rotulos)} {soma!r}")
+        linhas.append(f"{PREFIXO_METRICAS}{nome}_count{_formatar_rotulos(rotulos)} {total}")
+
+    for tipo, valores in (('counter', contadores), ('gauge', medidores)):
+        ultimo = None
+        for (nome, rotulos), valor in valores:
+            if nome != ultimo:
+                _cabecalho(linhas, nome, tipo)
+                ultimo = nome
+            linhas.append(f"{PREFIXO_METRICAS}{nome}{_formatar_rotulos(rotulos)} {valor}")
+
+    return '\n'.join(linhas) + '\n'
+
+
+def gravar_prometheus(caminho):
+    # Grava em um arquivo temporário e troca de uma vez: o coletor nunca lê um arquivo pela metade
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        arquivo.write(exportar_prometheus())
+    os.replace(temporario, caminho)
+
+
+###         PERFIL          ###
+
+
+def _atualizar_memoria():
+    if 'tracemalloc' not in sys.modules:
+        return
+    import tracemalloc
+    if tracemalloc.is_tracing():
+        atual, pico = tracemalloc.get_traced_memory()
+        definir('memoria_atual_bytes', atual)
+        definir('memoria_pico_bytes', pico)
+
+
+def _gravar_perfis(perfil, arquivo_base):
+    if perfil is not None:
+        perfil.disable()
+        perfil.dump_stats(f"{arquivo_base}.prof")
+        logging.info(f"Perfil do cProfile gravado em {arquivo_base}.prof (abra com python -m pstats).")
+
+    import tracemalloc
+    if tracemalloc.is_tracing():
+        estatisticas = tracemalloc.take_snapshot().statistics('lineno')
+        atual, pico = tracemalloc.get_traced_memory()
+        with open(f"{arquivo_base}_memoria.txt", 'w', encoding='utf-8') as arquivo:
+            arquivo.write(f"Memória atual: {atual} bytes; pico: {pico} bytes\n\n")
+            arquivo.writelines(f"{estatistica}\n" for estatistica in estatisticas[:30])
+        tracemalloc.stop()
+        logging.info(f"Alocações do tracemalloc gravadas em {arquivo_base}_memoria.txt.")
+
+
+def _gravar_periodicamente(caminho, intervalo):
+    while True:
+        time.sleep(intervalo)
+        try:
+            gravar_prometheus(caminho)
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar as métricas em {caminho}: {e}")
+
+
+def configurar_metricas():
+    """Liga, conforme as variáveis de ambiente, a captura de perfil e a gravação das métricas em arquivo."""
+    global _configurado
+    if _configurado:
+        return
+    _configurado = True
+
+    import atexit
+
+    modos = {modo.strip().lower() for modo in os.environ.get('ASSIST_PERFIL', '').split(',') if modo.strip()}
+    perfil = None
+    if 'tracemalloc' in modos:
+        import tracemalloc
+        tracemalloc.start(int(os.environ.get('ASSIST_PERFIL_QUADROS', 10)))
+    if 'cprofile' in modos:
+        import cProfile
+        perfil = cProfile.Profile()
+        perfil.enable()
+    if modos:
+        arquivo_base = os.environ.get('ASSIST_PERFIL_ARQUIVO', f"perfil_{os.getpid()}")
+        atexit.register(_gravar_perfis, perfil, arquivo_base)
+
+    caminho = os.environ.get('ASSIST_METRICAS_ARQUIVO')
+    if caminho:
+        intervalo = float(os.environ.get('ASSIST_METRICAS_INTERVALO', INTERVALO_GRAVACAO_PADRAO))
+        threading.Thread(target=_gravar_periodicamente, args=(caminho, intervalo),
+                         name='metricas', daemon=True).start()
+        atexit.register(gravar_prometheus, caminho)
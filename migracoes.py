@@ -0,0 +1,244 @@
+import logging
+import sqlite3
+
+from busca import SCRIPT_BUSCA, SQL_RECONSTRUIR_BUSCA
+from locais import SCRIPT_LOCAIS_V5, SCRIPT_REMOVER_TRIGGERS_LOCAIS, SQL_PREENCHER_LOCAIS, refazer_locais
+from resumos import SCRIPT_RESUMO, SQL_RECONSTRUIR_RESUMO
+
+
+CAMINHO_SETUP = 'setup.sql'
+TAMANHO_LOTE_PREENCHIMENTO = 5000
+
+# Cada migração tem uma versão; a versão aplicada fica em PRAGMA user_version.
+# 'tabela' é usada para estimar as linhas afetadas na simulação e, quando há
+# 'preenchimento', para percorrer a tabela em lotes de id (um commit por lote).
+MIGRACOES = [
+    {
+        'versao': 1,
+        'descricao': "Índices para os relatórios por gênero, local e data",
+        'tabela': 'cadastro',
+        'script': '''
+            CREATE INDEX IF NOT EXISTS idx_cadastro_genero ON cadastro (UPPER(genero));
+            CREATE INDEX IF NOT EXISTS idx_cadastro_endereco ON cadastro (lower(endereco));
+            CREATE INDEX IF NOT EXISTS idx_cadastro_data_registro ON cadastro (data_registro);
+        ''',
+    },
+    {
+        'versao': 2,
+        'descricao': "Fila de sugestões da IA processada por worker_ia.py",
+        'tabela': 'fila_ia',
+        'script': '''
+            CREATE TABLE IF NOT EXISTS fila_ia (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id_cadastro INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                criado_em TEXT NOT NULL,
+                atualizado_em TEXT NOT NULL,
+                reservado_ate TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_fila_ia_status ON fila_ia (status, id);
+
+            CREATE TABLE IF NOT EXISTS sugestoes_ia (
+                id_cadastro INTEGER PRIMARY KEY,
+                resposta TEXT NOT NULL,
+                gerado_em TEXT NOT NULL
+            );
+        ''',
+    },
+    {
+        'versao': 3,
+        'descricao': "Resumo diário para os painéis, mantido por triggers (resumos.py)",
+        'tabela': 'cadastro',
+        # Triggers e carga inicial na mesma transação: nenhum cadastro fica de fora nem é contado duas vezes
+        'script': SCRIPT_RESUMO + 'DELETE FROM resumo_diario;\n' + SQL_RECONSTRUIR_RESUMO + ';\n',
+    },
+    {
+        'versao': 4,
+        'descricao': "Busca de texto completo em nome, endereço e histórico (busca.py)",
+        'tabela': 'cadastro',
+        'script': SCRIPT_BUSCA + SQL_RECONSTRUIR_BUSCA + ';\n',
+    },
+    {
+        'versao': 5,
+        'descricao': "Índice de locais normalizados do endereço para o relatório por local (locais.py)",
+        'tabela': 'cadastro',
+        'script': SCRIPT_LOCAIS_V5,
+        'preenchimento': SQL_PREENCHER_LOCAIS,
+    },
+    {
+        'versao': 6,
+        'descricao': "Locais gravados por repositorio.py em vez de triggers com função Python; "
+                     "hífen sem espaços deixa de separar locais; remove idx_cadastro_endereco",
+        'tabela': 'cadastro',
+        # O relatório por local usa locais_cadastro desde a versão 5
+        'script': SCRIPT_REMOVER_TRIGGERS_LOCAIS + 'DROP INDEX IF EXISTS idx_cadastro_endereco;\n',
+        # Cada lote troca os locais do seu intervalo de id pelos da nova separação
+        'preenchimento': refazer_locais,
+    },
+    {
+        'versao': 7,
+        'descricao': "Logradouros (\"Rua C\", \"Av. Brasil\") deixam de ser indexados como locais",
+        'tabela': 'cadastro',
+        'script': '',
+        'preenchimento': refazer_locais,
+    },
+]
+
+
+def dividir_instrucoes(script):
+    # complete_statement reconhece o fim de cada instrução, inclusive corpos de triggers
+    instrucoes = []
+    atual = ''
+    for linha in script.splitlines(keepends=True):
+        atual += linha
+        if sqlite3.complete_statement(atual):
+            instrucoes.append(atual.strip())
+            atual = ''
+    if atual.strip():
+        instrucoes.append(atual.strip())
+    return instrucoes
+
+
+def versao_atual(cursor):
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def tabela_existe(cursor, tabela):
+    cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,))
+    return cursor.fetchone() is not None
+
+
+def estimar_linhas(cursor, tabela):
+    # Estimativa pelo intervalo de rowid: não percorre a tabela como COUNT(*)
+    if not tabela or not tabela_existe(cursor, tabela):
+        return 0
+    cursor.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {tabela}")
+    minimo, maximo = cursor.fetchone()
+    return 0 if minimo is None else maximo - minimo + 1
+
+
+def executar_em_transacao(cursor, instrucoes, versao=None):
+    cursor.execute("BEGIN")
+    try:
+        for instrucao in instrucoes:
+            cursor.execute(instrucao)
+        if versao is not None:
+            # user_version é gravado na mesma transação: ou a etapa inteira vale, ou nada
+            cursor.execute(f"PRAGMA user_version = {int(versao)}")
+        cursor.connection.commit()
+    except sqlite3.Error:
+        cursor.connection.rollback()
+        raise
+
+
+def preencher_em_lotes(cursor, migracao, tamanho_lote):
+    """Percorre a tabela em intervalos de id, com um commit por lote para não travar outros terminais."""
+    tabela = migracao['tabela']
+    preenchimento = migracao['preenchimento']
+
+    cursor.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {tabela}")
+    minimo, maximo = cursor.fetchone()
+    if minimo is None:
+        return
+
+    for inicio in range(minimo, maximo + 1, tamanho_lote):
+        fim = inicio + tamanho_lote - 1
+        cursor.execute("BEGIN")
+        try:
+            if callable(preenchimento):
+                preenchimento(cursor, inicio, fim)
+            else:
+                cursor.execute(preenchimento, {'inicio': inicio, 'fim': fim})
+            cursor.connection.commit()
+        except sqlite3.Error:
+            cursor.connection.rollback()
+            raise
+        logging.info(
+            f"Migração {migracao['versao']}: preenchimento de {tabela} até o id {min(fim, maximo)} de {maximo}.")
+
+
+def garantir_esquema_base(cursor, simular=False):
+    if tabela_existe(cursor, 'cadastro'):
+        return False
+    if not simular:
+        with open(CAMINHO_SETUP, 'r') as script:
+            executar_em_transacao(cursor, dividir_instrucoes(script.read()))
+        logging.info("Setup do banco de dados executado com sucesso.")
+    return True
+
+
+def aplicar_migracoes(cursor, simular=False, tamanho_lote=TAMANHO_LOTE_PREENCHIMENTO):
+    """Aplica, em ordem, as migrações pendentes. Com simular=True apenas relata o que seria feito."""
+    relatorio = []
+
+    if garantir_esquema_base(cursor, simular):
+        relatorio.append({'versao': 0, 'descricao': f"Esquema base ({CAMINHO_SETUP})", 'linhas_estimadas': 0})
+
+    versao = versao_atual(cursor)
+    for migracao in sorted(MIGRACOES, key=lambda m: m['versao']):
+        if migracao['versao'] <= versao:
+            continue
+
+        relatorio.append({
+            'versao': migracao['versao'],
+            'descricao': migracao['descricao'],
+            'linhas_estimadas': estimar_linhas(cursor, migracao.get('tabela')),
+        })
+        if simular:
+            continue
+
+        if 'preenchimento' in migracao:
+            # Estrutura primeiro; o preenchimento deve ser idempotente, pois se for
+            # interrompido a versão não avança e ele é refeito na próxima execução
+            executar_em_transacao(cursor, dividir_instrucoes(migracao['script']))
+            preencher_em_lotes(cursor, migracao, tamanho_lote)
+            executar_em_transacao(cursor, dividir_instrucoes(migracao.get('script_final', '')),
+                                  migracao['versao'])
+        else:
+            executar_em_transacao(cursor, dividir_instrucoes(migracao['script']), migracao['versao'])
+
+        logging.info(f"Migração {migracao['versao']} aplicada: {migracao['descricao']}")
+        versao = migracao['versao']
+
+    return relatorio
+
+
+def main():
+    # argparse só é necessário na linha de comando; main.py importa este módulo na inicialização
+    import argparse
+
+    from main import conectar_bd, configurar_logging
+
+    configurar_logging()
+
+    parser = argparse.ArgumentParser(description="Aplica as migrações pendentes do banco de dados.")
+    parser.add_argument('--simular', action='store_true',
+                        help="apenas lista as migrações pendentes e as linhas estimadas de cada uma")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PREENCHIMENTO,
+                        help=f"linhas por lote nos preenchimentos (padrão: {TAMANHO_LOTE_PREENCHIMENTO})")
+    args = parser.parse_args()
+
+    conn = conectar_bd()
+    try:
+        relatorio = aplicar_migracoes(conn.cursor(), args.simular, args.lote)
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Erro ao aplicar migrações: {e}")
+        print(f"Erro ao aplicar migrações: {e}")
+        exit(1)
+    finally:
+        conn.close()
+
+    if not relatorio:
+        print("O banco de dados já está atualizado.")
+    for etapa in relatorio:
+        situacao = "pendente" if args.simular else "aplicada"
+        print(f"Versão {etapa['versao']} ({situacao}): {etapa['descricao']} "
+              f"- cerca de {etapa['linhas_estimadas']} linha(s)")
+
+
+if __name__ == "__main__":
+    main()
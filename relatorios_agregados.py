@@ -0,0 +1,182 @@
+# Expressões SQL de cada dimensão de agrupamento (somente estas são aceitas)
+DIMENSOES = {
+    'genero': "UPPER(genero)",
+    # Mesmo local normalizado do relatório por local (locais.py): um cadastro entra no
+    # grupo de cada trecho do endereço (bairro, cidade...), como em SQL_RELATORIO_LOCAL.
+    # Cada par (local, cadastro) existe uma vez só, então o total de um grupo conta
+    # pacientes distintos; a soma dos grupos, não (ver montar_consulta_agregada)
+    'local': "locais_cadastro.local",
+}
+
+# Tabelas que a consulta sobre o cadastro precisa juntar para cada dimensão
+JUNCOES = {
+    'local': "JOIN locais_cadastro ON locais_cadastro.id_cadastro = cadastro.id",
+}
+
+# data_registro é gravado como 'YYYY-MM-DD HH:MM:SS': substr evita o custo de strftime por linha
+PERIODOS = {
+    'dia': "substr(data_registro, 1, 10)",
+    'semana': "strftime('%Y-S%W', data_registro)",
+    'mes': "substr(data_registro, 1, 7)",
+}
+
+SQL_IMC = "CASE WHEN altura > 0 AND peso > 0 THEN peso / (altura * altura) END"
+
+# A agregação é feita em duas etapas: a primeira agrupa pelo valor bruto de cada
+# indicador (poucos valores distintos) e a segunda aplica as faixas sobre esse
+# resumo, evitando avaliar as regras de classificação linha a linha.
+SQL_SISTOLICA = "CAST(replace(substr(bruto, 1, instr(bruto, '/') - 1), ',', '.') AS REAL)"
+SQL_DIASTOLICA = "CAST(replace(substr(bruto, instr(bruto, '/') + 1), ',', '.') AS REAL)"
+
+# Para cada indicador: (valor bruto por linha, classificação aplicada ao valor bruto)
+INDICADORES = {
+    'total': None,
+    # IMC bruto em meias unidades, para que o limite de 18,5 caia em um valor inteiro
+    'imc': (f"CAST(({SQL_IMC}) * 2 AS INTEGER)", '''
+        CASE
+            WHEN bruto IS NULL THEN 'não informado'
+            WHEN bruto < 37 THEN '1. abaixo do peso'
+            WHEN bruto < 50 THEN '2. normal'
+            WHEN bruto < 60 THEN '3. sobrepeso'
+            WHEN bruto < 70 THEN '4. obesidade I'
+            WHEN bruto < 80 THEN '5. obesidade II'
+            ELSE '6. obesidade III'
+        END'''),
+    # Pressão no formato do menu ("12/8" = 120/80 mmHg); a faixa segue a maior das duas medidas
+    'pressao': ("pressao_arterial", f'''
+        CASE
+            WHEN bruto IS NULL OR instr(bruto, '/') = 0 THEN 'não informada'
+            WHEN {SQL_SISTOLICA} >= 18 OR {SQL_DIASTOLICA} >= 11 THEN '6. hipertensão estágio 3'
+            WHEN {SQL_SISTOLICA} >= 16 OR {SQL_DIASTOLICA} >= 10 THEN '5. hipertensão estágio 2'
+            WHEN {SQL_SISTOLICA} >= 14 OR {SQL_DIASTOLICA} >= 9 THEN '4. hipertensão estágio 1'
+            WHEN {SQL_SISTOLICA} >= 13 OR {SQL_DIASTOLICA} >= 8.5 THEN '3. pré-hipertensão'
+            WHEN {SQL_SISTOLICA} >= 10 THEN '2. normal'
+            ELSE '1. baixa'
+        END'''),
+    'atividade': ("frequencia_atividades_sem", "COALESCE(bruto, 'não informada')"),
+}
+
+# Em resumo_diario (resumos.py) o gênero já está em maiúsculas, o dia vem pronto e
+# os valores ausentes de pressão e atividade são gravados como ''
+DIMENSOES_RESUMO = {'genero': "genero"}
+PERIODOS_RESUMO = {
+    'dia': "dia",
+    'semana': "strftime('%Y-S%W', dia)",
+    'mes': "substr(dia, 1, 7)",
+}
+BRUTOS_RESUMO = {
+    'total': None,
+    'pressao': "NULLIF(pressao_arterial, '')",
+    'atividade': "NULLIF(frequencia_atividades_sem, '')",
+}
+
+
+def pode_usar_resumo(indicador, agrupar_por):
+    return indicador in BRUTOS_RESUMO and all(
+        dimensao == 'periodo' or dimensao in DIMENSOES_RESUMO for dimensao in agrupar_por)
+
+
+def montar_consulta_agregada(indicador='total', agrupar_por=(), periodo='mes',
+                             data_inicial=None, data_final=None, usar_resumo=None):
+    if indicador not in INDICADORES:
+        raise ValueError(f"Indicador inválido: '{indicador}'.")
+    if periodo not in PERIODOS:
+        raise ValueError(f"Período inválido: '{periodo}'.")
+
+    if usar_resumo is None:
+        usar_resumo = pode_usar_resumo(indicador, agrupar_por)
+    elif usar_resumo and not pode_usar_resumo(indicador, agrupar_por):
+        raise ValueError("O resumo diário não tem IMC por faixa nem local; consulte o cadastro.")
+    dimensoes, periodos = (DIMENSOES_RESUMO, PERIODOS_RESUMO) if usar_resumo else (DIMENSOES, PERIODOS)
+
+    colunas = []
+    for dimensao in agrupar_por:
+        if dimensao == 'periodo':
+            colunas.append((periodo, periodos[periodo]))
+        elif dimensao in dimensoes:
+            colunas.append((dimensao, dimensoes[dimensao]))
+        else:
+            raise ValueError(f"Dimensão de agrupamento inválida: '{dimensao}'.")
+
+    nomes_grupo = [nome for nome, _ in colunas]
+    selecao_interna = [f"{expressao} AS {nome}" for nome, expressao in colunas]
+    selecao_externa = list(nomes_grupo)
+    if INDICADORES[indicador]:
+        valor_bruto, classificacao = INDICADORES[indicador]
+        if usar_resumo:
+            valor_bruto = BRUTOS_RESUMO[indicador]
+        selecao_interna.append(f"{valor_bruto} AS bruto")
+        selecao_externa.append(f"{classificacao} AS {indicador}")
+        nomes_interno = nomes_grupo + ['bruto']
+        nomes_saida = nomes_grupo + [indicador]
+    else:
+        nomes_interno = nomes_saida = nomes_grupo
+
+    condicoes = []
+    parametros = []
+    if usar_resumo:
+        fonte = '''
+                SUM(total) AS quantidade,
+                SUM(soma_imc) AS soma_imc,
+                SUM(quantidade_imc) AS quantidade_imc
+            FROM resumo_diario'''
+        if data_inicial:
+            condicoes.append("dia >= ?")
+            parametros.append(data_inicial)
+        if data_final:
+            condicoes.append("dia <= ?")
+            parametros.append(data_final)
+    else:
+        juncoes = ''.join(f"\n            {JUNCOES[dimensao]}" for dimensao in agrupar_por if dimensao in JUNCOES)
+        fonte = f'''
+                COUNT(*) AS quantidade,
+                SUM({SQL_IMC}) AS soma_imc,
+                COUNT({SQL_IMC}) AS quantidade_imc
+            FROM cadastro{juncoes}'''
+        if data_inicial:
+            condicoes.append("data_registro >= ?")
+            parametros.append(f"{data_inicial} 00:00:00")
+        if data_final:
+            condicoes.append("data_registro <= ?")
+            parametros.append(f"{data_final} 23:59:59")
+
+    particao = f"PARTITION BY {', '.join(nomes_grupo)}" if nomes_grupo and INDICADORES[indicador] else ""
+    base = ""
+    divisor = f"SUM(SUM(quantidade)) OVER ({particao})"
+    if not particao and any(dimensao in JUNCOES for dimensao in agrupar_por):
+        # Sem indicador, o percentual é sobre o total de pacientes. Com a junção, um paciente
+        # aparece em vários grupos e a soma dos grupos passaria desse total
+        base = f'''WITH base AS (
+            SELECT COUNT(*) AS pacientes FROM cadastro
+            {"WHERE " + " AND ".join(condicoes) if condicoes else ""}
+        )'''
+        divisor = "(SELECT pacientes FROM base)"
+        parametros = parametros + parametros
+
+    def agrupar(nomes):
+        return f"GROUP BY {', '.join(nomes)}" if nomes else ""
+
+    sql = f'''{base}
+        SELECT {''.join(f'{coluna}, ' for coluna in selecao_externa)}
+            SUM(quantidade) AS total,
+            ROUND(100.0 * SUM(quantidade) / {divisor}, 1) AS percentual,
+            ROUND(SUM(soma_imc) / SUM(quantidade_imc), 1) AS imc_medio
+        FROM (
+            SELECT {''.join(f'{coluna}, ' for coluna in selecao_interna)}{fonte}
+            {"WHERE " + " AND ".join(condicoes) if condicoes else ""}
+            {agrupar(nomes_interno)}
+        )
+        {agrupar(nomes_saida)}
+        {"ORDER BY " + ", ".join(nomes_saida) if nomes_saida else ""}
+    '''
+    return sql, parametros
+
+
+def gerar_relatorio_agregado(cursor, indicador='total', agrupar_por=(), periodo='mes',
+                             data_inicial=None, data_final=None, usar_resumo=None):
+    """Calcula no SQLite a contagem por grupo e retorna (colunas, linhas) do resumo."""
+    sql, parametros = montar_consulta_agregada(
+        indicador, agrupar_por, periodo, data_inicial, data_final, usar_resumo)
+    cursor.execute(sql, parametros)
+    linhas = cursor.fetchall()
+    return [description[0] for description in cursor.description], linhas
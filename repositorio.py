@@ -0,0 +1,304 @@
+import re
+from collections import namedtuple
+
+import cache_pacientes
+from locais import extrair_locais, normalizar_local
+
+
+# Acesso à tabela cadastro. Todas as instruções são constantes do módulo: o sqlite3
+# guarda as instruções já compiladas no cache da conexão (cached_statements, ver
+# conexao.py), então a mesma consulta não é recompilada a cada chamada. As funções
+# não fazem commit; a transação é de quem chama. Buscas por id e CPF passam pelo
+# cache de cache_pacientes.py, que as escritas daqui invalidam. As escritas também
+# mantêm locais_cadastro (ver locais.py).
+
+COLUNAS_CADASTRO = [
+    'nome', 'cpf', 'data_nascimento', 'genero', 'endereco', 'telefone',
+    'pressao_arterial', 'altura', 'peso', 'frequencia_atividades_sem',
+    'sono_regular', 'dieta_planejada', 'historico_doencas', 'data_registro'
+]
+
+# data_registro é definido na criação; a atualização troca os demais campos
+COLUNAS_ATUALIZAVEIS = [coluna for coluna in COLUNAS_CADASTRO if coluna != 'data_registro']
+
+# Linha de cadastro: continua sendo uma tupla (registro[0] ainda é o id), mas com os campos por nome
+Paciente = namedtuple('Paciente', ['id'] + COLUNAS_CADASTRO)
+
+COLUNAS_PACIENTE = ', '.join(f'cadastro.{coluna}' for coluna in Paciente._fields)
+
+SQL_INSERIR_CADASTRO = f'''
+    INSERT INTO cadastro ({', '.join(COLUNAS_CADASTRO)})
+    VALUES ({', '.join('?' * len(COLUNAS_CADASTRO))})
+'''
+
+SQL_ATUALIZAR_CADASTRO = f'''
+    UPDATE cadastro SET {', '.join(f'{coluna} = ?' for coluna in COLUNAS_ATUALIZAVEIS)}
+    WHERE id = ?
+'''
+
+SQL_POR_ID = f"SELECT {COLUNAS_PACIENTE} FROM cadastro WHERE id = ?"
+SQL_POR_CPF = f"SELECT {COLUNAS_PACIENTE} FROM cadastro WHERE cpf = ?"
+SQL_TODOS = f"SELECT {COLUNAS_PACIENTE} FROM cadastro ORDER BY id"
+SQL_PAGINA = f"SELECT {COLUNAS_PACIENTE} FROM cadastro WHERE id >= ? ORDER BY id LIMIT ?"
+SQL_PAGINA_ANTERIOR = f"SELECT {COLUNAS_PACIENTE} FROM cadastro WHERE id < ? ORDER BY id DESC LIMIT ?"
+
+# Listas de ids e CPFs vão como um único array JSON: a instrução é a mesma para
+# qualquer tamanho de lote e não esbarra no limite de parâmetros do SQLite
+SQL_POR_IDS = f"SELECT {COLUNAS_PACIENTE} FROM cadastro WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id"
+SQL_CPFS_EXISTENTES = "SELECT cpf FROM cadastro WHERE cpf IN (SELECT value FROM json_each(?))"
+SQL_IDS_EXISTENTES = "SELECT id FROM cadastro WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id"
+SQL_IDS_POR_CPFS = "SELECT id FROM cadastro WHERE cpf IN (SELECT value FROM json_each(?))"
+
+# O id vem de cadastro: um id inexistente não deixa locais órfãos. Depois de um
+# executemany de inserção os ids não são conhecidos, e o CPF (UNIQUE) os encontra
+SQL_INSERIR_LOCAL = "INSERT OR IGNORE INTO locais_cadastro (local, id_cadastro) SELECT ?, id FROM cadastro WHERE id = ?"
+SQL_INSERIR_LOCAL_POR_CPF = "INSERT OR IGNORE INTO locais_cadastro (local, id_cadastro) SELECT ?, id FROM cadastro WHERE cpf = ?"
+SQL_REMOVER_LOCAIS = "DELETE FROM locais_cadastro WHERE id_cadastro = ?"
+
+SQL_REMOVER_CADASTRO = "DELETE FROM cadastro WHERE id = ?"
+SQL_REMOVER_SUGESTAO = "DELETE FROM sugestoes_ia WHERE id_cadastro = ?"
+SQL_REMOVER_JOBS = "DELETE FROM fila_ia WHERE id_cadastro = ? AND status != 'concluido'"
+
+SQL_RELATORIO_GENERO = f'''
+    SELECT {COLUNAS_PACIENTE} FROM cadastro
+    WHERE UPPER(genero) = ?
+'''
+
+SQL_RELATORIO_DATA = f'''
+    SELECT {COLUNAS_PACIENTE} FROM cadastro
+    WHERE data_registro BETWEEN ? AND ?
+'''
+
+SQL_RELATORIO_LOCAL = f'''
+    SELECT {COLUNAS_PACIENTE} FROM locais_cadastro
+    JOIN cadastro ON cadastro.id = locais_cadastro.id_cadastro
+    WHERE locais_cadastro.local = ?
+    ORDER BY locais_cadastro.id_cadastro
+'''
+
+# Filtros das operações em lote: condições "campo operador valor" separadas por ';'
+OPERADORES_FILTRO = {'=': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=', '~': 'LIKE'}
+_CONDICAO_FILTRO = re.compile(r'\s*(\w+)\s*(<=|>=|!=|=|<|>|~)\s*(.*?)\s*')
+
+_novo_paciente = tuple.__new__
+
+
+def _fabrica_paciente(cursor, linha):
+    return _novo_paciente(Paciente, linha)
+
+
+def _leitor(cursor):
+    # Cursor próprio, na mesma conexão (e transação), que já devolve Paciente
+    leitor = cursor.connection.cursor()
+    leitor.row_factory = _fabrica_paciente
+    return leitor
+
+
+def _array_json(valores):
+    import json
+    return json.dumps(list(valores))
+
+
+def valores_cadastro(paciente, colunas=COLUNAS_CADASTRO):
+    """Valores na ordem das colunas, a partir de um dicionário (validar_paciente) ou de um Paciente."""
+    if isinstance(paciente, Paciente):
+        return [getattr(paciente, coluna) for coluna in colunas]
+    return [paciente[coluna] for coluna in colunas]
+
+
+###         LEITURA         ###
+
+
+def buscar_por_id(cursor, id_cadastro, usar_cache=True):
+    """usar_cache=False lê direto do banco: use antes de uma escrita, já que o cache pode
+    estar até cache_pacientes.TTL_PADRAO segundos atrás das alterações de outro terminal."""
+    chave = cache_pacientes.chave_id(id_cadastro)
+    if chave is None or not usar_cache:
+        return _leitor(cursor).execute(SQL_POR_ID, (id_cadastro,)).fetchone()
+    paciente, geracao = cache_pacientes.obter(chave)
+    if paciente is None:
+        paciente = _leitor(cursor).execute(SQL_POR_ID, (chave,)).fetchone()
+        cache_pacientes.guardar(paciente, geracao)
+    return paciente
+
+
+def buscar_por_cpf(cursor, cpf):
+    paciente, geracao = cache_pacientes.obter_por_cpf(cpf)
+    if paciente is None:
+        paciente = _leitor(cursor).execute(SQL_POR_CPF, (cpf,)).fetchone()
+        cache_pacientes.guardar(paciente, geracao)
+    return paciente
+
+
+def buscar_por_ids(cursor, ids):
+    """{id: Paciente} dos ids que existem; os demais ficam de fora."""
+    leitor = _leitor(cursor).execute(SQL_POR_IDS, (_array_json(int(id_cadastro) for id_cadastro in ids),))
+    return {paciente.id: paciente for paciente in leitor}
+
+
+def ids_existentes(cursor, ids):
+    cursor.execute(SQL_IDS_EXISTENTES, (_array_json(int(id_cadastro) for id_cadastro in ids),))
+    return [id_cadastro for (id_cadastro,) in cursor]
+
+
+def cpfs_existentes(cursor, cpfs):
+    cursor.execute(SQL_CPFS_EXISTENTES, (_array_json(cpfs),))
+    return {cpf for (cpf,) in cursor}
+
+
+def buscar_pagina(cursor, a_partir_do_id=0, antes_do_id=None, tamanho_pagina=20):
+    # Paginação por chave (keyset) em id: o custo não depende da posição da página
+    leitor = _leitor(cursor)
+    if antes_do_id is not None:
+        return leitor.execute(SQL_PAGINA_ANTERIOR, (antes_do_id, tamanho_pagina)).fetchall()[::-1]
+    return leitor.execute(SQL_PAGINA, (a_partir_do_id, tamanho_pagina)).fetchall()
+
+
+def percorrer(cursor, tamanho_bloco=500):
+    """Todos os pacientes em ordem de id, lidos em blocos para não carregar a tabela na memória."""
+    leitor = _leitor(cursor).execute(SQL_TODOS)
+    while True:
+        pacientes = leitor.fetchmany(tamanho_bloco)
+        if not pacientes:
+            return
+        yield from pacientes
+
+
+def interpretar_filtro(expressao):
+    """Converte 'genero=F; data_registro<2020-01-01' em (cláusula WHERE, parâmetros).
+
+    Os campos são as colunas de cadastro e 'local' (cidade ou bairro, como no
+    relatório por local); '~' procura o valor como trecho do texto. Os valores
+    sempre vão como parâmetros. Filtro vazio ou inválido gera ValueError.
+    """
+    clausulas, parametros = [], []
+    for condicao in expressao.split(';'):
+        if not condicao.strip():
+            continue
+        encontrada = _CONDICAO_FILTRO.fullmatch(condicao)
+        if encontrada is None:
+            raise ValueError(f"Condição inválida: '{condicao.strip()}'. Use campo=valor, campo<valor, campo~trecho...")
+        campo, operador, valor = encontrada.groups()
+        if campo == 'local':
+            if operador != '=':
+                raise ValueError("O campo local só aceita '='.")
+            clausulas.append("id IN (SELECT id_cadastro FROM locais_cadastro WHERE local = ?)")
+            parametros.append(normalizar_local(valor))
+        elif campo in Paciente._fields:
+            clausulas.append(f"{campo} {OPERADORES_FILTRO[operador]} ?")
+            parametros.append(f"%{valor}%" if operador == '~' else valor)
+        else:
+            raise ValueError(f"Campo desconhecido no filtro: '{campo}'.")
+    if not clausulas:
+        raise ValueError("O filtro não tem nenhuma condição.")
+    return ' AND '.join(clausulas), parametros
+
+
+def buscar_ids(cursor, filtro):
+    """ids, em ordem, dos cadastros que atendem ao filtro (ver interpretar_filtro)."""
+    clausula, parametros = interpretar_filtro(filtro)
+    cursor.execute(f"SELECT id FROM cadastro WHERE {clausula} ORDER BY id", parametros)
+    return [id_cadastro for (id_cadastro,) in cursor]
+
+
+###         ESCRITA         ###
+
+
+def indexar_locais(cursor, enderecos, por_cpf=False):
+    """Grava em locais_cadastro os locais de cada (id, endereço), ou de cada (cpf, endereço)
+    com por_cpf=True. Para quem insere em cadastro sem passar por inserir."""
+    cursor.executemany(SQL_INSERIR_LOCAL_POR_CPF if por_cpf else SQL_INSERIR_LOCAL,
+                       [(local, chave) for chave, endereco in enderecos for local in extrair_locais(endereco)])
+
+
+def _reindexar_locais(cursor, enderecos):
+    cursor.executemany(SQL_REMOVER_LOCAIS, [(id_cadastro,) for id_cadastro, _ in enderecos])
+    indexar_locais(cursor, enderecos)
+
+
+def inserir(cursor, paciente):
+    """Insere um paciente (dicionário com COLUNAS_CADASTRO) e retorna o id gerado."""
+    valores = valores_cadastro(paciente)
+    cursor.execute(SQL_INSERIR_CADASTRO, valores)
+    id_cadastro = cursor.lastrowid
+    indexar_locais(cursor, [(id_cadastro, valores[COLUNAS_CADASTRO.index('endereco')])])
+    # O CPF pode ser de um cadastro que outro processo excluiu e que ainda está no
+    # cache; e o id novo fica pendente até o commit (ver cache_pacientes)
+    cache_pacientes.invalidar(cursor.connection, [id_cadastro], [valores[COLUNAS_CADASTRO.index('cpf')]])
+    return id_cadastro
+
+
+def inserir_em_lote(cursor, pacientes):
+    parametros = [valores_cadastro(paciente) for paciente in pacientes]
+    cursor.executemany(SQL_INSERIR_CADASTRO, parametros)
+    inseridos = cursor.rowcount
+    indice_cpf, indice_endereco = COLUNAS_CADASTRO.index('cpf'), COLUNAS_CADASTRO.index('endereco')
+    indexar_locais(cursor, [(valores[indice_cpf], valores[indice_endereco]) for valores in parametros], por_cpf=True)
+    # Como em inserir; os ids gerados pelo executemany só são conhecidos pelo CPF
+    cpfs = [valores[indice_cpf] for valores in parametros]
+    cursor.execute(SQL_IDS_POR_CPFS, (_array_json(cpfs),))
+    cache_pacientes.invalidar(cursor.connection, [id_cadastro for (id_cadastro,) in cursor.fetchall()], cpfs)
+    return inseridos
+
+
+def atualizar(cursor, id_cadastro, paciente):
+    """Troca as COLUNAS_ATUALIZAVEIS do paciente; retorna se o cadastro existia."""
+    return atualizar_em_lote(cursor, [(id_cadastro, paciente)]) > 0
+
+
+def atualizar_em_lote(cursor, atualizacoes):
+    """Aplica (id, paciente) com um único executemany; retorna quantos cadastros foram alterados."""
+    parametros = [valores_cadastro(paciente, COLUNAS_ATUALIZAVEIS) + [id_cadastro]
+                  for id_cadastro, paciente in atualizacoes]
+    cursor.executemany(SQL_ATUALIZAR_CADASTRO, parametros)
+    alterados = cursor.rowcount
+    indice_cpf, indice_endereco = COLUNAS_ATUALIZAVEIS.index('cpf'), COLUNAS_ATUALIZAVEIS.index('endereco')
+    _reindexar_locais(cursor, [(valores[-1], valores[indice_endereco]) for valores in parametros])
+    # O CPF novo também sai do cache, caso a alteração seja uma troca de CPF
+    cache_pacientes.invalidar(cursor.connection, (valores[-1] for valores in parametros),
+                              [valores[indice_cpf] for valores in parametros])
+    return alterados
+
+
+def atualizar_campos(cursor, id_cadastro, alteracoes):
+    """Atualização parcial: troca só as colunas de alteracoes; retorna se o cadastro existia."""
+    return atualizar_campos_em_lote(cursor, [(id_cadastro, alteracoes)]) > 0
+
+
+def atualizar_campos_em_lote(cursor, atualizacoes):
+    """Aplica (id, {coluna: valor}) com um executemany por conjunto de colunas alteradas;
+    retorna quantos cadastros foram alterados. Colunas inválidas geram ValueError antes de qualquer escrita."""
+    grupos = {}
+    for id_cadastro, alteracoes in atualizacoes:
+        invalidas = set(alteracoes).difference(COLUNAS_ATUALIZAVEIS)
+        if invalidas or not alteracoes:
+            raise ValueError(f"Colunas inválidas para atualização: {sorted(invalidas) or 'nenhuma informada'}")
+        colunas = tuple(coluna for coluna in COLUNAS_ATUALIZAVEIS if coluna in alteracoes)
+        grupos.setdefault(colunas, []).append([alteracoes[coluna] for coluna in colunas] + [id_cadastro])
+
+    alterados = 0
+    for colunas, parametros in grupos.items():
+        # O texto se repete para o mesmo conjunto de colunas e reaproveita o cache de instruções
+        cursor.executemany(
+            f"UPDATE cadastro SET {', '.join(f'{coluna} = ?' for coluna in colunas)} WHERE id = ?", parametros)
+        alterados += cursor.rowcount
+        if 'endereco' in colunas:
+            _reindexar_locais(cursor, [(valores[-1], valores[colunas.index('endereco')]) for valores in parametros])
+        cpfs = [valores[colunas.index('cpf')] for valores in parametros] if 'cpf' in colunas else ()
+        cache_pacientes.invalidar(cursor.connection, [valores[-1] for valores in parametros], cpfs)
+    return alterados
+
+
+def remover(cursor, id_cadastro):
+    """Exclui o cadastro, a sugestão da IA e os jobs ainda não processados; retorna se o cadastro existia."""
+    return remover_em_lote(cursor, [id_cadastro]) > 0
+
+
+def remover_em_lote(cursor, ids):
+    parametros = [(id_cadastro,) for id_cadastro in ids]
+    cursor.executemany(SQL_REMOVER_CADASTRO, parametros)
+    removidos = cursor.rowcount
+    cache_pacientes.invalidar(cursor.connection, [id_cadastro for (id_cadastro,) in parametros])
+    cursor.executemany(SQL_REMOVER_SUGESTAO, parametros)
+    cursor.executemany(SQL_REMOVER_JOBS, parametros)
+    return removidos
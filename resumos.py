@@ -0,0 +1,181 @@
+import logging
+import sqlite3
+
+
+# resumo_diario guarda, por dia de registro, gênero, pressão e frequência de
+# atividades, quantos cadastros existem e a soma do IMC. Os triggers abaixo
+# mantêm o resumo a cada INSERT/UPDATE/DELETE em cadastro, de modo que os
+# painéis leem algumas centenas de linhas em vez de percorrer a tabela inteira.
+COLUNAS_CHAVE = ('dia', 'genero', 'pressao_arterial', 'frequencia_atividades_sem')
+
+
+def _chave(linha):
+    return (f"substr({linha}data_registro, 1, 10), UPPER({linha}genero), "
+            f"COALESCE({linha}pressao_arterial, ''), COALESCE({linha}frequencia_atividades_sem, '')")
+
+
+def _imc(linha):
+    return (f"(CASE WHEN {linha}altura > 0 AND {linha}peso > 0 "
+            f"THEN {linha}peso / ({linha}altura * {linha}altura) END)")
+
+
+def _somar(linha):
+    return f'''
+        INSERT INTO resumo_diario ({', '.join(COLUNAS_CHAVE)}, total, soma_imc, quantidade_imc)
+        VALUES ({_chave(linha)}, 1, COALESCE({_imc(linha)}, 0), {_imc(linha)} IS NOT NULL)
+        ON CONFLICT ({', '.join(COLUNAS_CHAVE)}) DO UPDATE SET
+            total = total + 1,
+            soma_imc = soma_imc + excluded.soma_imc,
+            quantidade_imc = quantidade_imc + excluded.quantidade_imc;'''
+
+
+def _subtrair(linha):
+    filtro = f"({', '.join(COLUNAS_CHAVE)}) = ({_chave(linha)})"
+    return f'''
+        UPDATE resumo_diario SET
+            total = total - 1,
+            soma_imc = soma_imc - COALESCE({_imc(linha)}, 0),
+            quantidade_imc = quantidade_imc - ({_imc(linha)} IS NOT NULL)
+        WHERE {filtro};
+        DELETE FROM resumo_diario WHERE {filtro} AND total <= 0;'''
+
+
+SCRIPT_RESUMO = f'''
+    CREATE TABLE IF NOT EXISTS resumo_diario (
+        dia TEXT NOT NULL,
+        genero TEXT NOT NULL,
+        pressao_arterial TEXT NOT NULL,
+        frequencia_atividades_sem TEXT NOT NULL,
+        total INTEGER NOT NULL,
+        soma_imc REAL NOT NULL,
+        quantidade_imc INTEGER NOT NULL,
+        PRIMARY KEY ({', '.join(COLUNAS_CHAVE)})
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_insert AFTER INSERT ON cadastro
+    BEGIN{_somar('NEW.')}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_delete AFTER DELETE ON cadastro
+    BEGIN{_subtrair('OLD.')}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_update
+    AFTER UPDATE OF data_registro, genero, pressao_arterial, frequencia_atividades_sem, altura, peso
+    ON cadastro
+    BEGIN{_subtrair('OLD.')}{_somar('NEW.')}
+    END;
+'''
+
+SQL_RESUMO_CALCULADO = f'''
+    SELECT substr(data_registro, 1, 10) AS dia, UPPER(genero) AS genero,
+           COALESCE(pressao_arterial, '') AS pressao_arterial,
+           COALESCE(frequencia_atividades_sem, '') AS frequencia_atividades_sem, COUNT(*) AS total,
+           COALESCE(SUM({_imc('')}), 0) AS soma_imc, COUNT({_imc('')}) AS quantidade_imc
+    FROM cadastro
+    GROUP BY 1, 2, 3, 4
+'''
+
+SQL_RECONSTRUIR_RESUMO = f"INSERT INTO resumo_diario {SQL_RESUMO_CALCULADO}"
+
+# A soma do IMC acumula pequenos erros de ponto flutuante; a verificação aceita uma tolerância
+TOLERANCIA_IMC = 1e-6
+
+# Uma única passada: os dois lados são empilhados e agrupados pela chave
+SQL_DIVERGENCIAS = f'''
+    SELECT {', '.join(COLUNAS_CHAVE)},
+           SUM(esperado) AS total_esperado, SUM(mantido) AS total_mantido,
+           SUM(imc_esperados) AS imc_esperados, SUM(imc_mantidos) AS imc_mantidos
+    FROM (
+        SELECT {', '.join(COLUNAS_CHAVE)}, total AS esperado, 0 AS mantido, soma_imc,
+               quantidade_imc AS imc_esperados, 0 AS imc_mantidos
+        FROM ({SQL_RESUMO_CALCULADO})
+        UNION ALL
+        SELECT {', '.join(COLUNAS_CHAVE)}, 0, total, -soma_imc, 0, quantidade_imc
+        FROM resumo_diario
+    )
+    GROUP BY {', '.join(COLUNAS_CHAVE)}
+    HAVING SUM(esperado) != SUM(mantido) OR SUM(imc_esperados) != SUM(imc_mantidos)
+        OR abs(SUM(soma_imc)) > {TOLERANCIA_IMC}
+'''
+
+
+def reconstruir_resumo(cursor):
+    """Recalcula resumo_diario a partir de cadastro, em uma única transação."""
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute("DELETE FROM resumo_diario")
+        cursor.execute(SQL_RECONSTRUIR_RESUMO)
+        cursor.connection.commit()
+    except sqlite3.Error:
+        cursor.connection.rollback()
+        raise
+    cursor.execute("SELECT COUNT(*) FROM resumo_diario")
+    linhas = cursor.fetchone()[0]
+    logging.info(f"Resumo diário reconstruído: {linhas} linha(s).")
+    return linhas
+
+
+def verificar_resumo(cursor):
+    """Compara resumo_diario com o cálculo direto sobre cadastro.
+
+    Retorna, por chave divergente, os totais esperado e mantido e as quantidades de IMC de cada lado.
+    """
+    cursor.execute(SQL_DIVERGENCIAS)
+    return cursor.fetchall()
+
+
+def main():
+    import argparse
+
+    from locais import reconstruir_locais, verificar_locais
+    from main import conectar_bd, configurar_logging
+
+    configurar_logging()
+
+    # locais_cadastro entra aqui porque só o repositório o mantém nas inclusões e
+    # alterações: gravações diretas em cadastro o deixam desatualizado (ver locais.py)
+    parser = argparse.ArgumentParser(
+        description="Reconstrói ou verifica as tabelas derivadas do cadastro (resumo diário e locais).")
+    parser.add_argument('acao', choices=['verificar', 'reconstruir'])
+    args = parser.parse_args()
+
+    conn = conectar_bd()
+    cursor = conn.cursor()
+    try:
+        if args.acao == 'reconstruir':
+            print(f"Resumo reconstruído com {reconstruir_resumo(cursor)} linha(s).")
+            print(f"Locais reconstruídos com {reconstruir_locais(cursor)} linha(s).")
+            return
+
+        divergencias = verificar_resumo(cursor)
+        for divergencia in divergencias:
+            print(" | ".join(str(valor) for valor in divergencia))
+        if divergencias:
+            logging.warning(f"Resumo diário com {len(divergencias)} divergência(s).")
+            print(f"{len(divergencias)} divergência(s) no resumo diário.")
+        else:
+            print("Resumo diário consistente com o cadastro.")
+
+        locais_divergentes = verificar_locais(cursor)
+        if locais_divergentes:
+            amostra = ', '.join(str(id_cadastro) for id_cadastro in locais_divergentes[:20])
+            logging.warning(f"Locais desatualizados em {len(locais_divergentes)} cadastro(s).")
+            print(f"Locais desatualizados em {len(locais_divergentes)} cadastro(s) (ids: {amostra}"
+                  f"{', ...' if len(locais_divergentes) > 20 else ''}).")
+        else:
+            print("Locais consistentes com o cadastro.")
+
+        if divergencias or locais_divergentes:
+            print("Execute 'python resumos.py reconstruir'.")
+            exit(1)
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao processar o resumo diário: {e}")
+        print(f"Erro ao processar o resumo diário: {e}")
+        exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
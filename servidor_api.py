@@ -0,0 +1,475 @@
+import argparse
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from conexao import conexao_da_thread
+from locais import normalizar_local
+from log_estruturado import medir_operacao
+from main import (TAMANHO_PAGINA, atualizar_pacientes, buscar_pagina, configurar_logging, conectar_bd,
+                  enfileirar_sugestao_ia, executar_setup, remover_paciente, validar_alteracoes, validar_data,
+                  validar_genero, validar_local, validar_paciente)
+from metricas import exportar_prometheus
+from repositorio import (SQL_RELATORIO_DATA, SQL_RELATORIO_GENERO, SQL_RELATORIO_LOCAL, atualizar, buscar_por_id,
+                         inserir)
+
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8080
+THREADS_PADRAO = 8
+
+LIMITE_PAGINA_API = 1000
+TAMANHO_MAXIMO_CORPO = 1 << 20
+TAMANHO_MAXIMO_CABECALHO = 1 << 16
+TEMPO_OCIOSO = 30
+
+# Registros por bloco nas respostas em streaming e blocos que podem aguardar o envio
+TAMANHO_BLOCO_STREAM = 500
+BLOCOS_EM_ESPERA = 4
+
+
+class ErroApi(Exception):
+    def __init__(self, status, mensagem, detalhes=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+        self.detalhes = detalhes
+
+
+class Stream:
+    """Resposta enviada em blocos (Transfer-Encoding: chunked) a partir de um gerador executado no pool."""
+
+    def __init__(self, gerador, tipo='application/json'):
+        self.gerador = gerador
+        self.tipo = tipo
+
+
+###         OPERAÇÕES (executadas nas threads do pool)         ###
+
+
+def _como_dicionario(cursor, registro):
+    return dict(zip([description[0] for description in cursor.description], registro))
+
+
+def _id_valido(valor):
+    if not valor.isdigit():
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "ID inválido.")
+    return int(valor)
+
+
+def _validar_corpo(corpo):
+    if not isinstance(corpo, dict):
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "O corpo deve ser um objeto JSON.")
+    paciente, erros = validar_paciente(corpo)
+    if erros:
+        raise ErroApi(HTTPStatus.UNPROCESSABLE_ENTITY, "Dados do paciente inválidos.", erros)
+    return paciente
+
+
+def obter_paciente(id_cadastro):
+    # Sem o cache: um cliente da API pode ler logo depois de alterar o paciente em outro
+    # processo (terminal, CLI), e o cache ficaria até TTL_PADRAO segundos atrasado
+    registro = buscar_por_id(conexao_da_thread().cursor(), _id_valido(id_cadastro), usar_cache=False)
+    if registro is None:
+        raise ErroApi(HTTPStatus.NOT_FOUND, f"Registro com ID {id_cadastro} não encontrado.")
+    return registro._asdict()
+
+
+def listar_pacientes(parametros):
+    a_partir_do_id = parametros.get('a_partir_do_id', '0')
+    limite = parametros.get('limite', str(TAMANHO_PAGINA))
+    if not a_partir_do_id.isdigit() or not limite.isdigit() or not 1 <= int(limite) <= LIMITE_PAGINA_API:
+        raise ErroApi(HTTPStatus.BAD_REQUEST, f"Use a_partir_do_id >= 0 e limite entre 1 e {LIMITE_PAGINA_API}.")
+
+    cursor = conexao_da_thread().cursor()
+    # Paginação por chave, como no navegador de registros: proximo_id abre a página seguinte
+    registros = buscar_pagina(cursor, int(a_partir_do_id), tamanho_pagina=int(limite) + 1)
+    pagina = [registro._asdict() for registro in registros[:int(limite)]]
+    proximo_id = registros[-1].id if len(registros) > int(limite) else None
+    return {'registros': pagina, 'proximo_id': proximo_id}
+
+
+def criar_paciente(corpo):
+    paciente = _validar_corpo(corpo)
+    conn = conexao_da_thread()
+    cursor = conn.cursor()
+    try:
+        with conn:
+            id_cadastro = inserir(cursor, paciente)
+            enfileirar_sugestao_ia(cursor, id_cadastro)
+    except sqlite3.IntegrityError:
+        raise ErroApi(HTTPStatus.CONFLICT, "O CPF já está em uso.")
+    logging.info(f"Registro criado pela API. ID: {id_cadastro}")
+    return HTTPStatus.CREATED, obter_paciente(str(id_cadastro))
+
+
+def atualizar_paciente(id_cadastro, corpo):
+    id_cadastro = _id_valido(id_cadastro)
+    paciente = _validar_corpo(corpo)
+    conn = conexao_da_thread()
+    cursor = conn.cursor()
+    try:
+        with conn:
+            if not atualizar(cursor, id_cadastro, paciente):
+                raise ErroApi(HTTPStatus.NOT_FOUND, f"Registro com ID {id_cadastro} não encontrado.")
+            # A sugestão da IA é refeita pelo worker com os dados atualizados
+            enfileirar_sugestao_ia(cursor, id_cadastro)
+    except sqlite3.IntegrityError:
+        raise ErroApi(HTTPStatus.CONFLICT, "O novo CPF já está em uso.")
+    logging.info(f"Registro atualizado pela API. ID: {id_cadastro}")
+    return obter_paciente(str(id_cadastro))
+
+
+def atualizar_campos_paciente(id_cadastro, corpo):
+    # PATCH: só os campos enviados são validados e gravados
+    id_cadastro = _id_valido(id_cadastro)
+    if not isinstance(corpo, dict) or not corpo:
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "O corpo deve ser um objeto JSON com os campos a alterar.")
+    alteracoes, erros = validar_alteracoes(corpo)
+    if erros:
+        raise ErroApi(HTTPStatus.UNPROCESSABLE_ENTITY, "Dados do paciente inválidos.", erros)
+    conn = conexao_da_thread()
+    try:
+        with conn:
+            if not atualizar_pacientes(conn.cursor(), [id_cadastro], alteracoes):
+                raise ErroApi(HTTPStatus.NOT_FOUND, f"Registro com ID {id_cadastro} não encontrado.")
+    except sqlite3.IntegrityError:
+        raise ErroApi(HTTPStatus.CONFLICT, "O novo CPF já está em uso.")
+    logging.info(f"Registro atualizado pela API. ID: {id_cadastro}, campos {sorted(alteracoes)}")
+    return obter_paciente(str(id_cadastro))
+
+
+def excluir_paciente(id_cadastro):
+    id_cadastro = _id_valido(id_cadastro)
+    conn = conexao_da_thread()
+    with conn:
+        if not remover_paciente(conn.cursor(), id_cadastro):
+            raise ErroApi(HTTPStatus.NOT_FOUND, f"Registro com ID {id_cadastro} não encontrado.")
+    logging.info(f"Registro excluído pela API. ID: {id_cadastro}")
+    return HTTPStatus.NO_CONTENT, None
+
+
+def obter_sugestao(id_cadastro):
+    id_cadastro = _id_valido(id_cadastro)
+    cursor = conexao_da_thread().cursor()
+    cursor.execute("SELECT resposta, gerado_em FROM sugestoes_ia WHERE id_cadastro = ?", (id_cadastro,))
+    sugestao = cursor.fetchone()
+    if sugestao is not None:
+        return {'id_cadastro': id_cadastro, 'resposta': sugestao[0], 'gerado_em': sugestao[1]}
+
+    cursor.execute("SELECT status, erro FROM fila_ia WHERE id_cadastro = ? ORDER BY id DESC LIMIT 1",
+                   (id_cadastro,))
+    job = cursor.fetchone()
+    if job is None:
+        raise ErroApi(HTTPStatus.NOT_FOUND, "Não há sugestão da IA nem pedido na fila para este paciente.")
+    # 202: o pedido existe e o worker da IA ainda vai (ou tentou) respondê-lo
+    return HTTPStatus.ACCEPTED, {'id_cadastro': id_cadastro, 'status': job[0], 'erro': job[1]}
+
+
+def solicitar_sugestao(id_cadastro):
+    obter_paciente(id_cadastro)
+    conn = conexao_da_thread()
+    with conn:
+        enfileirar_sugestao_ia(conn.cursor(), int(id_cadastro))
+    return HTTPStatus.ACCEPTED, {'id_cadastro': int(id_cadastro), 'status': 'pendente'}
+
+
+def _stream_relatorio(operacao, sql, parametros):
+    """Gera o relatório como um array JSON, bloco a bloco, sem montar a resposta inteira na memória."""
+    with medir_operacao(operacao, origem='api') as medicao:
+        cursor = conexao_da_thread().cursor()
+        cursor.execute(sql, parametros)
+        headers = [description[0] for description in cursor.description]
+        medicao.linhas = 0
+
+        try:
+            yield '['
+            while True:
+                registros = cursor.fetchmany(TAMANHO_BLOCO_STREAM)
+                if not registros:
+                    break
+                partes = []
+                for registro in registros:
+                    partes.append(('\n  ' if medicao.linhas == 0 else ',\n  ') + json.dumps(dict(zip(headers, registro)), ensure_ascii=False, default=str))
+                    medicao.linhas += 1
+                yield ''.join(partes)
+            yield '\n]\n' if medicao.linhas else ']\n'
+        except GeneratorExit:
+            # O cliente desconectou antes do fim da resposta
+            medicao.resultado = 'cancelado'
+            raise
+
+
+def relatorio_genero(genero):
+    if not validar_genero(genero):
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "Gênero inválido. Use M, F ou N.")
+    return Stream(_stream_relatorio('relatorio_por_genero', SQL_RELATORIO_GENERO, (genero.upper(),)))
+
+
+def relatorio_data(parametros):
+    data_inicial = parametros.get('inicio', '')
+    data_final = parametros.get('fim', '')
+    if not validar_data(data_inicial) or not validar_data(data_final):
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "Informe inicio e fim no formato YYYY-MM-DD.")
+    return Stream(_stream_relatorio('relatorio_por_data', SQL_RELATORIO_DATA, (f"{data_inicial} 00:00:00", f"{data_final} 23:59:59")))
+
+
+def relatorio_local(local):
+    if not local.strip() or not validar_local(local):
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "Local inválido.")
+    return Stream(_stream_relatorio('relatorio_por_local', SQL_RELATORIO_LOCAL, (normalizar_local(local),)))
+
+
+def _gerar_metricas():
+    yield exportar_prometheus()
+
+
+def obter_metricas():
+    # Métricas deste processo (ver metricas.py), no formato lido pelo Prometheus
+    return Stream(_gerar_metricas(), 'text/plain; version=0.0.4')
+
+
+# (método, caminho, função); grupos do caminho viram argumentos, e 'parametros'/'corpo'
+# indicam que a função recebe a query string ou o JSON enviado
+ROTAS = [
+    ('GET', r'/pacientes', listar_pacientes, 'parametros'),
+    ('POST', r'/pacientes', criar_paciente, 'corpo'),
+    ('GET', r'/pacientes/([^/]+)', obter_paciente, None),
+    ('PUT', r'/pacientes/([^/]+)', atualizar_paciente, 'corpo'),
+    ('PATCH', r'/pacientes/([^/]+)', atualizar_campos_paciente, 'corpo'),
+    ('DELETE', r'/pacientes/([^/]+)', excluir_paciente, None),
+    ('GET', r'/pacientes/([^/]+)/sugestao', obter_sugestao, None),
+    ('POST', r'/pacientes/([^/]+)/sugestao', solicitar_sugestao, None),
+    ('GET', r'/relatorios/genero/([^/]+)', relatorio_genero, None),
+    ('GET', r'/relatorios/data', relatorio_data, 'parametros'),
+    ('GET', r'/relatorios/local/([^/]+)', relatorio_local, None),
+    ('GET', r'/metricas', obter_metricas, None),
+]
+ROTAS = [(metodo, re.compile(caminho + '/?'), funcao, entrada) for metodo, caminho, funcao, entrada in ROTAS]
+
+
+def resolver_rota(metodo, caminho):
+    metodos_permitidos = []
+    for metodo_rota, padrao, funcao, entrada in ROTAS:
+        encontrado = padrao.fullmatch(caminho)
+        if encontrado:
+            if metodo_rota == metodo:
+                return funcao, [unquote(grupo) for grupo in encontrado.groups()], entrada
+            metodos_permitidos.append(metodo_rota)
+    if metodos_permitidos:
+        raise ErroApi(HTTPStatus.METHOD_NOT_ALLOWED, f"Use {', '.join(metodos_permitidos)}.")
+    raise ErroApi(HTTPStatus.NOT_FOUND, "Recurso não encontrado.")
+
+
+###         HTTP          ###
+
+
+async def ler_requisicao(leitor):
+    """Lê uma requisição HTTP/1.1; retorna None quando o cliente fecha a conexão."""
+    try:
+        cabecalho = await asyncio.wait_for(leitor.readuntil(b'\r\n\r\n'), TEMPO_OCIOSO)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ErroApi(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Cabeçalho muito grande.")
+
+    linhas = cabecalho.decode('latin-1').split('\r\n')
+    try:
+        metodo, alvo, versao = linhas[0].split(' ')
+    except ValueError:
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "Requisição malformada.")
+
+    headers = {}
+    for linha in linhas[1:]:
+        if ':' in linha:
+            nome, valor = linha.split(':', 1)
+            headers[nome.strip().lower()] = valor.strip()
+
+    tamanho = headers.get('content-length', '0')
+    if not tamanho.isdigit():
+        raise ErroApi(HTTPStatus.BAD_REQUEST, "Content-Length inválido.")
+    if int(tamanho) > TAMANHO_MAXIMO_CORPO:
+        raise ErroApi(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corpo da requisição muito grande.")
+    corpo = await leitor.readexactly(int(tamanho)) if int(tamanho) else b''
+
+    manter_conexao = (headers.get('connection', '').lower() != 'close'
+                      and (versao == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive'))
+    return metodo.upper(), alvo, corpo, manter_conexao
+
+
+def _cabecalhos(status, tipo, extras, manter_conexao):
+    linhas = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Type: {tipo}; charset=utf-8"]
+    linhas += extras
+    linhas.append(f"Connection: {'keep-alive' if manter_conexao else 'close'}")
+    return ('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1')
+
+
+async def enviar_json(escritor, status, conteudo, manter_conexao):
+    corpo = b'' if conteudo is None else json.dumps(conteudo, ensure_ascii=False, default=str).encode('utf-8')
+    escritor.write(_cabecalhos(status, 'application/json', [f"Content-Length: {len(corpo)}"], manter_conexao) + corpo)
+    await escritor.drain()
+
+
+async def enviar_stream(escritor, stream, executor, manter_conexao):
+    """Envia os blocos à medida que a thread do pool os produz, com uma fila limitada entre os dois."""
+    loop = asyncio.get_running_loop()
+    fila = asyncio.Queue(BLOCOS_EM_ESPERA)
+    fim = object()
+    cancelado = threading.Event()
+
+    def produzir():
+        try:
+            for bloco in stream.gerador:
+                if cancelado.is_set():
+                    return
+                asyncio.run_coroutine_threadsafe(fila.put(bloco), loop).result()
+        except Exception as e:
+            asyncio.run_coroutine_threadsafe(fila.put(e), loop).result()
+            return
+        finally:
+            stream.gerador.close()
+        asyncio.run_coroutine_threadsafe(fila.put(fim), loop).result()
+
+    produtor = loop.run_in_executor(executor, produzir)
+
+    # O primeiro bloco é aguardado antes do cabeçalho, para que erros de consulta ainda virem um JSON de erro
+    bloco = await fila.get()
+    if isinstance(bloco, Exception):
+        await produtor
+        raise bloco
+
+    escritor.write(_cabecalhos(HTTPStatus.OK, stream.tipo, ["Transfer-Encoding: chunked"], manter_conexao))
+    try:
+        while bloco is not fim:
+            if isinstance(bloco, Exception):
+                # O status já foi enviado: encerrar sem o bloco final sinaliza a falha ao cliente
+                logging.error(f"Erro durante o envio de uma resposta em streaming: {bloco}")
+                escritor.close()
+                return False
+            dados = bloco.encode('utf-8')
+            escritor.write(f"{len(dados):X}\r\n".encode('latin-1') + dados + b'\r\n')
+            await escritor.drain()
+            bloco = await fila.get()
+        escritor.write(b'0\r\n\r\n')
+        await escritor.drain()
+    finally:
+        # Se o cliente desconectou, interrompe o produtor e libera a thread esvaziando a fila
+        cancelado.set()
+        while not produtor.done():
+            if fila.empty():
+                await asyncio.sleep(0)
+            else:
+                fila.get_nowait()
+        await produtor
+    return manter_conexao
+
+
+async def atender(metodo, alvo, corpo, executor):
+    partes = urlsplit(alvo)
+    funcao, argumentos, entrada = resolver_rota(metodo, partes.path)
+
+    if entrada == 'parametros':
+        argumentos.append({nome: valores[-1] for nome, valores in parse_qs(partes.query).items()})
+    elif entrada == 'corpo':
+        try:
+            argumentos.append(json.loads(corpo or b'null'))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ErroApi(HTTPStatus.BAD_REQUEST, "O corpo não é um JSON válido.")
+
+    def executar():
+        with medir_operacao(f"api_{funcao.__name__}", metodo=metodo, caminho=partes.path) as medicao:
+            try:
+                resultado = funcao(*argumentos)
+            except ErroApi as e:
+                medicao.resultado = f"http_{int(e.status)}"
+                raise
+            if isinstance(resultado, dict) and 'registros' in resultado:
+                medicao.linhas = len(resultado['registros'])
+            return resultado
+
+    resultado = await asyncio.get_running_loop().run_in_executor(executor, executar)
+    if isinstance(resultado, Stream):
+        return HTTPStatus.OK, resultado
+    if isinstance(resultado, tuple):
+        return resultado
+    return HTTPStatus.OK, resultado
+
+
+def criar_atendimento(executor):
+    async def atender_conexao(leitor, escritor):
+        manter_conexao = True
+        try:
+            while manter_conexao:
+                try:
+                    requisicao = await ler_requisicao(leitor)
+                    if requisicao is None:
+                        break
+                    metodo, alvo, corpo, manter_conexao = requisicao
+                    status, conteudo = await atender(metodo, alvo, corpo, executor)
+                    if isinstance(conteudo, Stream):
+                        manter_conexao = await enviar_stream(escritor, conteudo, executor, manter_conexao)
+                    else:
+                        await enviar_json(escritor, status, conteudo, manter_conexao)
+                except ErroApi as e:
+                    erro = {'erro': e.mensagem}
+                    if e.detalhes:
+                        erro['detalhes'] = e.detalhes
+                    await enviar_json(escritor, e.status, erro, manter_conexao)
+                except sqlite3.Error as e:
+                    logging.error(f"Erro de banco de dados na API: {e}")
+                    await enviar_json(escritor, HTTPStatus.SERVICE_UNAVAILABLE,
+                                      {'erro': "Erro de banco de dados."}, manter_conexao)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception:
+                    logging.exception("Erro inesperado na API.")
+                    await enviar_json(escritor, HTTPStatus.INTERNAL_SERVER_ERROR,
+                                      {'erro': "Erro interno."}, False)
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    return atender_conexao
+
+
+async def servir(host=HOST_PADRAO, porta=PORTA_PADRAO, threads=THREADS_PADRAO):
+    # Cada thread do pool mantém sua própria conexão (conexao_da_thread), reaproveitada entre requisições
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='api-bd') as executor:
+        servidor = await asyncio.start_server(
+            criar_atendimento(executor), host, porta, limit=TAMANHO_MAXIMO_CABECALHO, backlog=1024)
+        logging.info(f"API HTTP em http://{host}:{porta} ({threads} conexões com o banco).")
+        print(f"API HTTP em http://{host}:{porta} (Ctrl+C para encerrar)")
+        async with servidor:
+            await servidor.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON com o cadastro, os relatórios e a IA.")
+    parser.add_argument('--host', default=HOST_PADRAO, help=f"endereço de escuta (padrão: {HOST_PADRAO})")
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO, help=f"porta (padrão: {PORTA_PADRAO})")
+    parser.add_argument('--threads', type=int, default=THREADS_PADRAO,
+                        help=f"threads e conexões com o banco (padrão: {THREADS_PADRAO})")
+    args = parser.parse_args()
+    configurar_logging()
+
+    # O esquema é atualizado uma vez, antes de aceitar requisições
+    with conectar_bd() as conn:
+        executar_setup(conn.cursor())
+    conn.close()
+
+    try:
+        asyncio.run(servir(args.host, args.porta, args.threads))
+    except KeyboardInterrupt:
+        print("Servidor encerrado.")
+
+
+if __name__ == "__main__":
+    main()
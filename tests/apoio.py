@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+from conexao import abrir_conexao
+from dados_sinteticos import como_dicionario, gerar_pacientes
+from migracoes import aplicar_migracoes, dividir_instrucoes, executar_em_transacao
+from repositorio import inserir_em_lote
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Os pontos de entrada (cli.main, servidor) configuram o log: fora do app_log.txt do projeto
+os.environ.setdefault('ASSIST_LOG_ARQUIVO', os.path.join(tempfile.gettempdir(), 'assist_medic_testes.log'))
+
+
+def criar_esquema_base(cursor):
+    # Caminho absoluto: aplicar_migracoes leria setup.sql do diretório atual
+    with open(os.path.join(RAIZ, 'setup.sql'), 'r') as script:
+        executar_em_transacao(cursor, dividir_instrucoes(script.read()))
+
+
+def criar_banco(caso, quantidade=0):
+    """Banco temporário migrado até a última versão, com quantidade pacientes sintéticos.
+
+    Retorna (conexão, caminho); ambos são descartados ao fim do teste.
+    """
+    pasta = tempfile.TemporaryDirectory()
+    caso.addCleanup(pasta.cleanup)
+    caminho = os.path.join(pasta.name, 'atendimento_medico.db')
+    conn = abrir_conexao(caminho)
+    caso.addCleanup(conn.close)
+    criar_esquema_base(conn.cursor())
+    aplicar_migracoes(conn.cursor())
+    if quantidade:
+        inserir_em_lote(conn.cursor(), pacientes(quantidade))
+        conn.commit()
+    return conn, caminho
+
+
+def pacientes(quantidade, inicio=0):
+    """Dicionários com COLUNAS_CADASTRO, válidos e com CPFs distintos para inícios distintos."""
+    return [como_dicionario(linha) for linha in gerar_pacientes(quantidade, inicio=inicio)]
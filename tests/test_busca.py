@@ -0,0 +1,106 @@
+import unittest
+
+import repositorio
+from apoio import criar_banco, pacientes
+from busca import buscar_pacientes, montar_consulta_fts
+
+CADASTROS = [
+    ('José Antônio Araújo', 'Rua das Flores, 10 - Centro, São Paulo', 'diabetes tipo 2'),
+    ('Maria Conceição', 'Avenida Brasil, 200 - Boa Vista, Recife', 'hipertensão arterial e diabete'),
+    ('Joselito Pereira', 'Rua Ceará, 5 - Centro, Fortaleza', 'asma; rinite alérgica'),
+    ('Ana Or Silva', 'Travessa Não Sei, 1 - Centro, Belém', 'pressão arterial alta'),
+]
+
+
+class TestBusca(unittest.TestCase):
+    def setUp(self):
+        self.conn, _ = criar_banco(self)
+        self.cursor = self.conn.cursor()
+        linhas = [dict(paciente, nome=nome, endereco=endereco, historico_doencas=historico)
+                  for paciente, (nome, endereco, historico) in zip(pacientes(len(CADASTROS)), CADASTROS)]
+        repositorio.inserir_em_lote(self.cursor, linhas)
+        self.conn.commit()
+
+    def ids(self, texto, **opcoes):
+        _, linhas, _ = buscar_pacientes(self.cursor, texto, **opcoes)
+        return sorted(linha[0] for linha in linhas)
+
+    def test_acentos_e_maiusculas_sao_ignorados(self):
+        self.assertEqual(self.ids('jose'), [1])
+        self.assertEqual(self.ids('JOSÉ araujo'), [1])
+        self.assertEqual(self.ids('hipertensao'), [2])
+        self.assertEqual(self.ids('ceara'), [3])
+
+    def test_prefixo(self):
+        self.assertEqual(self.ids('diab*'), [1, 2])
+        self.assertEqual(self.ids('jose*'), [1, 3])
+        # Sem o * a palavra precisa ser exata
+        self.assertEqual(self.ids('diabete'), [2])
+
+    def test_frase_exata(self):
+        self.assertEqual(self.ids('"pressão arterial"'), [4])
+        self.assertEqual(self.ids('arterial pressão'), [4])
+        self.assertEqual(self.ids('"arterial pressão"'), [])
+
+    def test_todas_as_palavras_precisam_aparecer(self):
+        self.assertEqual(self.ids('centro'), [1, 3, 4])
+        self.assertEqual(self.ids('centro asma'), [3])
+
+    def test_sintaxe_do_fts_no_texto_e_tratada_como_palavra(self):
+        # OR e NOT seriam operadores; aqui são palavras como as outras
+        self.assertEqual(self.ids('ana OR silva'), [4])
+        self.assertEqual(self.ids('ana OR maria'), [])
+        self.assertEqual(self.ids('não NOT'), [])
+        for texto in ('asma;', '(asma)', '-asma', 'as"ma', '^asma', '{asma}', 'asma +'):
+            with self.subTest(texto=texto):
+                self.assertEqual(self.ids(texto), [3])
+        # Filtro de coluna e NEAR viram frases ("nome asma", "near asma"), sem erro de sintaxe
+        self.assertEqual(self.ids('nome:asma'), [])
+        self.assertEqual(self.ids('NEAR(asma rinite)'), [])
+        self.assertEqual(montar_consulta_fts('diab* "a b" x"y'), '"diab"* "a b" "xy"')
+
+    def test_texto_sem_termos(self):
+        for texto in ('', '   ', '*', '""', '" "', '** "'):
+            with self.subTest(texto=texto), self.assertRaises(ValueError):
+                montar_consulta_fts(texto)
+
+    def test_campos(self):
+        self.assertEqual(self.ids('recife'), [2])
+        self.assertEqual(self.ids('recife', campos=['nome', 'historico_doencas']), [])
+        self.assertEqual(self.ids('arterial', campos=['historico_doencas']), [2, 4])
+        with self.assertRaises(ValueError):
+            montar_consulta_fts('asma', ['cpf'])
+
+    def test_relevancia_e_paginacao(self):
+        # O termo no nome pesa mais que no endereço
+        repositorio.inserir(self.cursor, dict(pacientes(1, inicio=50)[0], nome='Pedro Recife',
+                                              endereco='Rua A, 1 - Centro, Natal', historico_doencas=''))
+        self.conn.commit()
+        headers, linhas, ha_proxima = buscar_pacientes(self.cursor, 'recife', tamanho_pagina=1)
+        self.assertEqual(headers, ['id', 'nome', 'cpf', 'endereco', 'historico_doencas', 'relevancia'])
+        self.assertEqual([linha[0] for linha in linhas], [5])
+        self.assertTrue(ha_proxima)
+        _, linhas, ha_proxima = buscar_pacientes(self.cursor, 'recife', pagina=1, tamanho_pagina=1)
+        self.assertEqual([linha[0] for linha in linhas], [2])
+        self.assertFalse(ha_proxima)
+
+    def test_indice_acompanha_alteracoes_e_exclusoes(self):
+        repositorio.atualizar_campos(self.cursor, 3, {'historico_doencas': 'bronquite', 'nome': 'Joaquim Pereira'})
+        self.conn.commit()
+        self.assertEqual(self.ids('asma'), [])
+        self.assertEqual(self.ids('bronquite'), [3])
+        self.assertEqual(self.ids('jose*'), [1])
+
+        # Alterar só colunas fora do índice não mexe na busca
+        repositorio.atualizar_campos(self.cursor, 3, {'telefone': '81999990000'})
+        self.assertEqual(self.ids('joaquim'), [3])
+
+        repositorio.remover(self.cursor, 1)
+        self.conn.commit()
+        self.assertEqual(self.ids('diab*'), [2])
+        self.assertEqual(self.ids('jose'), [])
+        self.cursor.execute("INSERT INTO cadastro_fts (cadastro_fts) VALUES ('integrity-check')")
+
+
+if __name__ == '__main__':
+    unittest.main()
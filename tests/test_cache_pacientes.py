@@ -0,0 +1,90 @@
+import sqlite3
+import unittest
+
+import cache_pacientes
+import repositorio
+from apoio import criar_banco, pacientes
+from conexao import abrir_conexao
+
+
+class TestCachePacientes(unittest.TestCase):
+    def setUp(self):
+        cache_pacientes.limpar_cache()
+        self.conn, self.caminho = criar_banco(self, quantidade=5)
+        self.cursor = self.conn.cursor()
+        # Segunda conexão do mesmo processo, como outra thread do servidor
+        self.outra = abrir_conexao(self.caminho)
+        self.addCleanup(self.outra.close)
+
+    def nome(self, cursor, id_cadastro=1):
+        return repositorio.buscar_por_id(cursor, id_cadastro).nome
+
+    def test_leitura_depois_de_alterar(self):
+        original = self.nome(self.outra.cursor())
+        repositorio.atualizar_campos(self.cursor, 1, {'nome': 'Nome Novo'})
+        # Antes do commit a outra conexão ainda vê o nome antigo, mas não o guarda
+        self.assertEqual(self.nome(self.outra.cursor()), original)
+        self.conn.commit()
+        self.assertEqual(self.nome(self.outra.cursor()), 'Nome Novo')
+        self.assertEqual(self.nome(self.cursor), 'Nome Novo')
+
+    def test_rollback_nao_deixa_valor_descartado_no_cache(self):
+        original = self.nome(self.cursor)
+        repositorio.atualizar_campos(self.cursor, 1, {'nome': 'Temporário'})
+        self.assertEqual(self.nome(self.cursor), 'Temporário')
+        self.assertEqual(self.nome(self.outra.cursor()), original)
+        self.conn.rollback()
+        self.assertEqual(self.nome(self.outra.cursor()), original)
+        self.assertEqual(self.nome(self.cursor), original)
+
+    def test_troca_de_cpf(self):
+        antigo = repositorio.buscar_por_id(self.cursor, 1).cpf
+        self.assertEqual(repositorio.buscar_por_cpf(self.cursor, antigo).id, 1)
+        novo = pacientes(1, inicio=100)[0]['cpf']
+        repositorio.atualizar_campos(self.cursor, 1, {'cpf': novo})
+        self.conn.commit()
+        self.assertIsNone(repositorio.buscar_por_cpf(self.cursor, antigo))
+        self.assertEqual(repositorio.buscar_por_cpf(self.cursor, novo).id, 1)
+
+    def test_corrida_entre_leitura_e_invalidacao(self):
+        lido = repositorio.buscar_por_id(self.cursor, 1, usar_cache=False)
+        paciente, geracao = cache_pacientes.obter(1)
+        self.assertIsNone(paciente)
+        # Outra conexão grava entre a leitura no banco e o guardar
+        repositorio.atualizar_campos(self.outra.cursor(), 1, {'nome': 'Gravado Depois'})
+        self.outra.commit()
+        cache_pacientes.guardar(lido, geracao)
+        self.assertIsNone(cache_pacientes.obter(1)[0])
+        self.assertEqual(self.nome(self.cursor), 'Gravado Depois')
+
+    def test_inserir_com_cpf_de_cadastro_excluido_por_outro_processo(self):
+        paciente = repositorio.buscar_por_id(self.cursor, 2)
+        self.assertEqual(repositorio.buscar_por_cpf(self.cursor, paciente.cpf).id, 2)
+        # Conexão comum, sem o repositório: o cache não fica sabendo da exclusão
+        externa = sqlite3.connect(self.caminho)
+        externa.execute("DELETE FROM cadastro WHERE id = 2")
+        externa.commit()
+        externa.close()
+
+        novo_id = repositorio.inserir(self.cursor, paciente._replace(nome='Reinserido'))
+        self.conn.commit()
+        reinserido = repositorio.buscar_por_cpf(self.cursor, paciente.cpf)
+        self.assertEqual((reinserido.id, reinserido.nome), (novo_id, 'Reinserido'))
+
+    def test_inserir_em_lote_invalida_os_cpfs(self):
+        paciente = repositorio.buscar_por_id(self.cursor, 3)
+        repositorio.buscar_por_cpf(self.cursor, paciente.cpf)
+        externa = sqlite3.connect(self.caminho)
+        externa.execute("DELETE FROM cadastro WHERE id = 3")
+        externa.commit()
+        externa.close()
+
+        repositorio.inserir_em_lote(self.cursor, [paciente._replace(nome='Em Lote')] + pacientes(2, inicio=50))
+        self.conn.commit()
+        reinserido = repositorio.buscar_por_cpf(self.cursor, paciente.cpf)
+        self.assertEqual(reinserido.nome, 'Em Lote')
+        self.assertNotEqual(reinserido.id, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+import cli
+from apoio import criar_banco, pacientes
+from repositorio import COLUNAS_CADASTRO
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.conn, self.caminho = criar_banco(self, quantidade=6)
+        self.pasta = os.path.dirname(self.caminho)
+
+    def executar(self, *argumentos, banco=None):
+        """Retorna (código de saída, stdout, stderr)."""
+        with redirect_stdout(io.StringIO()) as saida, redirect_stderr(io.StringIO()) as erros:
+            try:
+                codigo = cli.main(['--banco', banco or self.caminho, *argumentos])
+            except SystemExit as e:
+                codigo = e.code
+        return codigo, saida.getvalue(), erros.getvalue()
+
+    def campos(self, paciente):
+        argumentos = []
+        for coluna in COLUNAS_CADASTRO:
+            if coluna != 'data_registro':
+                argumentos += [f"--{coluna.replace('_', '-')}", str(paciente[coluna])]
+        return argumentos
+
+    def test_sucesso(self):
+        novo = pacientes(1, inicio=100)[0]
+        codigo, saida, _ = self.executar('create', *self.campos(novo))
+        self.assertEqual(codigo, cli.SAIDA_OK)
+        self.assertEqual(json.loads(saida)['cpf'], novo['cpf'])
+
+        codigo, saida, _ = self.executar('list', '--a-partir-do-id', '3', '--limite', '2')
+        self.assertEqual(codigo, cli.SAIDA_OK)
+        self.assertEqual([json.loads(linha)['id'] for linha in saida.splitlines()], [3, 4])
+
+        codigo, saida, _ = self.executar('delete', '--filtro', 'id>5', '--simular')
+        self.assertEqual((codigo, json.loads(saida)), (cli.SAIDA_OK, {'encontrados': 2, 'ids': [6, 7]}))
+        codigo, saida, _ = self.executar('delete', '6', '7')
+        self.assertEqual((codigo, json.loads(saida)), (cli.SAIDA_OK, {'excluidos': [6, 7]}))
+
+        codigo, saida, _ = self.executar('report', 'genero', 'f', '--formato', 'json')
+        self.assertEqual(codigo, cli.SAIDA_OK)
+        femininos = self.conn.execute("SELECT COUNT(*) FROM cadastro WHERE UPPER(genero) = 'F'").fetchone()[0]
+        self.assertEqual(len(json.loads(saida)), femininos)
+
+        exportado = os.path.join(self.pasta, 'cadastro.ndjson')
+        self.assertEqual(self.executar('export', '--formato', 'ndjson', '--saida', exportado)[0], cli.SAIDA_OK)
+        with open(exportado, 'r', encoding='utf-8') as arquivo:
+            self.assertEqual([json.loads(linha)['id'] for linha in arquivo], [1, 2, 3, 4, 5])
+
+    def test_erro(self):
+        codigo, _, erros = self.executar('list', banco=os.path.join(self.pasta, 'inexistente', 'banco.db'))
+        self.assertEqual(codigo, cli.SAIDA_ERRO)
+        self.assertIn("Erro ao conectar", erros)
+
+        # Falha do banco durante a gravação
+        self.conn.execute("CREATE TRIGGER falha_simulada BEFORE DELETE ON cadastro "
+                          "BEGIN SELECT RAISE(ABORT, 'falha simulada'); END")
+        self.conn.commit()
+        codigo, _, erros = self.executar('delete', '1')
+        self.assertEqual(codigo, cli.SAIDA_ERRO)
+        self.assertIn("falha simulada", erros)
+
+    def test_uso_incorreto(self):
+        for argumentos in ([], ['apagar'], ['report', 'idade'], ['list', '--limite', 'dez'],
+                           ['export', '--formato', 'csv']):
+            with self.subTest(argumentos=argumentos):
+                self.assertEqual(self.executar(*argumentos)[0], 2)
+
+    def test_dados_invalidos(self):
+        novo = pacientes(1, inicio=100)[0]
+        codigo, _, erros = self.executar('create', *self.campos(dict(novo, cpf='123', altura='alto')))
+        self.assertEqual(codigo, cli.SAIDA_INVALIDO)
+        self.assertEqual(len([linha for linha in erros.splitlines() if linha.startswith('- ')]), 2)
+
+        for argumentos in (['update', '1', '--telefone', 'abc'],
+                           ['update', '1'],
+                           ['update', '1', '--filtro', 'genero=F', '--nome', 'X'],
+                           ['delete', '--filtro', 'senha=1'],
+                           ['report', 'data', '2024-13-01', '2024-12-31'],
+                           ['report', 'local', '  '],
+                           ['report', 'genero', 'F', '--formato', 'parquet']):
+            with self.subTest(argumentos=argumentos):
+                self.assertEqual(self.executar(*argumentos)[0], cli.SAIDA_INVALIDO)
+
+        # Importação com linhas rejeitadas grava as válidas e sai com 3
+        arquivo = os.path.join(self.pasta, 'importar.jsonl')
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            for paciente in pacientes(2, inicio=200) + [dict(novo, cpf='1')]:
+                saida.write(json.dumps(paciente, ensure_ascii=False) + '\n')
+        codigo, saida, _ = self.executar('import', arquivo)
+        self.assertEqual(codigo, cli.SAIDA_INVALIDO)
+        self.assertEqual((json.loads(saida)['inseridos'], json.loads(saida)['rejeitados']), (2, 1))
+
+    def test_nao_encontrado(self):
+        for argumentos in (['update', '999', '--nome', 'Ninguém'], ['update', '1', '999', '--nome', 'X'],
+                           ['delete', '999']):
+            with self.subTest(argumentos=argumentos):
+                codigo, _, erros = self.executar(*argumentos)
+                self.assertEqual(codigo, cli.SAIDA_NAO_ENCONTRADO)
+                self.assertIn("999", erros)
+        # Nada foi alterado no registro existente
+        self.assertNotEqual(self.conn.execute("SELECT nome FROM cadastro WHERE id = 1").fetchone()[0], 'X')
+
+    def test_conflito_de_cpf(self):
+        existente = self.conn.execute("SELECT cpf FROM cadastro WHERE id = 2").fetchone()[0]
+        novo = pacientes(1, inicio=100)[0]
+        self.assertEqual(self.executar('create', *self.campos(dict(novo, cpf=existente)))[0], cli.SAIDA_CONFLITO)
+        self.assertEqual(self.executar('update', '1', '--cpf', existente)[0], cli.SAIDA_CONFLITO)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ia_async import gerar_sugestoes_em_lote
+
+
+def criar_paciente(id_cadastro, nome):
+    return (id_cadastro, nome, '52998224725', '1980-01-01', 'F', 'Rua A, 1 - Centro, Recife',
+            '81999998888', '12/8', 1.65, 60.0, 'ocasionalmente', 'sim', 'não', '', '2024-01-01 10:00:00')
+
+
+def resposta_ok(conteudo):
+    return 200, {}, json.dumps({"choices": [{"message": {"content": conteudo}}]})
+
+
+class ManipuladorIaFalsa(BaseHTTPRequestHandler):
+    # self.server.responder(pergunta) devolve (status, headers, corpo)
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        pergunta = corpo["messages"][0]["content"]
+        with self.server.trava:
+            self.server.requisicoes.append(pergunta)
+        status, headers, texto = self.server.responder(pergunta)
+        dados = texto.encode('utf-8')
+        self.send_response(status)
+        for nome, valor in headers.items():
+            self.send_header(nome, valor)
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSolicitarSugestao(unittest.TestCase):
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), ManipuladorIaFalsa)
+        self.servidor.trava = threading.Lock()
+        self.servidor.requisicoes = []
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.link = f"http://127.0.0.1:{self.servidor.server_address[1]}/v1/chat/completions"
+
+    def tearDown(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def responder_em_sequencia(self, *respostas):
+        fila = list(respostas)
+        self.servidor.responder = lambda pergunta: fila.pop(0)
+
+    def gerar(self, registros, **opcoes):
+        opcoes.setdefault('espera_base', 0.01)
+        return gerar_sugestoes_em_lote(registros, 4, link=self.link, usar_cache=False, **opcoes)
+
+    def test_resposta_200(self):
+        self.responder_em_sequencia(resposta_ok("Beba água."))
+        self.assertEqual(self.gerar([criar_paciente(1, "Ana")]), ["Beba água."])
+        self.assertIn("Ana", self.servidor.requisicoes[0])
+
+    def test_429_respeita_retry_after(self):
+        self.responder_em_sequencia((429, {'Retry-After': '0.3'}, ''), resposta_ok("Durma bem."))
+        inicio = time.perf_counter()
+        # Sem o Retry-After, espera_base=0 faria a nova tentativa sair na hora
+        sugestoes = self.gerar([criar_paciente(1, "Ana")], espera_base=0)
+        self.assertEqual(sugestoes, ["Durma bem."])
+        self.assertGreaterEqual(time.perf_counter() - inicio, 0.3)
+        self.assertEqual(len(self.servidor.requisicoes), 2)
+
+    def test_500_repete_ate_conseguir(self):
+        self.responder_em_sequencia((500, {}, 'erro'), (503, {}, 'erro'), resposta_ok("Caminhe."))
+        self.assertEqual(self.gerar([criar_paciente(1, "Ana")]), ["Caminhe."])
+        self.assertEqual(len(self.servidor.requisicoes), 3)
+
+    def test_500_esgota_tentativas(self):
+        self.servidor.responder = lambda pergunta: (500, {}, 'erro')
+        self.assertEqual(self.gerar([criar_paciente(1, "Ana")], tentativas=2), [None])
+        self.assertEqual(len(self.servidor.requisicoes), 2)
+
+    def test_corpo_malformado_nao_derruba_o_lote(self):
+        def responder(pergunta):
+            if "Bruno" in pergunta:
+                return 200, {'Content-Type': 'application/json'}, '<html>não é JSON</html>'
+            if "Carla" in pergunta:
+                return 200, {}, json.dumps({"choices": []})
+            return resposta_ok("Ok.")
+        self.servidor.responder = responder
+
+        registros = [criar_paciente(1, "Ana"), criar_paciente(2, "Bruno"), criar_paciente(3, "Carla")]
+        self.assertEqual(self.gerar(registros), ["Ok.", None, None])
+        # Resposta malformada não é repetida
+        self.assertEqual(len(self.servidor.requisicoes), 3)
+
+    def test_url_invalida_nao_derruba_o_lote(self):
+        self.assertEqual(gerar_sugestoes_em_lote([criar_paciente(1, "Ana")], 1, link="http://",
+                                                 usar_cache=False), [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import csv
+import json
+import os
+import sqlite3
+import unittest
+from contextlib import closing
+from unittest import mock
+
+import importacao
+from apoio import criar_banco, pacientes
+from repositorio import COLUNAS_CADASTRO
+
+
+class TestImportacao(unittest.TestCase):
+    def setUp(self):
+        self.conn, self.caminho_banco = criar_banco(self)
+        self.pasta = os.path.dirname(self.caminho_banco)
+
+    def gravar_csv(self, linhas, nome='pacientes.csv'):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, 'w', encoding='utf-8', newline='') as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=COLUNAS_CADASTRO)
+            escritor.writeheader()
+            escritor.writerows(linhas)
+        return caminho
+
+    def gravar_jsonl(self, linhas, nome='pacientes.jsonl'):
+        caminho = os.path.join(self.pasta, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            for linha in linhas:
+                arquivo.write((linha if isinstance(linha, str) else json.dumps(linha, ensure_ascii=False)) + '\n')
+        return caminho
+
+    def rejeicoes(self, resumo):
+        with open(resumo['arquivo_rejeitados'], 'r', encoding='utf-8') as arquivo:
+            return [json.loads(linha) for linha in arquivo]
+
+    def cpfs_gravados(self):
+        return {cpf for (cpf,) in self.conn.execute("SELECT cpf FROM cadastro")}
+
+    def test_linha_invalida_vai_para_o_arquivo_de_rejeitados(self):
+        linhas = pacientes(4)
+        linhas[1] = dict(linhas[1], cpf='12345678900', pressao_arterial='abc')
+        resumo = importacao.importar_pacientes(self.conn, self.gravar_csv(linhas))
+
+        self.assertEqual((resumo['lidos'], resumo['inseridos'], resumo['rejeitados']), (4, 3, 1))
+        self.assertEqual(resumo['arquivo_rejeitados'], os.path.join(self.pasta, 'pacientes_rejeitados.jsonl'))
+        [rejeitada] = self.rejeicoes(resumo)
+        # Linha 1 é o cabeçalho
+        self.assertEqual(rejeitada['linha'], 3)
+        self.assertEqual(rejeitada['motivos'], ["cpf inválido", "pressao_arterial inválida"])
+        self.assertEqual(rejeitada['dados']['nome'], linhas[1]['nome'])
+        self.assertEqual(self.cpfs_gravados(), {linhas[i]['cpf'] for i in (0, 2, 3)})
+
+    def test_jsonl_com_linhas_malformadas(self):
+        linhas = pacientes(2)
+        caminho = self.gravar_jsonl([linhas[0], '{"nome": ', '[1, 2]', linhas[1]])
+        rejeitados = os.path.join(self.pasta, 'rejeitados.jsonl')
+        resumo = importacao.importar_pacientes(self.conn, caminho, rejeitados)
+
+        self.assertEqual((resumo['inseridos'], resumo['rejeitados']), (2, 2))
+        motivos = {rejeitada['linha']: rejeitada['motivos'][0] for rejeitada in self.rejeicoes(resumo)}
+        self.assertTrue(motivos[2].startswith("JSON inválido"))
+        self.assertEqual(motivos[3], "a linha não é um objeto JSON")
+
+    def test_cpf_repetido_no_banco_e_no_arquivo(self):
+        linhas = pacientes(3)
+        importacao.importar_pacientes(self.conn, self.gravar_csv(linhas[:1], 'existente.csv'))
+
+        arquivo = [linhas[0], linhas[1], dict(linhas[1], nome='Segunda Ocorrência'), linhas[2]]
+        resumo = importacao.importar_pacientes(self.conn, self.gravar_csv(arquivo))
+
+        self.assertEqual((resumo['inseridos'], resumo['rejeitados']), (2, 2))
+        self.assertEqual([(rejeitada['linha'], rejeitada['motivos']) for rejeitada in self.rejeicoes(resumo)],
+                         [(2, ["cpf já cadastrado"]), (4, ["cpf já cadastrado"])])
+        gravados = self.conn.execute("SELECT nome FROM cadastro WHERE cpf = ?", (linhas[1]['cpf'],)).fetchall()
+        self.assertEqual(gravados, [(linhas[1]['nome'],)])
+
+    def test_cpf_gravado_por_outro_terminal_durante_o_lote(self):
+        linhas = pacientes(3)
+        outro = sqlite3.connect(self.caminho_banco)
+        colunas = ', '.join(COLUNAS_CADASTRO)
+        outro.execute(f"INSERT INTO cadastro ({colunas}) VALUES ({', '.join('?' * len(COLUNAS_CADASTRO))})",
+                      [linhas[1][coluna] for coluna in COLUNAS_CADASTRO])
+        outro.commit()
+        outro.close()
+
+        # A verificação não vê o CPF, como se ele tivesse sido gravado logo depois dela
+        with mock.patch('importacao.cpfs_existentes', return_value=set()):
+            resumo = importacao.importar_pacientes(self.conn, self.gravar_csv(linhas))
+
+        self.assertEqual((resumo['inseridos'], resumo['rejeitados']), (2, 1))
+        self.assertEqual([rejeitada['linha'] for rejeitada in self.rejeicoes(resumo)], [3])
+        self.assertEqual(self.cpfs_gravados(), {linha['cpf'] for linha in linhas})
+
+    def test_cada_lote_e_gravado_em_sua_transacao(self):
+        linhas = pacientes(5)
+        vistos = []
+        inserir_em_lote = importacao.inserir_em_lote
+
+        def observar_lote(cursor, lote):
+            # Outra conexão só enxerga o que os lotes anteriores já gravaram com commit
+            with closing(sqlite3.connect(self.caminho_banco)) as outra:
+                vistos.append((len(lote), outra.execute("SELECT COUNT(*) FROM cadastro").fetchone()[0]))
+            return inserir_em_lote(cursor, lote)
+
+        with mock.patch('importacao.inserir_em_lote', side_effect=observar_lote):
+            resumo = importacao.importar_pacientes(self.conn, self.gravar_csv(linhas), tamanho_lote=2)
+
+        self.assertEqual(resumo['inseridos'], 5)
+        self.assertEqual(vistos, [(2, 0), (2, 2), (1, 4)])
+
+    def test_lote_invalido_e_formato_desconhecido(self):
+        with self.assertRaises(ValueError):
+            importacao.importar_pacientes(self.conn, self.gravar_csv(pacientes(1)), tamanho_lote=0)
+        with self.assertRaises(ValueError):
+            importacao.importar_pacientes(self.conn, os.path.join(self.pasta, 'pacientes.xlsx'),
+                                          os.path.join(self.pasta, 'rejeitados.jsonl'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from unittest import mock
+
+import migracoes
+from apoio import criar_esquema_base, pacientes
+from conexao import abrir_conexao
+from locais import verificar_locais
+from repositorio import COLUNAS_CADASTRO, SQL_INSERIR_CADASTRO
+from resumos import verificar_resumo
+
+ULTIMA_VERSAO = max(migracao['versao'] for migracao in migracoes.MIGRACOES)
+
+
+def esquema(cursor):
+    cursor.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name")
+    return cursor.fetchall()
+
+
+class TestMigracoes(unittest.TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.caminho = os.path.join(pasta.name, 'atendimento_medico.db')
+        self.conn = abrir_conexao(self.caminho)
+        self.addCleanup(self.conn.close)
+        self.cursor = self.conn.cursor()
+
+    def criar_banco_base(self, quantidade=30):
+        # Banco como o setup.sql original cria, com cadastros gravados antes das migrações
+        criar_esquema_base(self.cursor)
+        self.cursor.executemany(SQL_INSERIR_CADASTRO,
+                                [[paciente[coluna] for coluna in COLUNAS_CADASTRO] for paciente in pacientes(quantidade)])
+        self.conn.commit()
+
+    def test_banco_base_ate_a_ultima_versao(self):
+        self.criar_banco_base()
+        relatorio = migracoes.aplicar_migracoes(self.cursor, tamanho_lote=7)
+
+        self.assertEqual([etapa['versao'] for etapa in relatorio], list(range(1, ULTIMA_VERSAO + 1)))
+        self.assertEqual(migracoes.versao_atual(self.cursor), ULTIMA_VERSAO)
+        for tabela in ('fila_ia', 'sugestoes_ia', 'resumo_diario', 'cadastro_fts', 'locais_cadastro'):
+            self.assertTrue(migracoes.tabela_existe(self.cursor, tabela), tabela)
+        # As tabelas derivadas foram preenchidas com os cadastros que já existiam
+        self.assertEqual(verificar_resumo(self.cursor), [])
+        self.assertEqual(verificar_locais(self.cursor), [])
+        # integrity-check falha se o índice de texto não corresponder ao conteúdo de cadastro
+        self.cursor.execute("INSERT INTO cadastro_fts (cadastro_fts) VALUES ('integrity-check')")
+        self.conn.commit()
+        self.cursor.execute("SELECT nome FROM cadastro WHERE id = 30")
+        sobrenome = self.cursor.fetchone()[0].split()[-1]
+        self.cursor.execute("SELECT rowid FROM cadastro_fts WHERE cadastro_fts MATCH ?", (f'nome:"{sobrenome}"',))
+        self.assertIn((30,), self.cursor.fetchall())
+        # Os triggers da versão 5, que dependiam de uma função Python, não ficam no banco
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_locais%'")
+        self.assertEqual(self.cursor.fetchall(), [('trg_locais_cadastro_delete',)])
+
+        # Uma segunda execução não tem nada a fazer, e o banco aceita gravações sem a função Python
+        self.assertEqual(migracoes.aplicar_migracoes(self.cursor), [])
+        with closing(sqlite3.connect(self.caminho)) as comum:
+            comum.execute("UPDATE cadastro SET endereco = 'Centro, Olinda' WHERE id = 1")
+            comum.commit()
+
+    def test_etapa_com_erro_nao_altera_versao_nem_esquema(self):
+        self.criar_banco_base()
+        migracoes.aplicar_migracoes(self.cursor)
+        antes = esquema(self.cursor)
+
+        quebrada = {
+            'versao': ULTIMA_VERSAO + 1,
+            'descricao': "Etapa com erro no meio do script",
+            'tabela': 'cadastro',
+            'script': '''
+                CREATE TABLE tabela_nova (id INTEGER PRIMARY KEY);
+                CREATE INDEX idx_cadastro_nome ON cadastro (nome);
+                INSERT INTO tabela_inexistente VALUES (1);
+            ''',
+        }
+        with mock.patch.object(migracoes, 'MIGRACOES', migracoes.MIGRACOES + [quebrada]):
+            with self.assertRaises(sqlite3.OperationalError):
+                migracoes.aplicar_migracoes(self.cursor)
+
+        self.assertEqual(migracoes.versao_atual(self.cursor), ULTIMA_VERSAO)
+        self.assertEqual(esquema(self.cursor), antes)
+
+    def test_preenchimento_interrompido_e_refeito_na_proxima_execucao(self):
+        self.criar_banco_base()
+        migracoes.aplicar_migracoes(self.cursor)
+        falhar = True
+
+        def preencher(cursor, inicio, fim):
+            nonlocal falhar
+            if falhar and inicio > 20:
+                raise sqlite3.OperationalError("disco cheio")
+            cursor.execute("INSERT OR IGNORE INTO marcados SELECT id FROM cadastro WHERE id BETWEEN ? AND ?",
+                           (inicio, fim))
+
+        nova = {
+            'versao': ULTIMA_VERSAO + 1,
+            'descricao': "Preenchimento em lotes",
+            'tabela': 'cadastro',
+            'script': "CREATE TABLE IF NOT EXISTS marcados (id INTEGER PRIMARY KEY);",
+            'preenchimento': preencher,
+        }
+        with mock.patch.object(migracoes, 'MIGRACOES', migracoes.MIGRACOES + [nova]):
+            with self.assertRaises(sqlite3.OperationalError):
+                migracoes.aplicar_migracoes(self.cursor, tamanho_lote=10)
+            self.assertEqual(migracoes.versao_atual(self.cursor), ULTIMA_VERSAO)
+            # Os lotes concluídos ficam gravados; a próxima execução refaz tudo sem duplicar
+            self.cursor.execute("SELECT COUNT(*) FROM marcados")
+            self.assertEqual(self.cursor.fetchone()[0], 20)
+
+            falhar = False
+            migracoes.aplicar_migracoes(self.cursor, tamanho_lote=10)
+
+        self.assertEqual(migracoes.versao_atual(self.cursor), ULTIMA_VERSAO + 1)
+        self.cursor.execute("SELECT COUNT(*) FROM marcados")
+        self.assertEqual(self.cursor.fetchone()[0], 30)
+
+    def test_simular_nao_grava_nada(self):
+        self.criar_banco_base()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        antes = esquema(self.cursor)
+        with open(self.caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+
+        relatorio = migracoes.aplicar_migracoes(self.cursor, simular=True)
+
+        self.assertEqual([etapa['versao'] for etapa in relatorio], list(range(1, ULTIMA_VERSAO + 1)))
+        self.assertEqual(relatorio[0]['linhas_estimadas'], 30)
+        self.assertEqual(migracoes.versao_atual(self.cursor), 0)
+        self.assertEqual(esquema(self.cursor), antes)
+        self.assertFalse(self.conn.in_transaction)
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        with open(self.caminho, 'rb') as arquivo:
+            self.assertEqual(arquivo.read(), conteudo)
+
+    def test_simular_em_banco_vazio_nao_cria_o_esquema_base(self):
+        relatorio = migracoes.aplicar_migracoes(self.cursor, simular=True)
+        self.assertEqual(relatorio[0]['versao'], 0)
+        self.assertEqual(esquema(self.cursor), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
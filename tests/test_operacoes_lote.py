@@ -0,0 +1,106 @@
+import io
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+import cli
+import main
+import repositorio
+from apoio import criar_banco, pacientes
+
+
+class TestInterpretarFiltro(unittest.TestCase):
+    def test_condicoes_viram_parametros(self):
+        clausula, parametros = repositorio.interpretar_filtro('genero=F; data_registro<2020-01-01')
+        self.assertEqual(clausula, "genero = ? AND data_registro < ?")
+        self.assertEqual(parametros, ['F', '2020-01-01'])
+
+    def test_til_procura_trecho_com_like(self):
+        clausula, parametros = repositorio.interpretar_filtro('historico_doencas ~ asma')
+        self.assertEqual(clausula, "historico_doencas LIKE ?")
+        self.assertEqual(parametros, ['%asma%'])
+
+    def test_local_normalizado(self):
+        clausula, parametros = repositorio.interpretar_filtro('local=São Paulo')
+        self.assertIn("locais_cadastro", clausula)
+        self.assertEqual(parametros, ['sao paulo'])
+
+    def test_local_so_aceita_igual(self):
+        with self.assertRaises(ValueError):
+            repositorio.interpretar_filtro('local~Paulo')
+
+    def test_somente_campos_conhecidos(self):
+        for filtro in ('senha=1', 'nome=A; 1=1', 'id=1 OR 1=1--; x', 'nome', '', ' ; '):
+            with self.subTest(filtro=filtro), self.assertRaises(ValueError):
+                repositorio.interpretar_filtro(filtro)
+
+    def test_valor_nunca_entra_no_sql(self):
+        clausula, parametros = repositorio.interpretar_filtro("nome=x' OR '1'='1")
+        self.assertEqual(clausula, "nome = ?")
+        self.assertEqual(parametros, ["x' OR '1'='1"])
+
+
+class TestOperacoesEmLote(unittest.TestCase):
+    def setUp(self):
+        self.conn, self.caminho = criar_banco(self, quantidade=20)
+        self.cursor = self.conn.cursor()
+        self.femininos = repositorio.buscar_ids(self.cursor, 'genero=F')
+        self.assertGreater(len(self.femininos), 2)
+
+    def nomes(self, ids):
+        registros = repositorio.buscar_por_ids(self.cursor, ids)
+        return {id_cadastro: paciente.nome for id_cadastro, paciente in registros.items()}
+
+    def cli(self, *argumentos):
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            return cli.main(['--banco', self.caminho, *argumentos])
+
+    def menu(self, funcao, *respostas):
+        with mock.patch('builtins.input', side_effect=respostas), redirect_stdout(io.StringIO()) as saida:
+            funcao(self.conn, self.cursor)
+        return saida.getvalue()
+
+    def test_buscar_ids_por_local(self):
+        esperados = [paciente.id for paciente in repositorio.buscar_por_ids(self.cursor, range(1, 21)).values()
+                     if paciente.endereco.endswith(', São Paulo')]
+        self.assertTrue(esperados)
+        self.assertEqual(repositorio.buscar_ids(self.cursor, 'local=sao paulo'), esperados)
+
+    def test_falha_no_meio_do_lote_nao_altera_nenhum_registro(self):
+        antes = self.nomes(self.femininos)
+        # Simula uma falha de gravação no último registro selecionado
+        self.conn.execute(f'''
+            CREATE TRIGGER falha_simulada BEFORE UPDATE OF nome ON cadastro WHEN NEW.id = {self.femininos[-1]}
+            BEGIN SELECT RAISE(ABORT, 'falha simulada'); END''')
+        self.conn.commit()
+
+        self.assertEqual(self.cli('update', '--filtro', 'genero=F', '--nome', 'Nome em Lote'), cli.SAIDA_ERRO)
+        self.assertEqual(self.nomes(self.femininos), antes)
+
+        saida = self.menu(main.atualizar_em_lote, 'genero=F', 'nome=Nome em Lote', '', 'S')
+        self.assertIn("falha simulada", saida)
+        self.assertEqual(self.nomes(self.femininos), antes)
+
+    def test_lote_sem_falha_altera_todos(self):
+        saida = self.menu(main.atualizar_em_lote, 'genero=F', 'nome=Nome em Lote', '', 'S')
+        self.assertIn(f"{len(self.femininos)} registro(s) atualizado(s)", saida)
+        self.assertEqual(set(self.nomes(self.femininos).values()), {'Nome em Lote'})
+
+    def test_cpf_nao_pode_ser_trocado_em_varios_registros(self):
+        cpf_novo = pacientes(1, inicio=500)[0]['cpf']
+        antes = repositorio.buscar_por_ids(self.cursor, [1, 2])
+
+        self.assertEqual(self.cli('update', '1', '2', '--cpf', cpf_novo), cli.SAIDA_INVALIDO)
+        self.assertEqual(self.cli('update', '--filtro', 'genero=F', '--cpf', cpf_novo), cli.SAIDA_INVALIDO)
+
+        # No menu o campo cpf nem é aceito com mais de um registro selecionado
+        saida = self.menu(main.atualizar_em_lote, '1, 2', f'cpf={cpf_novo}', '')
+        self.assertIn("Nenhuma alteração informada", saida)
+        self.assertEqual(repositorio.buscar_por_ids(self.cursor, [1, 2]), antes)
+
+        self.assertEqual(self.cli('update', '1', '--cpf', cpf_novo), cli.SAIDA_OK)
+        self.assertEqual(repositorio.buscar_por_id(self.cursor, 1, usar_cache=False).cpf, cpf_novo)
+
+
+if __name__ == '__main__':
+    unittest.main()
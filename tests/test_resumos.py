@@ -0,0 +1,87 @@
+import sqlite3
+import unittest
+from contextlib import closing
+
+import repositorio
+from apoio import criar_banco, pacientes
+from locais import reconstruir_locais, verificar_locais
+from resumos import reconstruir_resumo, verificar_resumo
+
+SQL_RESUMO = "SELECT * FROM resumo_diario ORDER BY dia, genero, pressao_arterial, frequencia_atividades_sem"
+
+
+class TestResumoDiario(unittest.TestCase):
+    def setUp(self):
+        self.conn, self.caminho = criar_banco(self, quantidade=40)
+        self.cursor = self.conn.cursor()
+
+    def resumo(self):
+        self.cursor.execute(SQL_RESUMO)
+        return [linha[:5] + (round(linha[5], 6),) + linha[6:] for linha in self.cursor.fetchall()]
+
+    def assertResumoConsistente(self):
+        self.assertEqual(verificar_resumo(self.cursor), [])
+        mantido = self.resumo()
+        reconstruir_resumo(self.cursor)
+        self.assertEqual(self.resumo(), mantido)
+
+    def test_inclusoes_alteracoes_e_exclusoes_pelo_repositorio(self):
+        repositorio.inserir(self.cursor, pacientes(1, inicio=100)[0])
+        repositorio.inserir_em_lote(self.cursor, pacientes(5, inicio=101))
+        repositorio.atualizar_campos_em_lote(self.cursor, [
+            (1, {'genero': 'F' if repositorio.buscar_por_id(self.cursor, 1).genero == 'M' else 'M'}),
+            (2, {'altura': 1.91, 'peso': 88.4}),
+            (3, {'pressao_arterial': '14/9', 'frequencia_atividades_sem': 'diariamente'}),
+            # IMC deixa de existir e depois volta
+            (4, {'altura': 0}),
+        ])
+        repositorio.atualizar_campos(self.cursor, 4, {'altura': 1.70})
+        repositorio.atualizar(self.cursor, 5, repositorio.buscar_por_id(self.cursor, 6)._replace(
+            cpf=pacientes(1, inicio=200)[0]['cpf']))
+        repositorio.remover(self.cursor, 7)
+        repositorio.remover_em_lote(self.cursor, [8, 9, 41])
+        self.conn.commit()
+
+        self.assertResumoConsistente()
+
+    def test_troca_de_dia_e_gravacoes_diretas_no_banco(self):
+        # data_registro não é atualizável pelo repositório; os triggers valem para qualquer gravação
+        with closing(sqlite3.connect(self.caminho)) as externa:
+            externa.execute("UPDATE cadastro SET data_registro = '2019-01-01 08:00:00' WHERE id IN (10, 11)")
+            externa.execute("UPDATE cadastro SET data_registro = datetime(data_registro, '+1 day') WHERE id = 12")
+            externa.execute("UPDATE cadastro SET genero = lower(genero) WHERE id = 13")
+            externa.execute("UPDATE cadastro SET pressao_arterial = NULL, peso = NULL WHERE id = 14")
+            externa.execute("DELETE FROM cadastro WHERE id IN (15, 16)")
+            sem_medidas = dict(pacientes(1, inicio=300)[0], genero='F', data_registro='2019-01-01 09:30:00',
+                               pressao_arterial=None, frequencia_atividades_sem=None, altura=None)
+            externa.execute(repositorio.SQL_INSERIR_CADASTRO,
+                            [sem_medidas[coluna] for coluna in repositorio.COLUNAS_CADASTRO])
+            externa.commit()
+
+        self.assertResumoConsistente()
+        self.cursor.execute("SELECT total FROM resumo_diario WHERE dia = '2019-01-01' AND genero = 'F' "
+                            "AND pressao_arterial = '' AND frequencia_atividades_sem = ''")
+        self.assertEqual(self.cursor.fetchone(), (1,))
+
+        # Já os locais só são mantidos pelo repositório: a verificação aponta os cadastros e a reconstrução corrige
+        with closing(sqlite3.connect(self.caminho)) as externa:
+            externa.execute("UPDATE cadastro SET endereco = 'Rua A, 10 - Centro, Olinda' WHERE id = 17")
+            externa.commit()
+        self.assertEqual(verificar_locais(self.cursor), [17, 41])
+        reconstruir_locais(self.cursor)
+        self.assertEqual(verificar_locais(self.cursor), [])
+        self.assertIn(17, repositorio.buscar_ids(self.cursor, 'local=olinda'))
+
+    def test_divergencia_detectada_e_corrigida(self):
+        primeira, ultima = self.resumo()[0], self.resumo()[-1]
+        self.conn.execute("UPDATE resumo_diario SET total = total + 1 WHERE dia = ? AND genero = ?", primeira[:2])
+        self.conn.execute("DELETE FROM resumo_diario WHERE dia = ? AND genero = ?", ultima[:2])
+        self.conn.commit()
+        divergentes = {divergencia[:2] for divergencia in verificar_resumo(self.cursor)}
+        self.assertEqual(divergentes, {primeira[:2], ultima[:2]})
+        reconstruir_resumo(self.cursor)
+        self.assertEqual(verificar_resumo(self.cursor), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
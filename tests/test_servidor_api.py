@@ -0,0 +1,122 @@
+import asyncio
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import servidor_api
+from apoio import criar_banco, pacientes
+from conexao import conexao_da_thread, fechar_conexoes_da_thread
+
+
+class TestServidorApi(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.conn, caminho = criar_banco(self, quantidade=12)
+        # As operações usam conexao_da_thread() com o caminho padrão; aqui, o banco temporário
+        self.enterContext(mock.patch('servidor_api.conexao_da_thread', lambda: conexao_da_thread(caminho)))
+        # Blocos pequenos: o relatório de teste sai em várias partes
+        self.enterContext(mock.patch('servidor_api.TAMANHO_BLOCO_STREAM', 2))
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        self.addCleanup(lambda: executor.submit(fechar_conexoes_da_thread).result())
+        self.servidor = await asyncio.start_server(servidor_api.criar_atendimento(executor), '127.0.0.1', 0,
+                                                   limit=servidor_api.TAMANHO_MAXIMO_CABECALHO)
+        porta = self.servidor.sockets[0].getsockname()[1]
+        self.leitor, self.escritor = await asyncio.open_connection('127.0.0.1', porta)
+
+    async def asyncTearDown(self):
+        self.escritor.close()
+        await self.escritor.wait_closed()
+        self.servidor.close()
+        await self.servidor.wait_closed()
+
+    async def requisitar(self, metodo, alvo, corpo=None):
+        """Envia a requisição na mesma conexão (keep-alive) e retorna (status, cabeçalhos, corpo, blocos)."""
+        dados = b'' if corpo is None else (corpo if isinstance(corpo, bytes) else json.dumps(corpo).encode('utf-8'))
+        self.escritor.write(f"{metodo} {alvo} HTTP/1.1\r\nHost: teste\r\nContent-Length: {len(dados)}\r\n\r\n"
+                            .encode('latin-1') + dados)
+        await self.escritor.drain()
+
+        linhas = (await self.leitor.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(linhas[0].split(' ')[1])
+        cabecalhos = dict(linha.split(': ', 1) for linha in linhas[1:] if linha)
+        blocos = []
+        if cabecalhos.get('Transfer-Encoding') == 'chunked':
+            while True:
+                tamanho = int((await self.leitor.readline()).strip(), 16)
+                bloco = await self.leitor.readexactly(tamanho + 2)
+                if not tamanho:
+                    break
+                blocos.append(bloco[:-2])
+            resposta = b''.join(blocos)
+        else:
+            resposta = await self.leitor.readexactly(int(cabecalhos['Content-Length']))
+        return status, cabecalhos, json.loads(resposta) if resposta else None, blocos
+
+    async def test_crud_e_codigos_de_erro(self):
+        novo = pacientes(1, inicio=100)[0]
+        status, _, criado, _ = await self.requisitar('POST', '/pacientes', novo)
+        self.assertEqual(status, 201)
+        self.assertEqual((criado['id'], criado['cpf']), (13, novo['cpf']))
+
+        casos = [
+            ('GET', '/pacientes/abc', None, 400),
+            ('POST', '/pacientes', b'{"nome": ', 400),
+            ('POST', '/pacientes', [novo], 400),
+            ('GET', '/pacientes?limite=0', None, 400),
+            ('GET', '/relatorios/genero/X', None, 400),
+            ('GET', '/pacientes/999', None, 404),
+            ('PATCH', '/pacientes/999', {'nome': 'Ninguém'}, 404),
+            ('GET', '/inexistente', None, 404),
+            ('POST', '/pacientes/1', novo, 405),
+            ('DELETE', '/pacientes', None, 405),
+            ('POST', '/pacientes', novo, 409),
+            ('PATCH', '/pacientes/1', {'cpf': novo['cpf']}, 409),
+            ('POST', '/pacientes', dict(novo, cpf='123', pressao_arterial='abc'), 422),
+            ('PATCH', '/pacientes/1', {'altura': 'alto'}, 422),
+        ]
+        for metodo, alvo, corpo, esperado in casos:
+            with self.subTest(metodo=metodo, alvo=alvo):
+                status, cabecalhos, resposta, _ = await self.requisitar(metodo, alvo, corpo)
+                self.assertEqual(status, esperado)
+                self.assertIn('erro', resposta)
+                if esperado == 405:
+                    self.assertTrue(resposta['erro'].startswith("Use "))
+                if esperado == 422:
+                    self.assertTrue(resposta['detalhes'])
+
+        status, _, alterado, _ = await self.requisitar('PATCH', '/pacientes/13', {'nome': 'Nome Alterado'})
+        self.assertEqual((status, alterado['nome'], alterado['cpf']), (200, 'Nome Alterado', novo['cpf']))
+        status, _, resposta, _ = await self.requisitar('DELETE', '/pacientes/13')
+        self.assertEqual((status, resposta), (204, None))
+        status, _, _, _ = await self.requisitar('GET', '/pacientes/13')
+        self.assertEqual(status, 404)
+
+    async def test_listagem_paginada(self):
+        status, _, pagina, _ = await self.requisitar('GET', '/pacientes?limite=5')
+        self.assertEqual(status, 200)
+        self.assertEqual([registro['id'] for registro in pagina['registros']], [1, 2, 3, 4, 5])
+        _, _, pagina, _ = await self.requisitar('GET', f"/pacientes?limite=10&a_partir_do_id={pagina['proximo_id']}")
+        self.assertEqual([registro['id'] for registro in pagina['registros']], list(range(6, 13)))
+        self.assertIsNone(pagina['proximo_id'])
+
+    async def test_relatorio_enviado_em_blocos(self):
+        esperados = self.conn.execute("SELECT COUNT(*) FROM cadastro WHERE UPPER(genero) = 'F'").fetchone()[0]
+        self.assertGreater(esperados, 2)
+
+        status, cabecalhos, registros, blocos = await self.requisitar('GET', '/relatorios/genero/f')
+        self.assertEqual(status, 200)
+        self.assertEqual(cabecalhos['Transfer-Encoding'], 'chunked')
+        self.assertNotIn('Content-Length', cabecalhos)
+        self.assertEqual(len(registros), esperados)
+        # Abertura do array, um bloco a cada 2 registros e o fechamento
+        self.assertEqual(len(blocos), 2 + (esperados + 1) // 2)
+
+        # A conexão segue aberta depois do stream, e um relatório vazio ainda é um array JSON
+        status, _, registros, _ = await self.requisitar('GET', '/relatorios/data?inicio=1900-01-01&fim=1900-01-02')
+        self.assertEqual((status, registros), (200, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
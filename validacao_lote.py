@@ -0,0 +1,93 @@
+import numpy as np
+
+from main import validar_cpf
+
+
+# Pesos dos dois dígitos verificadores do CPF
+PESOS_DIGITO1 = np.arange(10, 1, -1, dtype=np.int32)
+PESOS_DIGITO2 = np.arange(11, 1, -1, dtype=np.int32)
+
+# Quantidade de CPFs processados por vez, para limitar a memória das matrizes auxiliares
+TAMANHO_BLOCO = 1 << 20
+
+CODIGO_ZERO = ord('0')
+
+
+def _para_array(cpfs):
+    """Converte a coluna recebida em um array NumPy de strings ('U' ou 'S')."""
+    if isinstance(cpfs, (bytes, bytearray, memoryview)):
+        # Buffer contíguo no estilo Arrow: registros de largura fixa com 11 bytes
+        buffer = memoryview(cpfs).cast('B')
+        if len(buffer) % 11:
+            raise ValueError("O buffer de CPFs deve conter registros de 11 bytes.")
+        return np.frombuffer(buffer, dtype='S11')
+
+    if hasattr(cpfs, 'to_numpy') and not isinstance(cpfs, np.ndarray):
+        # pyarrow.Array / ChunkedArray e pandas.Series
+        try:
+            cpfs = cpfs.to_numpy(zero_copy_only=False)
+        except TypeError:
+            cpfs = cpfs.to_numpy()
+
+    if isinstance(cpfs, np.ndarray) and cpfs.dtype.kind in 'US':
+        return cpfs.reshape(-1)
+
+    # Listas e arrays de objetos: valores que não são texto nunca são CPFs válidos
+    return np.array([cpf if isinstance(cpf, str) else '' for cpf in cpfs], dtype=str)
+
+
+def _codigos(bloco):
+    """Matriz (n, largura) com o código de cada caractere, além do comprimento de cada CPF."""
+    if bloco.dtype.kind == 'S':
+        largura = bloco.dtype.itemsize
+        codigos = bloco.view(np.uint8).reshape(len(bloco), largura)
+    else:
+        largura = bloco.dtype.itemsize // 4
+        codigos = bloco.view(np.uint32).reshape(len(bloco), largura)
+    return codigos, np.char.str_len(bloco)
+
+
+def _validar_bloco(bloco):
+    codigos, comprimentos = _codigos(bloco)
+    if codigos.shape[1] < 11:
+        return np.zeros(len(bloco), dtype=bool)
+
+    codigos = codigos[:, :11]
+    tamanho_ok = comprimentos == 11
+
+    digitos = codigos.astype(np.int32) - CODIGO_ZERO
+    somente_digitos = np.all((digitos >= 0) & (digitos <= 9), axis=1)
+
+    # Verificar se todos os dígitos são iguais, o que tornaria o CPF inválido
+    todos_iguais = np.all(digitos == digitos[:, :1], axis=1)
+
+    resto = 11 - (digitos[:, :9] @ PESOS_DIGITO1) % 11
+    digito_verificador1 = np.where(resto > 9, 0, resto)
+
+    resto = 11 - (digitos[:, :10] @ PESOS_DIGITO2) % 11
+    digito_verificador2 = np.where(resto > 9, 0, resto)
+
+    mascara = (tamanho_ok & somente_digitos & ~todos_iguais
+               & (digito_verificador1 == digitos[:, 9])
+               & (digito_verificador2 == digitos[:, 10]))
+
+    # Dígitos fora do ASCII (ex.: '١') são aceitos por str.isdigit em validar_cpf;
+    # esses casos raros seguem pelo caminho escalar para manter o mesmo resultado.
+    fora_ascii = np.flatnonzero(tamanho_ok & np.any(codigos > 127, axis=1))
+    for indice in fora_ascii:
+        cpf = bloco[indice]
+        if isinstance(cpf, bytes):
+            cpf = cpf.decode('latin-1')
+        mascara[indice] = validar_cpf(str(cpf))
+
+    return mascara
+
+
+def validar_cpfs_em_lote(cpfs):
+    """Valida uma coluna de CPFs e retorna uma máscara booleana (mesmo critério de validar_cpf)."""
+    array = _para_array(cpfs)
+    mascara = np.empty(len(array), dtype=bool)
+    for inicio in range(0, len(array), TAMANHO_BLOCO):
+        mascara[inicio:inicio + TAMANHO_BLOCO] = _validar_bloco(
+            array[inicio:inicio + TAMANHO_BLOCO])
+    return mascara
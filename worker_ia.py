@@ -0,0 +1,185 @@
+import argparse
+import logging
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import cache_ia
+from ia_async import LIMITE_CONCORRENCIA_PADRAO, gerar_sugestoes_em_lote
+from log_estruturado import medir_operacao
+from main import configurar_logging, conectar_bd, executar_setup
+from repositorio import buscar_por_ids
+
+
+TAMANHO_LOTE_PADRAO = 20
+MAXIMO_TENTATIVAS = 5
+
+# Tempo que um job fica reservado; se o worker cair, outro o retoma depois disso
+DURACAO_RESERVA = timedelta(minutes=10)
+
+# Segundos de espera, por tentativa, antes de um job que falhou ser reservado de novo
+ESPERA_APOS_FALHA = 60
+
+# Segundos entre limpezas das respostas expiradas do cache da IA (cache_ia.py)
+INTERVALO_LIMPEZA_CACHE = 60 * 60
+
+
+def agora_str(deslocamento=timedelta()):
+    return (datetime.now() + deslocamento).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def reservar_jobs(conn, tamanho_lote):
+    """Reserva os próximos jobs livres, incluindo os de um worker que caiu sem confirmá-los."""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # Um job que derrubou o worker MAXIMO_TENTATIVAS vezes (reserva vencida sem
+        # concluir_jobs) não é reservado de novo, para não derrubá-lo outra vez
+        cursor.execute('''
+            UPDATE fila_ia
+            SET status = 'erro', erro = COALESCE(erro, 'tentativas esgotadas sem resposta do worker'),
+                reservado_ate = NULL, atualizado_em = ?
+            WHERE status IN ('pendente', 'processando') AND tentativas >= ?
+              AND (reservado_ate IS NULL OR reservado_ate < ?)
+        ''', (agora_str(), MAXIMO_TENTATIVAS, agora_str()))
+        cursor.execute('''
+            SELECT id, id_cadastro FROM fila_ia
+            WHERE status IN ('pendente', 'processando')
+              AND (reservado_ate IS NULL OR reservado_ate < ?)
+            ORDER BY id
+            LIMIT ?
+        ''', (agora_str(), tamanho_lote))
+        jobs = cursor.fetchall()
+
+        cursor.executemany('''
+            UPDATE fila_ia
+            SET status = 'processando', tentativas = tentativas + 1,
+                reservado_ate = ?, atualizado_em = ?
+            WHERE id = ?
+        ''', [(agora_str(DURACAO_RESERVA), agora_str(), id_job) for id_job, _ in jobs])
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return jobs
+
+
+def concluir_jobs(conn, concluidos, falhas):
+    """Confirma (ack) os jobs processados e grava as respostas ao lado do paciente."""
+    agora = agora_str()
+    with conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO sugestoes_ia (id_cadastro, resposta, gerado_em)
+            SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM cadastro WHERE id = ?)
+        ''', [(id_cadastro, resposta, agora, id_cadastro)
+              for _, id_cadastro, resposta in concluidos if resposta is not None])
+        conn.executemany('''
+            UPDATE fila_ia SET status = 'concluido', erro = NULL, reservado_ate = NULL, atualizado_em = ?
+            WHERE id = ?
+        ''', [(agora, id_job) for id_job, _, _ in concluidos])
+
+        # Falhas voltam para a fila, com espera crescente, até esgotar as tentativas
+        conn.executemany('''
+            UPDATE fila_ia
+            SET status = CASE WHEN tentativas >= ? THEN 'erro' ELSE 'pendente' END,
+                erro = ?, reservado_ate = datetime(?, '+' || (tentativas * ?) || ' seconds'),
+                atualizado_em = ?
+            WHERE id = ?
+        ''', [(MAXIMO_TENTATIVAS, motivo, agora, ESPERA_APOS_FALHA, agora, id_job)
+              for id_job, motivo in falhas])
+
+
+def processar_lote(conn, tamanho_lote=TAMANHO_LOTE_PADRAO, limite_concorrencia=LIMITE_CONCORRENCIA_PADRAO):
+    jobs = reservar_jobs(conn, tamanho_lote)
+    if not jobs:
+        return 0
+
+    cursor = conn.cursor()
+    registros = buscar_por_ids(cursor, {id_cadastro for _, id_cadastro in jobs})
+
+    # Paciente excluído depois de enfileirado: não há mais o que gerar
+    concluidos = [(id_job, id_cadastro, None) for id_job, id_cadastro in jobs
+                  if id_cadastro not in registros]
+    jobs = [(id_job, id_cadastro) for id_job, id_cadastro in jobs if id_cadastro in registros]
+
+    motivo = "sem resposta da IA"
+    try:
+        with medir_operacao('gerar_sugestoes_em_lote') as medicao:
+            sugestoes = gerar_sugestoes_em_lote(
+                [registros[id_cadastro] for _, id_cadastro in jobs], limite_concorrencia)
+            medicao.linhas = len(sugestoes)
+            medicao.detalhes['falhas'] = sugestoes.count(None)
+    except Exception as e:
+        # O lote inteiro conta como falha: os jobs voltam para a fila com espera e tentativas
+        # contadas, em vez de ficarem reservados até a reserva vencer
+        logging.error(f"Erro ao gerar as sugestões do lote: {e}")
+        motivo = f"erro no lote: {type(e).__name__}: {e}"
+        sugestoes = [None] * len(jobs)
+
+    falhas = []
+    for (id_job, id_cadastro), sugestao in zip(jobs, sugestoes):
+        if sugestao is None:
+            falhas.append((id_job, motivo))
+        else:
+            concluidos.append((id_job, id_cadastro, sugestao))
+
+    concluir_jobs(conn, concluidos, falhas)
+
+    logging.info(
+        f"Worker da IA: lote com {len(concluidos) + len(falhas)} job(s), {len(falhas)} falha(s).")
+    return len(concluidos) + len(falhas)
+
+
+def limpar_cache_ia():
+    try:
+        removidas = cache_ia.remover_expirados()
+    except sqlite3.Error as e:
+        logging.warning(f"Não foi possível limpar o cache da IA: {e}")
+        return
+    if removidas:
+        logging.info(f"Cache da IA: {removidas} entrada(s) expirada(s) removida(s).")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Processa a fila de sugestões da IA gerada pelo atendimento.")
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help=f"jobs reservados por vez (padrão: {TAMANHO_LOTE_PADRAO})")
+    parser.add_argument('--concorrencia', type=int, default=LIMITE_CONCORRENCIA_PADRAO,
+                        help=f"requisições simultâneas à IA (padrão: {LIMITE_CONCORRENCIA_PADRAO})")
+    parser.add_argument('--continuo', action='store_true',
+                        help="continua aguardando novos jobs quando a fila esvazia")
+    parser.add_argument('--intervalo', type=float, default=5.0,
+                        help="segundos entre verificações no modo contínuo (padrão: 5)")
+    args = parser.parse_args()
+    configurar_logging()
+
+    try:
+        with conectar_bd() as conn:
+            executar_setup(conn.cursor())
+            total = 0
+            ultima_limpeza = None
+            while True:
+                processados = processar_lote(conn, args.lote, args.concorrencia)
+                total += processados
+                if processados:
+                    continue
+                # Fila vazia: aproveita para apagar as respostas expiradas do cache
+                if ultima_limpeza is None or time.monotonic() - ultima_limpeza >= INTERVALO_LIMPEZA_CACHE:
+                    limpar_cache_ia()
+                    ultima_limpeza = time.monotonic()
+                if not args.continuo:
+                    break
+                time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        print("Worker interrompido. Jobs não confirmados serão retomados na próxima execução.")
+    except sqlite3.Error as e:
+        logging.error(f"Erro no worker da IA: {e}")
+        print(f"Erro no worker da IA: {e}")
+        exit(1)
+    else:
+        print(f"Fila processada. Jobs: {total}")
+
+
+if __name__ == "__main__":
+    main()